@@ -0,0 +1,129 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+"""
+Throughput, latency and connections opened by the API miners' HTTP backends
+against a local mock provider.
+
+    python3 benchmarks/api_backend.py --requests 1000 --concurrency 64 256 --latency 0.05
+
+Three clients send the same requests to the MockAPIServer of openminers.base.mock_api:
+- blocking: one thread per concurrent request, a fresh connection per request,
+  like the per-call SDK clients the miners used before.
+- pooled: the same threads calling OpenAIBackend.generate, which bridges to the
+  shared event loop and reuses keep-alive connections.
+- async: concurrent OpenAIBackend.agenerate calls on the event loop itself.
+"""
+
+import time
+import asyncio
+import argparse
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from openminers.base.mock_api import MockAPIServer
+from openminers.base.api_backends import OpenAIBackend
+
+MESSAGES = [{"role": "user", "content": "ask me a random question about anything"}]
+
+
+def percentile(latencies: List[float], q: float) -> float:
+    latencies = sorted(latencies)
+    return latencies[int(q * (len(latencies) - 1))]
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def blocking(server: MockAPIServer, count: int, concurrency: int) -> List[float]:
+    def request(_):
+        return timed(
+            lambda: requests.post(
+                f"{server.url}/chat/completions",
+                json={"model": "gpt-3.5-turbo", "messages": MESSAGES},
+                headers={"Authorization": "Bearer key", "Connection": "close"},
+            ).raise_for_status()
+        )
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(request, range(count)))
+
+
+def pooled(backend: OpenAIBackend, count: int, concurrency: int) -> List[float]:
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(
+            executor.map(
+                lambda _: timed(lambda: backend.generate(MESSAGES)), range(count)
+            )
+        )
+
+
+def concurrent(backend: OpenAIBackend, count: int, concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request():
+        async with semaphore:
+            start = time.perf_counter()
+            await backend.agenerate(MESSAGES)
+            return time.perf_counter() - start
+
+    async def burst():
+        return await asyncio.gather(*(request() for _ in range(count)))
+
+    return backend.loop_thread.run(burst())
+
+
+def run():
+    parser = argparse.ArgumentParser(description="API backend benchmark")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[64, 256])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--max_connections", type=int, default=100)
+    args = parser.parse_args()
+
+    with MockAPIServer(latency=args.latency) as server:
+        for concurrency in args.concurrency:
+            for mode in ("blocking", "pooled", "async"):
+                backend = OpenAIBackend(
+                    api_key="key",
+                    base_url=server.url,
+                    max_connections=args.max_connections,
+                    max_in_flight=concurrency,
+                )
+                server.requests, server.connections = 0, set()
+                start = time.perf_counter()
+                if mode == "blocking":
+                    latencies = blocking(server, args.requests, concurrency)
+                elif mode == "pooled":
+                    latencies = pooled(backend, args.requests, concurrency)
+                else:
+                    latencies = concurrent(backend, args.requests, concurrency)
+                elapsed = time.perf_counter() - start
+                backend.close()
+                print(
+                    f"{mode} x{concurrency}: {args.requests / elapsed:.0f} req/s, "
+                    f"p50 {percentile(latencies, 0.5) * 1e3:.1f}ms "
+                    f"p99 {percentile(latencies, 0.99) * 1e3:.1f}ms, "
+                    f"{len(server.connections)} connections opened"
+                )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,108 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+"""
+Prompt building time of the legacy per-miner _process_history against the compiled
+ChatTemplate, as text and as token ids, from 2 to 200 turn histories.
+
+    python3 benchmarks/chat_template.py --turns 2 20 200 --words 48
+
+text: the legacy `+=` loop against ChatTemplate.render.
+ids: tokenizing the legacy text against TokenizedChatTemplate.render, replaying a
+conversation turn by turn so each history repeats the messages of the previous one.
+"""
+
+import time
+import random
+import argparse
+from typing import Callable, Dict, List
+
+from tiny_model import tiny_model_and_tokenizer, random_prompt
+from openminers.base.chat_template import ROLE_LINES
+
+
+def legacy_process_history(history: List[Dict[str, str]]) -> str:
+    processed_history = ""
+    for message in history:
+        if message["role"] == "system":
+            processed_history += "system: " + message["content"] + "\n"
+        if message["role"] == "assistant":
+            processed_history += "assistant: " + message["content"] + "\n"
+        if message["role"] == "user":
+            processed_history += "user: " + message["content"] + "\n"
+    return processed_history
+
+
+def conversation(
+    generator: random.Random, turns: int, words: int, vocab_size: int
+) -> List[Dict[str, str]]:
+    messages = [
+        {"role": "system", "content": random_prompt(generator, words, vocab_size)}
+    ]
+    for turn in range(turns):
+        role = "user" if turn % 2 == 0 else "assistant"
+        messages.append(
+            {"role": role, "content": random_prompt(generator, words, vocab_size)}
+        )
+    return messages
+
+
+def timed(func: Callable, histories: List[List[Dict[str, str]]], repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for history in histories:
+            func(history)
+    return (time.perf_counter() - start) / (repeats * len(histories))
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Chat template benchmark")
+    parser.add_argument("--turns", type=int, nargs="+", default=[2, 20, 200])
+    parser.add_argument("--words", type=int, default=48)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    _, tokenizer = tiny_model_and_tokenizer()
+    generator = random.Random(args.seed)
+    for turns in args.turns:
+        messages = conversation(generator, turns, args.words, tokenizer.vocab_size)
+        assert ROLE_LINES.render(messages) == legacy_process_history(messages)
+
+        before = timed(legacy_process_history, [messages], args.repeats * 10)
+        after = timed(ROLE_LINES.render, [messages], args.repeats * 10)
+        print(
+            f"{turns} turns, text: legacy {before * 1e6:.1f}us, "
+            f"compiled {after * 1e6:.1f}us ({before / after:.2f}x)"
+        )
+
+        # Every turn of the conversation, as a validator would send them.
+        histories = [messages[: end + 1] for end in range(1, len(messages))]
+        before = timed(
+            lambda history: tokenizer.encode(legacy_process_history(history)),
+            histories,
+            args.repeats,
+        )
+        tokenized = ROLE_LINES.tokenized(tokenizer)
+        after = timed(tokenized.render, histories, args.repeats)
+        print(
+            f"{turns} turns, ids per turn: legacy {before * 1e6:.1f}us, "
+            f"pre-tokenized {after * 1e6:.1f}us ({before / after:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,113 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+"""
+Post-processing cost of the stock text generation pipeline, which decodes the prompt
+with the completion and cuts the prompt off by string replacement, against
+NewTokensPipeline, which decodes the new token ids only, on long histories.
+
+    python3 benchmarks/completion.py --history_tokens 128 512 896 --new_tokens 32
+
+Both pipelines post-process the same generated sequences, then both are timed end
+to end with the .split(":")[-1].replace(history, "") the miners used to apply.
+"""
+
+import time
+import random
+import argparse
+from typing import Callable
+
+import torch
+import transformers
+from transformers import TextGenerationPipeline, pipeline
+from tiny_model import tiny_model_and_tokenizer, random_prompt
+from openminers.base.completion import NewTokensPipeline, trim_completion
+
+STOP = ["user:", "assistant:"]
+
+
+def timed(func: Callable, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Completion decoding benchmark")
+    parser.add_argument(
+        "--history_tokens", type=int, nargs="+", default=[128, 512, 896]
+    )
+    parser.add_argument("--new_tokens", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--generations", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    transformers.logging.set_verbosity_error()
+    model, tokenizer = tiny_model_and_tokenizer()
+    stock = pipeline(
+        "text-generation",
+        model=model,
+        tokenizer=tokenizer,
+        pipeline_class=TextGenerationPipeline,
+    )
+    new_tokens = pipeline(
+        "text-generation",
+        model=model,
+        tokenizer=tokenizer,
+        pipeline_class=NewTokensPipeline,
+    )
+    generate_kwargs = dict(
+        max_new_tokens=args.new_tokens,
+        min_new_tokens=args.new_tokens,
+        do_sample=False,
+        pad_token_id=tokenizer.eos_token_id,
+    )
+    generator = random.Random(args.seed)
+    for length in args.history_tokens:
+        history = random_prompt(generator, length, tokenizer.vocab_size)
+        model_inputs = stock.preprocess(history)
+        model_outputs = stock.forward(model_inputs, **generate_kwargs)
+
+        before = timed(lambda: stock.postprocess(model_outputs), args.repeats)
+        after = timed(lambda: new_tokens.postprocess(model_outputs), args.repeats)
+        print(
+            f"{length} history tokens, postprocess: stock {before * 1e6:.0f}us, "
+            f"new tokens {after * 1e6:.0f}us ({before / after:.1f}x)"
+        )
+
+        def legacy():
+            generation = stock(history, **generate_kwargs)[0]["generated_text"]
+            return generation.split(":")[-1].replace(str(history), "")
+
+        def current():
+            generation = new_tokens(history, **generate_kwargs)[0]["generated_text"]
+            return trim_completion(generation, STOP)
+
+        legacy(), current()
+        before = timed(legacy, args.generations)
+        after = timed(current, args.generations)
+        print(
+            f"{length} history tokens, end to end: legacy {before * 1e3:.1f}ms, "
+            f"new tokens {after * 1e3:.1f}ms ({before / after:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,154 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Compares generation throughput of the per-request path, static batches and the
+continuous batching engine on a tiny randomly initialized model, on CPU.
+
+    python3 benchmarks/continuous_batching.py --requests 32 --max_batch_size 8
+
+All requests arrive at once with random prompt lengths and random completion
+lengths, which stand in for sequences hitting eos at different steps. Latency is
+measured from the common arrival time to the moment each completion is ready.
+"""
+
+import time
+import torch
+import random
+import argparse
+import threading
+from typing import Callable, Dict, List, Tuple
+
+from tiny_model import tiny_model_and_tokenizer, random_prompt
+from openminers.base.batching import generate_batch
+from openminers.base.continuous_batching import ContinuousBatchingEngine
+
+Request = Tuple[str, int]
+
+
+def per_request(model, tokenizer, requests: List[Request], args) -> List[float]:
+    # One generate call per request, as the miners run it today.
+    start = time.perf_counter()
+    latencies = []
+    for prompt, max_new_tokens in requests:
+        input_ids = tokenizer(prompt, return_tensors="pt")["input_ids"]
+        with torch.inference_mode():
+            model.generate(
+                input_ids,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                eos_token_id=None,
+                pad_token_id=tokenizer.eos_token_id,
+            )
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def static_batches(model, tokenizer, requests: List[Request], args) -> List[float]:
+    # Every batch runs until its longest completion is done.
+    start = time.perf_counter()
+    latencies = []
+    for index in range(0, len(requests), args.max_batch_size):
+        batch = requests[index : index + args.max_batch_size]
+        generate_batch(
+            model,
+            tokenizer,
+            [prompt for prompt, _ in batch],
+            max_new_tokens=max(n for _, n in batch),
+            do_sample=False,
+            eos_token_id=None,
+        )
+        latencies.extend([time.perf_counter() - start] * len(batch))
+    return latencies
+
+
+def continuous(model, tokenizer, requests: List[Request], args) -> List[float]:
+    engine = ContinuousBatchingEngine(
+        model,
+        tokenizer,
+        max_batch_size=args.max_batch_size,
+        max_new_tokens=args.max_new_tokens,
+        eos_token_id=[],
+    )
+    latencies = [0.0] * len(requests)
+    start = time.perf_counter()
+
+    def submit(index: int):
+        prompt, max_new_tokens = requests[index]
+        engine.submit(prompt, max_new_tokens=max_new_tokens)
+        latencies[index] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.stop()
+    return latencies
+
+
+def report(name: str, latencies: List[float], tokens: int):
+    latencies = sorted(latencies)
+    elapsed = latencies[-1]
+    p90 = latencies[int(0.9 * (len(latencies) - 1))]
+    print(
+        f"{name:>15}: {elapsed:6.2f}s total, {len(latencies) / elapsed:6.2f} req/s, "
+        f"{tokens / elapsed:8.1f} tok/s, mean latency {sum(latencies) / len(latencies):6.2f}s, "
+        f"p90 {p90:6.2f}s"
+    )
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Continuous batching benchmark")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--max_batch_size", type=int, default=8)
+    parser.add_argument("--min_prompt_len", type=int, default=8)
+    parser.add_argument("--max_prompt_len", type=int, default=64)
+    parser.add_argument("--min_new_tokens", type=int, default=4)
+    parser.add_argument("--max_new_tokens", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+
+    model, tokenizer = tiny_model_and_tokenizer(seed=args.seed)
+    generator = random.Random(args.seed)
+    requests = [
+        (
+            random_prompt(
+                generator,
+                generator.randint(args.min_prompt_len, args.max_prompt_len),
+                tokenizer.vocab_size,
+            ),
+            generator.randint(args.min_new_tokens, args.max_new_tokens),
+        )
+        for _ in range(args.requests)
+    ]
+    tokens = sum(n for _, n in requests)
+
+    paths: Dict[str, Callable] = {
+        "per_request": per_request,
+        "static_batches": static_batches,
+        "continuous": continuous,
+    }
+    for name, path in paths.items():
+        report(name, path(model, tokenizer, requests, args), tokens)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,129 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+"""
+Latency of the GenerationEngine against the per-miner generation code it replaced,
+on tiny random-weight models on CPU.
+
+    python3 benchmarks/generation_engine.py --turns 2 8 --new_tokens 32
+
+For the chat template of every transformers miner, the same random histories are
+generated with the legacy flow (encode, generate without inference mode or
+attention mask, decode) and with GenerationEngine.
+"""
+
+import time
+import random
+import argparse
+from typing import Callable, Dict, List
+
+import torch
+import transformers
+from tiny_model import tiny_model_and_tokenizer, random_prompt
+from openminers.base.generation_engine import GenerationEngine
+from openminers.text_to_text.airoboros.miner import AiroborosMiner
+from openminers.text_to_text.hermes.miner import HermesMiner
+from openminers.text_to_text.koala.miner import KoalaMiner
+from openminers.text_to_text.neoxt.miner import NeoxtMiner
+from openminers.text_to_text.pythia.miner import PythiaMiner
+from openminers.text_to_text.vicuna.miner import VicunaMiner
+
+MINERS = [
+    PythiaMiner,
+    NeoxtMiner,
+    VicunaMiner,
+    KoalaMiner,
+    HermesMiner,
+    AiroborosMiner,
+]
+
+
+def random_history(
+    generator: random.Random, turns: int, vocab_size: int
+) -> List[Dict[str, str]]:
+    messages = [{"role": "system", "content": random_prompt(generator, 16, vocab_size)}]
+    for turn in range(turns):
+        role = "user" if turn % 2 == 0 else "assistant"
+        messages.append(
+            {"role": role, "content": random_prompt(generator, 24, vocab_size)}
+        )
+    return messages
+
+
+def legacy(engine: GenerationEngine, messages: List[Dict[str, str]]) -> str:
+    prompt = engine.render(messages) + engine.template.generation_prompt
+    input_ids = engine.tokenizer.encode(prompt, return_tensors="pt")
+    output = engine.model.generate(
+        input_ids,
+        max_length=input_ids.shape[1] + engine.generate_kwargs["max_new_tokens"],
+        do_sample=False,
+        pad_token_id=engine.tokenizer.eos_token_id,
+    )
+    return engine.template.postprocess(
+        engine.tokenizer.decode(
+            output[0][input_ids.shape[1] :], skip_special_tokens=True
+        )
+    )
+
+
+def timed(func: Callable, histories: List[List[Dict[str, str]]]) -> float:
+    start = time.perf_counter()
+    for messages in histories:
+        func(messages)
+    return (time.perf_counter() - start) / len(histories)
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Generation engine benchmark")
+    parser.add_argument("--turns", type=int, nargs="+", default=[2, 8])
+    parser.add_argument("--new_tokens", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    # Role markers are unknown words of the tiny vocabulary, mapped to <eos>, which
+    # makes transformers warn about right padding on every call.
+    transformers.logging.set_verbosity_error()
+    model, tokenizer = tiny_model_and_tokenizer()
+    generator = random.Random(args.seed)
+    for turns in args.turns:
+        histories = [
+            random_history(generator, turns, tokenizer.vocab_size)
+            for _ in range(args.repeats)
+        ]
+        for miner in MINERS:
+            engine = GenerationEngine(
+                model,
+                tokenizer,
+                miner.template,
+                max_new_tokens=args.new_tokens,
+                min_new_tokens=args.new_tokens,
+                do_sample=False,
+            )
+            # Warm up once, then time both flows on the same histories.
+            engine(histories[0])
+            before = timed(lambda messages: legacy(engine, messages), histories)
+            after = timed(engine, histories)
+            print(
+                f"{miner.__name__} {turns} turns: legacy {before * 1e3:.1f}ms, "
+                f"engine {after * 1e3:.1f}ms ({before / after:.2f}x)"
+            )
+
+
+if __name__ == "__main__":
+    run()
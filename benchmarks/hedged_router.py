@@ -0,0 +1,125 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+"""
+Tail latency of a single API provider against the hedged router, on mock
+providers with injected tail latency.
+
+    python3 benchmarks/hedged_router.py --requests 2000 --tail_latency 2.0 --tail_probability 0.05
+
+Every provider is a MockAPIServer answering in `latency` seconds, or in
+`tail_latency` seconds with probability `tail_probability`. The single provider
+runs alone; the router hedges to the next provider at each hedge percentile.
+Requests over `--timeout` seconds count as missed validator deadlines.
+"""
+
+import time
+import asyncio
+import argparse
+from typing import List
+
+from openminers.base.mock_api import MockAPIServer
+from openminers.base.hedged_router import HedgedRouter
+from openminers.base.api_backends import CohereBackend, GooseAIBackend, OpenAIBackend
+
+MESSAGES = [{"role": "user", "content": "ask me a random question about anything"}]
+BACKENDS = [OpenAIBackend, CohereBackend, GooseAIBackend]
+
+
+def percentile(latencies: List[float], q: float) -> float:
+    latencies = sorted(latencies)
+    return latencies[int(q * (len(latencies) - 1))]
+
+
+def measure(backend, count: int, concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request():
+        async with semaphore:
+            start = time.perf_counter()
+            await backend.agenerate(MESSAGES)
+            return time.perf_counter() - start
+
+    async def burst():
+        return await asyncio.gather(*(request() for _ in range(count)))
+
+    return backend.loop_thread.run(burst())
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Hedged router benchmark")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--providers", type=int, default=2, choices=[2, 3])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tail_latency", type=float, default=2.0)
+    parser.add_argument("--tail_probability", type=float, default=0.05)
+    parser.add_argument("--percentiles", type=float, nargs="+", default=[0.9, 0.95])
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    servers = [
+        MockAPIServer(
+            latency=args.latency,
+            tail_latency=args.tail_latency,
+            tail_probability=args.tail_probability,
+            seed=args.seed + index,
+        ).start()
+        for index in range(args.providers)
+    ]
+
+    def backends():
+        return [
+            cls(api_key="key", base_url=server.url, timeout=60.0)
+            for cls, server in zip(BACKENDS, servers)
+        ]
+
+    def report(label, latencies, sent):
+        missed = sum(latency > args.timeout for latency in latencies)
+        print(
+            f"{label}: mean {sum(latencies) / len(latencies) * 1e3:.0f}ms, "
+            f"p50 {percentile(latencies, 0.5) * 1e3:.0f}ms "
+            f"p99 {percentile(latencies, 0.99) * 1e3:.0f}ms "
+            f"p99.9 {percentile(latencies, 0.999) * 1e3:.0f}ms, "
+            f"over {args.timeout}s {missed / len(latencies):.2%}, "
+            f"{sent / len(latencies):.3f} upstream requests per call"
+        )
+
+    try:
+        single = backends()[0]
+        report(
+            "single", measure(single, args.requests, args.concurrency), args.requests
+        )
+        single.close()
+
+        for q in args.percentiles:
+            router = HedgedRouter(backends(), hedge_percentile=q, timeout=60.0)
+            # Warm the latency histograms before measuring.
+            measure(router, router.min_samples * 2, args.concurrency)
+            sent = sum(server.requests for server in servers)
+            latencies = measure(router, args.requests, args.concurrency)
+            sent = sum(server.requests for server in servers) - sent
+            report(f"hedged at p{q * 100:g}", latencies, sent)
+            print(f"  {router.provider_stats()}")
+            router.close()
+    finally:
+        for server in servers:
+            server.stop()
+
+
+if __name__ == "__main__":
+    run()
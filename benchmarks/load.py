@@ -0,0 +1,253 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Open-loop load generator for miners, run fully offline.
+
+    python3 benchmarks/load.py template mock --concurrency 8 --rate 50 --duration 10 \
+        --output load.json
+
+Requests arrive as a Poisson process at `--rate` per second for `--duration` seconds
+from a pool of registered validator hotkeys and go through the miner's blacklist,
+priority and forward functions on a priority thread pool of `--concurrency` workers,
+as they would behind the axon. The chain is replaced by an OfflineSubtensor and the
+`mock` miner stands in for a model backend with a configurable latency and error
+rate. Calls carry `--timeout` as the validator timeout, miners drop expired calls and
+stop generating at the deadline unless run with `--neuron.ignore_deadline`. Unknown
+arguments are forwarded to the miner config, e.g.
+`--miner.blacklist.rate_limit_burst 1000`.
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+import bittensor as bt
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import openminers
+from openminers.base.deadline import call_deadline, remaining
+from openminers.base.mock import OfflineMetagraph, OfflineSubtensor
+
+
+class MockBackendMiner(openminers.TemplateMiner):
+    """Template miner whose forward waits on a simulated backend."""
+
+    latency: float = 0.05
+    error_rate: float = 0.0
+
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
+        latency = random.expovariate(1 / self.latency) if self.latency > 0 else 0
+        # Like a generation stopped at the deadline with the text so far.
+        if deadline is not None:
+            latency = min(latency, remaining(deadline))
+        time.sleep(latency)
+        if random.random() < self.error_rate:
+            raise RuntimeError("mock backend error")
+        return "Hello World!"
+
+
+def make_miner(name: str, hotkeys: List[str], args) -> "openminers.BaseMiner":
+    if name == "mock":
+        MINER = MockBackendMiner
+        MINER.latency = args.backend_latency_ms / 1000
+        MINER.error_rate = args.backend_error_rate
+    else:
+        MINER = getattr(openminers, name)
+
+    # The miner merges its own config over this one.
+    config = openminers.BaseMiner.config()
+    config.axon.external_ip = "127.0.0.1"
+    config.wandb.on = False
+
+    wallet = bt.wallet.mock()
+    metagraph = OfflineMetagraph(
+        hotkeys=hotkeys + [wallet.hotkey.ss58_address],
+        stake=[1000.0] * len(hotkeys) + [0.0],
+        validator_permit=[True] * len(hotkeys) + [False],
+    )
+    return MINER(config=config, wallet=wallet, subtensor=OfflineSubtensor(metagraph))
+
+
+def make_messages(generator: random.Random, index: int) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": "you are a helpful assistant."},
+        {"role": "user", "content": f"question #{index}: {generator.random()}"},
+    ]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def run_load(miner, hotkeys: List[str], args) -> Dict:
+    generator = random.Random(args.seed)
+    pool = bt.PriorityThreadPoolExecutor(max_workers=args.concurrency)
+    lock = threading.Lock()
+    outcomes = []
+
+    def handle(forward_call):
+        # As the axon would, unless the miner runs with --neuron.ignore_deadline.
+        deadline = None
+        if not miner.config.neuron.ignore_deadline:
+            deadline = call_deadline(forward_call, miner.config.neuron.deadline_margin)
+        # The forward wrapper returns an empty completion when the miner raises.
+        response = miner.synapse.forward(forward_call.messages, deadline=deadline)
+        latency = time.time() - forward_call.start_time
+        with lock:
+            outcomes.append(("error" if response == "" else "ok", latency))
+
+    futures = []
+    blacklisted = 0
+    sent_messages = []
+    start = time.time()
+    next_arrival = start
+    index = 0
+    while next_arrival - start < args.duration:
+        time.sleep(max(next_arrival - time.time(), 0))
+        if sent_messages and generator.random() < args.duplicate_rate:
+            messages = generator.choice(sent_messages)
+        else:
+            messages = make_messages(generator, index)
+            sent_messages.append(messages)
+
+        forward_call = SimpleNamespace(
+            src_hotkey=generator.choice(hotkeys),
+            messages=messages,
+            start_time=time.time(),
+            timeout=args.timeout,
+        )
+        # The axon rejects blacklisted calls before they reach the thread pool.
+        does_blacklist, _ = miner.synapse.blacklist(forward_call)
+        if does_blacklist:
+            blacklisted += 1
+        else:
+            futures.append(
+                (
+                    forward_call,
+                    pool.submit(
+                        handle,
+                        forward_call,
+                        priority=miner.synapse.priority(forward_call),
+                    ),
+                )
+            )
+        index += 1
+        next_arrival += generator.expovariate(args.rate)
+
+    # Calls still running a timeout after the last arrival are counted as timed out.
+    deadline = time.time() + args.timeout
+    for _, future in futures:
+        try:
+            future.result(timeout=max(deadline - time.time(), 0))
+        except Exception:
+            pass
+    elapsed = time.time() - start
+    pool.shutdown(wait=False)
+
+    with lock:
+        outcomes = list(outcomes)
+    completed = len(outcomes)
+    timeouts = (
+        len(futures)
+        - completed
+        + sum(1 for _, latency in outcomes if latency > args.timeout)
+    )
+    errors = sum(1 for outcome, _ in outcomes if outcome == "error")
+    ok_latencies = [
+        latency
+        for outcome, latency in outcomes
+        if outcome == "ok" and latency <= args.timeout
+    ]
+    counters = miner.telemetry.snapshot()
+    return {
+        "requests": index,
+        "elapsed": elapsed,
+        "throughput": len(ok_latencies) / elapsed,
+        "latency_p50": percentile(ok_latencies, 0.50),
+        "latency_p90": percentile(ok_latencies, 0.90),
+        "latency_p99": percentile(ok_latencies, 0.99),
+        "error_rate": errors / max(index, 1),
+        "blacklist_rate": blacklisted / max(index, 1),
+        "timeout_rate": timeouts / max(index, 1),
+        "generations_saved": (
+            miner.single_flight.stats["coalesced"]
+            if getattr(miner, "single_flight", None) is not None
+            else 0
+        ),
+        "expired_dropped": counters.get("forward_expired", 0),
+        "deadline_hits": counters.get("forward_deadline_hits", 0),
+    }
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Miner load benchmark")
+    parser.add_argument(
+        "miners", nargs="+", help="Miner names, `mock` for a mock backend."
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--rate", type=float, default=50.0, help="Mean arrivals per second."
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="Seconds of arrivals."
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=12.0, help="Per request timeout."
+    )
+    parser.add_argument(
+        "--hotkeys", type=int, default=64, help="Validator hotkeys sending requests."
+    )
+    parser.add_argument(
+        "--duplicate_rate",
+        type=float,
+        default=0.0,
+        help="Fraction of repeated prompts.",
+    )
+    parser.add_argument("--backend_latency_ms", type=float, default=50.0)
+    parser.add_argument("--backend_error_rate", type=float, default=0.0)
+    parser.add_argument(
+        "--output", type=str, default=None, help="Write results as JSON."
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args, _ = parser.parse_known_args()
+    random.seed(args.seed)
+
+    hotkeys = [f"validator-{i}" for i in range(args.hotkeys)]
+    results = {"args": vars(args), "miners": {}}
+    for name in args.miners:
+        miner = make_miner(name, hotkeys, args)
+        results["miners"][name] = run_load(miner, hotkeys, args)
+        miner.block_tracker.stop()
+        miner.telemetry.stop()
+        bt.logging.success(f"{name}: {json.dumps(results['miners'][name])}")
+
+    print(json.dumps(results["miners"], indent=2))
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,145 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Lookup latency, recall and false positive rate of the near duplicate prompt index on
+a synthetic prompt corpus.
+
+    python3 benchmarks/near_duplicate.py --prompts 10000 --threshold 0.8
+
+The index is filled with random prompts sharing a common system message. It is then
+queried with perturbed copies of indexed prompts (case, whitespace, punctuation and
+one replaced word), which should be flagged, and with fresh prompts built from the
+same system message, which should not.
+"""
+
+import time
+import random
+import argparse
+from typing import List
+
+from openminers.base.near_duplicate import (
+    NearDuplicateIndex,
+    normalize_messages,
+)
+
+SYSTEM = "You are a helpful assistant. Answer the question of the user accurately and concisely."
+
+
+def random_question(
+    generator: random.Random, vocabulary: List[str], length: int
+) -> str:
+    return " ".join(generator.choice(vocabulary) for _ in range(length)) + "?"
+
+
+def perturb(generator: random.Random, vocabulary: List[str], question: str) -> str:
+    words = question.rstrip("?").split()
+    words[generator.randrange(len(words))] = generator.choice(vocabulary)
+    words = [word.upper() if generator.random() < 0.2 else word for word in words]
+    return "  ".join(words) + " ??"
+
+
+def messages(question: str):
+    return [
+        {"role": "system", "content": SYSTEM},
+        {"role": "user", "content": question},
+    ]
+
+
+def jaccard(a, b, shingle_size: int) -> float:
+    def shingles(words):
+        return {
+            tuple(words[i : i + shingle_size])
+            for i in range(max(len(words) - shingle_size + 1, 1))
+        }
+
+    a, b = shingles(normalize_messages(a)), shingles(normalize_messages(b))
+    return len(a & b) / len(a | b)
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Near duplicate index benchmark")
+    parser.add_argument("--prompts", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--question_len", type=int, default=40)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--num_perm", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generator = random.Random(args.seed)
+    vocabulary = [f"word{i}" for i in range(args.vocabulary)]
+    questions = [
+        random_question(generator, vocabulary, args.question_len)
+        for _ in range(args.prompts)
+    ]
+
+    index = NearDuplicateIndex(threshold=args.threshold, num_perm=args.num_perm)
+    start = time.perf_counter()
+    for question in questions:
+        index.add(index.signature(messages(question)), block=0)
+    insert_time = (time.perf_counter() - start) / args.prompts
+
+    duplicates = [
+        messages(perturb(generator, vocabulary, generator.choice(questions)))
+        for _ in range(args.queries)
+    ]
+    fresh = [
+        messages(random_question(generator, vocabulary, args.question_len))
+        for _ in range(args.queries)
+    ]
+
+    latencies, flagged_duplicates, flagged_fresh = [], 0, []
+    for position, query in enumerate(duplicates + fresh):
+        start = time.perf_counter()
+        flagged = index.query(index.signature(query))
+        latencies.append(time.perf_counter() - start)
+        if position < len(duplicates):
+            flagged_duplicates += flagged
+        elif flagged:
+            flagged_fresh.append(query)
+
+    # A fresh prompt is only a false positive if no indexed prompt actually reaches the threshold.
+    false_positives = sum(
+        max(
+            jaccard(query, messages(question), index.shingle_size)
+            for question in questions
+        )
+        < args.threshold
+        for query in flagged_fresh
+    )
+
+    latencies.sort()
+    true_similarity = sum(
+        jaccard(query, messages(questions[0]), index.shingle_size)
+        for query in fresh[:10]
+    )
+    print(
+        f"{args.prompts} indexed prompts, {index.bands} bands of {index.rows} rows, "
+        f"insert {insert_time * 1e6:.1f}us"
+    )
+    print(
+        f"lookup p50 {latencies[len(latencies) // 2] * 1e6:.1f}us, "
+        f"p99 {latencies[int(0.99 * (len(latencies) - 1))] * 1e6:.1f}us"
+    )
+    print(f"recall on perturbed duplicates: {flagged_duplicates / args.queries:.3f}")
+    print(f"false positive rate on fresh prompts: {false_positives / args.queries:.4f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,124 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Compares generation latency with and without the cross-request prefix cache on a
+tiny randomly initialized model, on CPU.
+
+    python3 benchmarks/prefix_cache.py --conversations 8 --turns 6
+
+Every conversation starts with the same system prompt and each turn resends the
+whole history plus a new message, the way validators query miners.
+"""
+
+import time
+import torch
+import random
+import argparse
+from typing import List
+
+from tiny_model import tiny_model_and_tokenizer, random_prompt
+from openminers.base.prefix_cache import PrefixCachedGenerator
+
+
+def build_prompts(generator: random.Random, vocab_size: int, args) -> List[str]:
+    system = random_prompt(generator, args.system_len, vocab_size)
+    histories = [system] * args.conversations
+    prompts = []
+    for _ in range(args.turns):
+        for index in range(args.conversations):
+            message = random_prompt(generator, args.turn_len, vocab_size)
+            histories[index] = f"{histories[index]} {message}"
+            prompts.append(histories[index])
+        # The reply of the miner becomes part of the next turn.
+        histories = [
+            f"{history} {random_prompt(generator, args.max_new_tokens, vocab_size)}"
+            for history in histories
+        ]
+    return prompts
+
+
+def full_prefill(model, tokenizer, prompts: List[str], args) -> float:
+    start = time.perf_counter()
+    for prompt in prompts:
+        input_ids = tokenizer(prompt, return_tensors="pt")["input_ids"]
+        with torch.inference_mode():
+            model.generate(
+                input_ids,
+                max_new_tokens=args.max_new_tokens,
+                do_sample=False,
+                eos_token_id=None,
+                pad_token_id=tokenizer.eos_token_id,
+            )
+    return time.perf_counter() - start
+
+
+def prefix_cached(model, tokenizer, prompts: List[str], args) -> float:
+    generator = PrefixCachedGenerator(
+        model,
+        tokenizer,
+        max_bytes=int(args.cache_mb * 2**20),
+        max_new_tokens=args.max_new_tokens,
+        do_sample=False,
+        eos_token_id=None,
+    )
+    start = time.perf_counter()
+    for prompt in prompts:
+        generator.generate(prompt)
+    elapsed = time.perf_counter() - start
+
+    stats = generator.tree.stats
+    print(
+        f"prefix cache: hit rate {generator.tree.hit_rate:.2f}, "
+        f"saved {stats['saved_prefill_tokens']} of {stats['prompt_tokens']} prefill tokens, "
+        f"{stats['evictions']} evictions, {generator.tree.nbytes / 2**20:.1f}MB cached"
+    )
+    return elapsed
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Prefix cache benchmark")
+    parser.add_argument("--conversations", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--system_len", type=int, default=128)
+    parser.add_argument("--turn_len", type=int, default=32)
+    parser.add_argument("--max_new_tokens", type=int, default=16)
+    parser.add_argument("--cache_mb", type=float, default=256)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+
+    model, tokenizer = tiny_model_and_tokenizer(seed=args.seed)
+    prompts = build_prompts(random.Random(args.seed), tokenizer.vocab_size, args)
+    print(
+        f"{len(prompts)} requests, mean prompt length "
+        f"{sum(len(p.split()) for p in prompts) / len(prompts):.0f} tokens"
+    )
+
+    baseline = full_prefill(model, tokenizer, prompts, args)
+    cached = prefix_cached(model, tokenizer, prompts, args)
+    print(
+        f"full prefill: {baseline:6.2f}s, {baseline / len(prompts) * 1000:7.1f}ms/req"
+    )
+    print(f"prefix cache: {cached:6.2f}s, {cached / len(prompts) * 1000:7.1f}ms/req")
+    print(f"speedup: {baseline / cached:.2f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,137 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Measures the per-request cost of the blacklist prompt cache at different cache sizes.
+
+    python3 benchmarks/prompt_cache.py --sizes 10000 100000 1000000
+
+The cache is filled with prompts spread evenly over the block span and then driven
+in steady state: new prompts keep arriving while the block advances, so every
+request pays for its share of expiry as well as the lookup.
+"""
+
+import json
+import time
+import hashlib
+import argparse
+from types import SimpleNamespace
+
+from openminers.base.blacklist import is_prompt_in_cache
+from openminers.base.prompt_cache import PromptCache, hash_messages
+
+
+def legacy_is_prompt_in_cache(self, forward_call) -> bool:
+    # Linear scan implementation kept for comparison.
+    prompt = json.dumps(list(forward_call.messages))
+    prompt_key = hashlib.sha256(prompt.encode()).hexdigest()
+    current_block = self.block_tracker.block
+
+    if prompt_key in self.prompt_cache:
+        should_blacklist = True
+    else:
+        self.prompt_cache[prompt_key] = (forward_call.src_hotkey, current_block)
+        should_blacklist = False
+
+    keys_to_remove = []
+    for key, (_, block) in self.prompt_cache.items():
+        if block + self.config.miner.blacklist.prompt_cache_block_span < current_block:
+            keys_to_remove.append(key)
+    for key in keys_to_remove:
+        del self.prompt_cache[key]
+
+    return should_blacklist
+
+
+def make_messages(index: int):
+    return [
+        {"role": "system", "content": "you are a helpful assistant."},
+        {
+            "role": "user",
+            "content": f"ask me a random question about anything #{index}",
+        },
+    ]
+
+
+def make_miner(block_span: int, legacy: bool):
+    return SimpleNamespace(
+        config=SimpleNamespace(
+            miner=SimpleNamespace(
+                blacklist=SimpleNamespace(prompt_cache_block_span=block_span)
+            )
+        ),
+        block_tracker=SimpleNamespace(block=block_span),
+        prompt_cache={} if legacy else PromptCache(),
+    )
+
+
+def fill(miner, size: int, block_span: int, legacy: bool):
+    per_block = max(size // block_span, 1)
+    for index in range(size):
+        block = index // per_block + 1
+        if legacy:
+            key = hashlib.sha256(json.dumps(make_messages(index)).encode()).hexdigest()
+            miner.prompt_cache[key] = ("hotkey", block)
+        else:
+            miner.prompt_cache.add(hash_messages(make_messages(index)), "hotkey", block)
+    miner.block_tracker.block = block
+    return per_block
+
+
+def bench(size: int, requests: int, block_span: int, legacy: bool) -> float:
+    miner = make_miner(block_span, legacy)
+    per_block = fill(miner, size, block_span, legacy)
+    check = legacy_is_prompt_in_cache if legacy else is_prompt_in_cache
+
+    calls = [
+        SimpleNamespace(src_hotkey="hotkey", messages=make_messages(size + index))
+        for index in range(requests)
+    ]
+    start = time.perf_counter()
+    for index, forward_call in enumerate(calls):
+        # Advance the block at the same rate the cache was filled at.
+        if index % per_block == 0:
+            miner.block_tracker.block += 1
+        check(miner, forward_call)
+    elapsed = time.perf_counter() - start
+    return elapsed / requests
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Prompt cache benchmark")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--legacy_requests", type=int, default=20)
+    parser.add_argument("--block_span", type=int, default=50)
+    parser.add_argument(
+        "--legacy", action="store_true", help="Also time the linear scan cache."
+    )
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        per_request = bench(size, args.requests, args.block_span, legacy=False)
+        line = f"cached_prompts={size:>9} bucketed={per_request * 1e6:8.2f}us/request"
+        if args.legacy:
+            per_request = bench(size, args.legacy_requests, args.block_span, True)
+            line += f" linear_scan={per_request * 1e6:10.2f}us/request"
+        print(line)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,144 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+"""
+Lookup latency and hit rate of the semantic response cache, against the cost of a
+generation on a tiny CPU model.
+
+    python3 benchmarks/semantic_cache.py --vectors 1000 10000 --threshold 0.8
+
+The cache is filled with random prompts plus the mock query of benchmarks/base.py.
+It is then queried with paraphrases of the mock query, which should hit, and with
+fresh random prompts, which should not.
+"""
+
+import time
+import random
+import string
+import argparse
+from typing import List
+
+import torch
+from tiny_model import tiny_model_and_tokenizer, random_prompt
+from openminers.base.semantic_cache import (
+    HashingEncoder,
+    SemanticCache,
+    TransformerEncoder,
+)
+
+MOCK_QUERY = "ask me a random question about anything"
+PARAPHRASES = [
+    "Ask me a random question about anything.",
+    "ask me a random question about anything!",
+    "ask me one random question about anything",
+    "ask me a random question about something",
+    "Ask me a random question, about anything",
+    "please ask me a random question about anything",
+    "ask me any random question about anything",
+    "ask me a random question on anything",
+]
+
+
+def percentile(latencies: List[float], q: float) -> float:
+    latencies = sorted(latencies)
+    return latencies[int(q * (len(latencies) - 1))]
+
+
+def generation_time(new_tokens: int, repeats: int = 5) -> float:
+    model, tokenizer = tiny_model_and_tokenizer()
+    generator = random.Random(0)
+    elapsed = []
+    for _ in range(repeats):
+        input_ids = tokenizer(
+            random_prompt(generator, 64, tokenizer.vocab_size), return_tensors="pt"
+        ).input_ids
+        start = time.perf_counter()
+        with torch.inference_mode():
+            model.generate(
+                input_ids,
+                max_new_tokens=new_tokens,
+                min_new_tokens=new_tokens,
+                do_sample=False,
+                pad_token_id=tokenizer.eos_token_id,
+            )
+        elapsed.append(time.perf_counter() - start)
+    return percentile(elapsed, 0.5)
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Semantic cache benchmark")
+    parser.add_argument("--vectors", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--encoder", type=str, default="hashing")
+    parser.add_argument("--new_tokens", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.encoder == "hashing":
+        encoder = HashingEncoder()
+    else:
+        encoder = TransformerEncoder(args.encoder)
+    generate = generation_time(args.new_tokens)
+    print(f"tiny model generation of {args.new_tokens} tokens: {generate * 1e3:.1f}ms")
+
+    generator = random.Random(args.seed)
+    # Random letter strings, so unrelated prompts do not share n-grams by construction.
+    vocabulary = [
+        "".join(generator.choice(string.ascii_lowercase) for _ in range(length))
+        for length in (generator.randint(3, 9) for _ in range(5000))
+    ]
+    for vectors in args.vectors:
+        cache = SemanticCache(encoder, threshold=args.threshold, max_vectors=vectors)
+        cache.add(encoder.encode(MOCK_QUERY), "what is the tallest mountain?")
+        for _ in range(vectors - 1):
+            question = " ".join(generator.choice(vocabulary) for _ in range(12))
+            cache.add(encoder.encode(question), question)
+
+        queries = [
+            (generator.choice(PARAPHRASES), True) for _ in range(args.queries)
+        ] + [
+            (" ".join(generator.choice(vocabulary) for _ in range(12)), False)
+            for _ in range(args.queries)
+        ]
+        encode_latencies, search_latencies, hits, false_hits = [], [], 0, 0
+        for query, paraphrase in queries:
+            start = time.perf_counter()
+            vector = encoder.encode(query)
+            encoded = time.perf_counter()
+            matches = cache.search(vector)
+            search_latencies.append(time.perf_counter() - encoded)
+            encode_latencies.append(encoded - start)
+
+            hit = bool(matches) and matches[0][1] >= args.threshold
+            if paraphrase:
+                hits += hit
+            else:
+                false_hits += hit
+
+        lookup = percentile(encode_latencies, 0.5) + percentile(search_latencies, 0.5)
+        print(
+            f"{vectors} vectors: encode p50 {percentile(encode_latencies, 0.5) * 1e6:.0f}us, "
+            f"search p50 {percentile(search_latencies, 0.5) * 1e6:.0f}us "
+            f"p99 {percentile(search_latencies, 0.99) * 1e6:.0f}us, "
+            f"paraphrase hit rate {hits / args.queries:.3f}, "
+            f"false hit rate {false_hits / args.queries:.4f}, "
+            f"lookup is {lookup / generate:.2%} of a generation"
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,107 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Measures import time and peak resident memory of resolving each miner from a fresh
+interpreter, with the lazy registry and with every miner imported up front the way
+`import openminers` used to behave.
+
+    python3 benchmarks/startup.py template openai falcon --eager
+
+Each measurement runs in its own subprocess so caches from earlier imports do not
+leak into later ones.
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List
+
+PROBE = """
+import json, time, resource, importlib
+start = time.perf_counter()
+openminers = importlib.import_module("openminers")
+error = None
+try:
+    if {eager}:
+        for name in openminers.__all__:
+            try:
+                getattr(openminers, name)
+            except Exception:
+                pass
+    getattr(openminers, {name!r})
+except Exception as e:
+    error = repr(e)
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "error": error,
+}}))
+"""
+
+
+def measure(name: str, eager: bool) -> Dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(name=name, eager=eager)],
+        capture_output=True,
+        text=True,
+    )
+    lines = output.stdout.strip().splitlines()
+    if output.returncode != 0 or not lines:
+        return {"seconds": None, "peak_rss_mb": None, "error": output.stderr[-200:]}
+    return json.loads(lines[-1])
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Miner startup benchmark")
+    parser.add_argument("miners", nargs="*", help="Miner names, defaults to all.")
+    parser.add_argument(
+        "--eager",
+        action="store_true",
+        help="Also measure importing every miner first, as before the lazy registry.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    import openminers
+
+    names: List[str] = args.miners or [
+        name for name in openminers.__all__ if name.islower()
+    ]
+    modes = ["lazy", "eager"] if args.eager else ["lazy"]
+    results = {
+        name: {mode: measure(name, mode == "eager") for mode in modes} for name in names
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for name, result in results.items():
+        for mode, measurement in result.items():
+            if measurement["error"] is not None:
+                print(f"{name:>14} {mode:>5}: failed {measurement['error']}")
+                continue
+            print(
+                f"{name:>14} {mode:>5}: {measurement['seconds']:6.2f}s, "
+                f"peak RSS {measurement['peak_rss_mb']:7.1f}MB"
+            )
+
+
+if __name__ == "__main__":
+    run()
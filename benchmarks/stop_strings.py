@@ -0,0 +1,88 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+"""
+Tokens generated per request, and latency, with and without streaming stop string
+detection, against a local mock provider that ignores stop strings.
+
+    python3 benchmarks/stop_strings.py --requests 50 --max_tokens 256 --token_interval 0.002
+
+Every completion is an answer of random length followed by "user: " and more text
+up to max_tokens words, as when a model goes on to write the next turn. Without
+streaming the provider generates all max_tokens, which the mock emulates by
+waiting max_tokens * token_interval before answering. With streaming the backend
+reads one word every token_interval and hangs up at the stop string.
+"""
+
+import time
+import random
+import argparse
+from typing import List
+
+from openminers.base.mock_api import MockAPIServer
+from openminers.base.api_backends import OpenAIBackend
+
+MESSAGES = [{"role": "user", "content": "ask me a random question about anything"}]
+STOPS = ["user: ", "bot: ", "system: "]
+
+
+def completion(generator: random.Random, max_tokens: int) -> str:
+    answer = generator.randrange(8, max_tokens // 2)
+    words = [f"w{i}" for i in range(answer)] + ["user:"]
+    words += [f"x{i}" for i in range(max_tokens - len(words))]
+    return " ".join(words)
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Streaming stop string benchmark")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--max_tokens", type=int, default=256)
+    parser.add_argument("--token_interval", type=float, default=0.002)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generator = random.Random(args.seed)
+    completions = [completion(generator, args.max_tokens) for _ in range(args.requests)]
+    with MockAPIServer(latency=0.0, stream_interval=args.token_interval) as server:
+        for stream in (False, True):
+            # The mock only sleeps between streamed words, pay the whole generation up front otherwise.
+            server.latency = 0.0 if stream else args.max_tokens * args.token_interval
+            backend = OpenAIBackend(
+                api_key="key", base_url=server.url, stream=stream, stop=STOPS
+            )
+            tokens: List[int] = []
+            latencies: List[float] = []
+            for text in completions:
+                server.completion = text
+                sent = server.chunks_sent
+                start = time.perf_counter()
+                backend.generate(MESSAGES)
+                latencies.append(time.perf_counter() - start)
+                # Let the server notice the hang up before counting what it sent.
+                time.sleep(args.token_interval * 5)
+                tokens.append(
+                    server.chunks_sent - sent if stream else len(text.split())
+                )
+            backend.close()
+            print(
+                f"{'streaming' if stream else 'blocking'}: "
+                f"{sum(tokens) / len(tokens):.1f} tokens generated per request, "
+                f"mean latency {sum(latencies) / len(latencies) * 1e3:.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    run()
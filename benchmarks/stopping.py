@@ -0,0 +1,93 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+"""
+Per decode step overhead of the stopping criteria: the per-miner StopOnTokens loop
+that falcon and stabilityai used, against StopOnSequences.
+
+    python3 benchmarks/stopping.py --batch_sizes 1 8 32 --steps 2000
+
+StopOnTokens only looked at the first row, so its batched numbers are the cost of
+an answer that is wrong for every other row. StopOnSequences is timed on the same
+single token stops, then with multi-token role markers added.
+"""
+
+import time
+import argparse
+from typing import List
+
+import torch
+from transformers import StoppingCriteria
+from openminers.base.stopping import StopSequences
+
+# The stop ids of the stabilityai miner.
+STOP_IDS = [50278, 50279, 50277, 1, 0]
+# Role markers such as "User:" or "\nAssistant:" split into two to four tokens.
+STOP_SEQUENCES = [[12982, 25], [48902, 25], [198, 12982, 25], [198, 198, 48902, 25]]
+
+
+class StopOnTokens(StoppingCriteria):
+    def __init__(self, stop_token_ids: List[int]):
+        self.stop_token_ids = stop_token_ids
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
+    ) -> bool:
+        for stop_id in self.stop_token_ids:
+            if input_ids[0][-1] == stop_id:
+                return True
+        return False
+
+
+def per_step(make_criteria, batch_size: int, prompt_length: int, steps: int) -> float:
+    generator = torch.Generator().manual_seed(batch_size)
+    # Token ids above every stop id, so no row stops during the run.
+    sequences = torch.randint(
+        50300, 50400, (batch_size, prompt_length + steps), generator=generator
+    )
+    criteria = make_criteria()
+    start = time.perf_counter()
+    for length in range(prompt_length + 1, prompt_length + steps + 1):
+        criteria(sequences[:, :length], None)
+    return (time.perf_counter() - start) / steps
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Stopping criteria benchmark")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--prompt_length", type=int, default=512)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    single = StopSequences([[stop_id] for stop_id in STOP_IDS])
+    multi = StopSequences([[stop_id] for stop_id in STOP_IDS] + STOP_SEQUENCES)
+    flavours = {
+        "StopOnTokens": lambda: StopOnTokens(STOP_IDS),
+        "StopOnSequences, single tokens": single.criteria,
+        "StopOnSequences, with role markers": multi.criteria,
+    }
+    for batch_size in args.batch_sizes:
+        for name, make_criteria in flavours.items():
+            seconds = per_step(
+                make_criteria, batch_size, args.prompt_length, args.steps
+            )
+            print(f"batch {batch_size}, {name}: {seconds * 1e6:.1f}us per step")
+
+
+if __name__ == "__main__":
+    run()
@@ -1,45 +1,84 @@
+import importlib
+from typing import Any, Dict, List, Tuple
+
+# Lazy registry of public names to (module, attribute). Modules are only imported the
+# first time one of their names is accessed, so running one miner does not load the
+# dependencies of every other backend.
+
 # Base Miner imports
-from .base.miner import BaseMiner as BaseMiner
-from .base.prompting_miner import BasePromptingMiner as BasePromptingMiner
+_REGISTRY: Dict[str, Tuple[str, str]] = {
+    "BaseMiner": (".base.miner", "BaseMiner"),
+    "BasePromptingMiner": (".base.prompting_miner", "BasePromptingMiner"),
+}
 
 # Miner imports.
-from .text_to_text.template.miner import TemplateMiner as TemplateMiner
-from .text_to_text.gpt4all.miner import GPT4ALLMiner as GPT4ALLMiner
-from .text_to_text.AI21.miner import AI21Miner as AI21Miner
-from .text_to_text.AlephAlpha.miner import AlephAlphaMiner as AlephAlphaMiner
-from .text_to_text.bloom.miner import BloomChatMiner as BloomChatMiner
-from .text_to_text.cohere.miner import CohereMiner as CohereMiner
-from .text_to_text.gooseai.miner import GooseMiner as GooseMiner
-from .text_to_text.koala.miner import KoalaMiner as KoalaMiner
-from .text_to_text.llama.miner import LlamaMiner as LlamaMiner
-from .text_to_text.neoxt.miner import NeoxtMiner as NeoxtMiner
-from .text_to_text.openai.miner import OpenAIMiner as OpenAIMiner
-from .text_to_text.pythia.miner import PythiaMiner as PythiaMiner
-from .text_to_text.robertmyers.miner import RobertMyersMiner as RobertMyersMiner
-from .text_to_text.stabilityai.miner import StabilityAIMiner as StabilityAIMiner
-from .text_to_text.vicuna.miner import VicunaMiner as VicunaMiner
-from .text_to_text.cerebras.miner import CerebrasMiner as CerebrasMiner
-from .text_to_text.falcon.miner import FalconMiner as FalconMiner
-from .text_to_text.hermes.miner import HermesMiner as HermesMiner
-from .text_to_text.bittensor_lm.miner import CerebrasBTLMMiner as BittensorLMMiner
+_REGISTRY.update(
+    {
+        "TemplateMiner": (".text_to_text.template.miner", "TemplateMiner"),
+        "GPT4ALLMiner": (".text_to_text.gpt4all.miner", "GPT4ALLMiner"),
+        "AI21Miner": (".text_to_text.AI21.miner", "AI21Miner"),
+        "AlephAlphaMiner": (".text_to_text.AlephAlpha.miner", "AlephAlphaMiner"),
+        "BloomChatMiner": (".text_to_text.bloom.miner", "BloomChatMiner"),
+        "CohereMiner": (".text_to_text.cohere.miner", "CohereMiner"),
+        "GooseMiner": (".text_to_text.gooseai.miner", "GooseMiner"),
+        "KoalaMiner": (".text_to_text.koala.miner", "KoalaMiner"),
+        "LlamaMiner": (".text_to_text.llama.miner", "LlamaMiner"),
+        "NeoxtMiner": (".text_to_text.neoxt.miner", "NeoxtMiner"),
+        "OpenAIMiner": (".text_to_text.openai.miner", "OpenAIMiner"),
+        "PythiaMiner": (".text_to_text.pythia.miner", "PythiaMiner"),
+        "RobertMyersMiner": (".text_to_text.robertmyers.miner", "RobertMyersMiner"),
+        "StabilityAIMiner": (".text_to_text.stabilityai.miner", "StabilityAIMiner"),
+        "VicunaMiner": (".text_to_text.vicuna.miner", "VicunaMiner"),
+        "CerebrasMiner": (".text_to_text.cerebras.miner", "CerebrasMiner"),
+        "FalconMiner": (".text_to_text.falcon.miner", "FalconMiner"),
+        "HermesMiner": (".text_to_text.hermes.miner", "HermesMiner"),
+        "AiroborosMiner": (".text_to_text.airoboros.miner", "AiroborosMiner"),
+        "BittensorLMMiner": (".text_to_text.bittensor_lm.miner", "CerebrasBTLMMiner"),
+        "RouterMiner": (".text_to_text.router.miner", "RouterMiner"),
+    }
+)
 
 # Lower case imports
-from .text_to_text.template.miner import TemplateMiner as template
-from .text_to_text.gpt4all.miner import GPT4ALLMiner as gpt4all
-from .text_to_text.AI21.miner import AI21Miner as ai21
-from .text_to_text.AlephAlpha.miner import AlephAlphaMiner as alephalpha
-from .text_to_text.bloom.miner import BloomChatMiner as bloom
-from .text_to_text.cohere.miner import CohereMiner as cohere
-from .text_to_text.gooseai.miner import GooseMiner as goose
-from .text_to_text.koala.miner import KoalaMiner as koala
-from .text_to_text.llama.miner import LlamaMiner as llama
-from .text_to_text.neoxt.miner import NeoxtMiner as neoxt
-from .text_to_text.openai.miner import OpenAIMiner as openai
-from .text_to_text.pythia.miner import PythiaMiner as pythia
-from .text_to_text.robertmyers.miner import RobertMyersMiner as robert
-from .text_to_text.stabilityai.miner import StabilityAIMiner as stability
-from .text_to_text.vicuna.miner import VicunaMiner as vicuna
-from .text_to_text.cerebras.miner import CerebrasMiner as cerebras
-from .text_to_text.falcon.miner import FalconMiner as falcon
-from .text_to_text.hermes.miner import HermesMiner as HermesMiner
-from .text_to_text.bittensor_lm.miner import CerebrasBTLMMiner as bittensor_lm
+_REGISTRY.update(
+    {
+        "template": _REGISTRY["TemplateMiner"],
+        "gpt4all": _REGISTRY["GPT4ALLMiner"],
+        "ai21": _REGISTRY["AI21Miner"],
+        "alephalpha": _REGISTRY["AlephAlphaMiner"],
+        "bloom": _REGISTRY["BloomChatMiner"],
+        "cohere": _REGISTRY["CohereMiner"],
+        "goose": _REGISTRY["GooseMiner"],
+        "koala": _REGISTRY["KoalaMiner"],
+        "llama": _REGISTRY["LlamaMiner"],
+        "neoxt": _REGISTRY["NeoxtMiner"],
+        "openai": _REGISTRY["OpenAIMiner"],
+        "pythia": _REGISTRY["PythiaMiner"],
+        "robert": _REGISTRY["RobertMyersMiner"],
+        "stability": _REGISTRY["StabilityAIMiner"],
+        "vicuna": _REGISTRY["VicunaMiner"],
+        "cerebras": _REGISTRY["CerebrasMiner"],
+        "falcon": _REGISTRY["FalconMiner"],
+        "hermes": _REGISTRY["HermesMiner"],
+        "airoboros": _REGISTRY["AiroborosMiner"],
+        "bittensor_lm": _REGISTRY["BittensorLMMiner"],
+        "router": _REGISTRY["RouterMiner"],
+    }
+)
+
+__all__: List[str] = list(_REGISTRY)
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        module, attribute = _REGISTRY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    value = getattr(importlib.import_module(module, __name__), attribute)
+    # Cache on the package so later lookups skip __getattr__.
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_REGISTRY))
@@ -0,0 +1,205 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import json
+from typing import Any, Dict, List, Optional
+
+from .async_backend import HTTPBackend
+from .chat_template import ROLE_LINES
+
+
+def format_history(messages: List[Dict[str, str]]) -> str:
+    """Renders messages as `role: content` lines for completion (not chat) APIs."""
+    return ROLE_LINES.render(messages)
+
+
+# Keyword arguments of HTTPBackend and AsyncBackend, the others are generation params.
+CONNECTION_KWARGS = (
+    "max_connections",
+    "keepalive_timeout",
+    "max_in_flight",
+    "timeout",
+    "stream",
+)
+
+
+def split_params(params: Dict[str, Any]):
+    """Splits keyword arguments into generation params, without unset ones, and
+    connection settings.
+    """
+    kwargs = {name: params.pop(name) for name in CONNECTION_KWARGS if name in params}
+    generation_params = {
+        name: value for name, value in params.items() if value is not None
+    }
+    return generation_params, kwargs
+
+
+def parse_event(line: bytes) -> Optional[Dict[str, Any]]:
+    """Returns the JSON body of a server-sent `data:` line, None for other lines and [DONE]."""
+    if not line.startswith(b"data:"):
+        return None
+    data = line[len(b"data:") :].strip()
+    if not data or data == b"[DONE]":
+        return None
+    return json.loads(data)
+
+
+class OpenAIBackend(HTTPBackend):
+    name = "openai"
+    stop_param = "stop"
+    supports_streaming = True
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-3.5-turbo",
+        base_url: str = "https://api.openai.com/v1",
+        **params,
+    ):
+        generation_params, kwargs = split_params(params)
+        super(OpenAIBackend, self).__init__(
+            f"{base_url}/chat/completions",
+            headers={"Authorization": f"Bearer {api_key}"},
+            **kwargs,
+        )
+        self.model = model
+        self.params = generation_params
+
+    def payload(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {"model": self.model, "messages": messages, **self.params}
+
+    def parse(self, body: Dict[str, Any]) -> str:
+        return body["choices"][0]["message"]["content"]
+
+    def parse_chunk(self, line: bytes) -> Optional[str]:
+        event = parse_event(line)
+        return event["choices"][0]["delta"].get("content") if event else None
+
+
+class CohereBackend(HTTPBackend):
+    name = "cohere"
+    stop_param = "stop_sequences"
+    supports_streaming = True
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "command-xlarge-nightly",
+        base_url: str = "https://api.cohere.ai/v1",
+        **params,
+    ):
+        generation_params, kwargs = split_params(params)
+        super(CohereBackend, self).__init__(
+            f"{base_url}/generate",
+            headers={"Authorization": f"Bearer {api_key}"},
+            **kwargs,
+        )
+        self.model = model
+        self.params = generation_params
+
+    def payload(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {"model": self.model, "prompt": format_history(messages), **self.params}
+
+    def parse(self, body: Dict[str, Any]) -> str:
+        return body["generations"][0]["text"]
+
+    def parse_chunk(self, line: bytes) -> Optional[str]:
+        # Streamed generations are newline delimited JSON objects.
+        return json.loads(line).get("text") if line else None
+
+
+class AI21Backend(HTTPBackend):
+    name = "ai21"
+    stop_param = "stopSequences"
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "j2-jumbo-instruct",
+        base_url: str = "https://api.ai21.com/studio/v1",
+        **params,
+    ):
+        generation_params, kwargs = split_params(params)
+        super(AI21Backend, self).__init__(
+            f"{base_url}/{model}/complete",
+            headers={"Authorization": f"Bearer {api_key}"},
+            **kwargs,
+        )
+        self.params = generation_params
+
+    def payload(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {"prompt": format_history(messages), **self.params}
+
+    def parse(self, body: Dict[str, Any]) -> str:
+        return body["completions"][0]["data"]["text"]
+
+
+class AlephAlphaBackend(HTTPBackend):
+    name = "alephalpha"
+    stop_param = "stop_sequences"
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "luminous-base",
+        base_url: str = "https://api.aleph-alpha.com",
+        **params,
+    ):
+        generation_params, kwargs = split_params(params)
+        super(AlephAlphaBackend, self).__init__(
+            f"{base_url}/complete",
+            headers={"Authorization": f"Bearer {api_key}"},
+            **kwargs,
+        )
+        self.model = model
+        self.params = generation_params
+
+    def payload(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {"model": self.model, "prompt": format_history(messages), **self.params}
+
+    def parse(self, body: Dict[str, Any]) -> str:
+        return body["completions"][0]["completion"]
+
+
+class GooseAIBackend(HTTPBackend):
+    name = "gooseai"
+    stop_param = "stop"
+    supports_streaming = True
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-neo-20b",
+        base_url: str = "https://api.goose.ai/v1",
+        **params,
+    ):
+        generation_params, kwargs = split_params(params)
+        super(GooseAIBackend, self).__init__(
+            f"{base_url}/engines/{model}/completions",
+            headers={"Authorization": f"Bearer {api_key}"},
+            **kwargs,
+        )
+        self.params = generation_params
+
+    def payload(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {"prompt": format_history(messages), **self.params}
+
+    def parse(self, body: Dict[str, Any]) -> str:
+        return body["choices"][0]["text"]
+
+    def parse_chunk(self, line: bytes) -> Optional[str]:
+        event = parse_event(line)
+        return event["choices"][0]["text"] if event else None
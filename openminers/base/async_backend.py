@@ -0,0 +1,226 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import asyncio
+import threading
+import aiohttp
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Coroutine, Dict, List, Optional
+
+from .stop_strings import StopStringMatcher, aconsume
+
+
+class EventLoopThread:
+    """Runs an asyncio event loop in a daemon thread for synchronous callers."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def run(self, coroutine: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Runs coroutine on the loop and blocks the calling thread on its result."""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+
+_event_loop_thread: EventLoopThread = None
+_event_loop_lock = threading.Lock()
+
+
+def event_loop_thread() -> EventLoopThread:
+    """Returns the event loop shared by every backend of the process."""
+    global _event_loop_thread
+    with _event_loop_lock:
+        if _event_loop_thread is None:
+            _event_loop_thread = EventLoopThread()
+        return _event_loop_thread
+
+
+class AsyncBackend(ABC):
+    """Completion backend whose requests run concurrently on the shared event loop.
+
+    Subclasses implement `acomplete`. `agenerate` holds at most `max_in_flight`
+    requests at once and fails with asyncio.TimeoutError once the deadline passes,
+    time spent waiting for a slot included. `generate` is the blocking version for
+    the forward functions of miners.
+    """
+
+    name: str = "backend"
+
+    def __init__(self, max_in_flight: int = 256, timeout: float = 12.0):
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.loop_thread = event_loop_thread()
+        self.semaphore: asyncio.Semaphore = None
+        self.in_flight = 0
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "timeouts": 0}
+
+    @abstractmethod
+    async def acomplete(self, messages: List[Dict[str, str]]) -> str:
+        ...
+
+    async def agenerate(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
+        """Returns the completion of messages, deadline is a time.time() timestamp."""
+        timeout = self.timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.time())
+        self.stats["requests"] += 1
+        try:
+            if timeout <= 0:
+                raise asyncio.TimeoutError("deadline passed before the request")
+            return await asyncio.wait_for(self._limited(messages), timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+
+    def generate(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
+        return self.loop_thread.run(self.agenerate(messages, deadline))
+
+    async def aclose(self):
+        pass
+
+    def close(self):
+        self.loop_thread.run(self.aclose())
+
+    async def _limited(self, messages: List[Dict[str, str]]) -> str:
+        # Created on the loop, older Pythons bind semaphores to the current loop.
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with self.semaphore:
+            self.in_flight += 1
+            try:
+                return await self.acomplete(messages)
+            finally:
+                self.in_flight -= 1
+
+
+class HTTPBackend(AsyncBackend):
+    """Backend POSTing one JSON request per completion through a keep-alive connection pool.
+
+    Subclasses build the request body with `payload` and extract the completion from
+    the response body with `parse`. The pool keeps up to `max_connections` open
+    connections to the API and reuses them across requests.
+
+    Completions are cut at the first of the stop strings found in the params under
+    `stop_param`, whether or not the provider honoured them. With `stream`, backends
+    that implement `parse_chunk` read the completion as it is generated and close
+    the response at the first stop string, so the provider stops generating.
+    """
+
+    # Name of the generation param holding the stop strings of the provider.
+    stop_param: Optional[str] = None
+    supports_streaming: bool = False
+
+    def __init__(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        max_connections: int = 100,
+        keepalive_timeout: float = 60.0,
+        stream: bool = False,
+        **kwargs,
+    ):
+        super(HTTPBackend, self).__init__(**kwargs)
+        self.url = url
+        self.headers = headers or {}
+        self.max_connections = max_connections
+        self.keepalive_timeout = keepalive_timeout
+        self.stream = stream and self.supports_streaming
+        self.session: aiohttp.ClientSession = None
+        self.params: Dict[str, Any] = {}
+        self._stop_matcher: Optional[StopStringMatcher] = None
+
+    @classmethod
+    def from_config(cls, config: "bt.Config", **kwargs) -> "HTTPBackend":
+        """Builds the backend with the --neuron.api_* connection settings of config."""
+        if config.neuron.api_base_url:
+            kwargs["base_url"] = config.neuron.api_base_url
+        return cls(
+            max_connections=config.neuron.api_max_connections,
+            max_in_flight=config.neuron.api_max_in_flight,
+            timeout=config.neuron.api_timeout,
+            stream=config.neuron.api_stream,
+            **kwargs,
+        )
+
+    @abstractmethod
+    def payload(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def parse(self, body: Dict[str, Any]) -> str:
+        ...
+
+    def parse_chunk(self, line: bytes) -> Optional[str]:
+        """Returns the text carried by one line of a streamed response, if any."""
+        raise NotImplementedError
+
+    @property
+    def stop_matcher(self) -> Optional[StopStringMatcher]:
+        stops = self.params.get(self.stop_param) if self.stop_param else None
+        if isinstance(stops, str):
+            stops = [stops]
+        if self._stop_matcher is None and stops:
+            self._stop_matcher = StopStringMatcher(stops)
+        return self._stop_matcher
+
+    async def _chunks(self, response: aiohttp.ClientResponse) -> AsyncIterator[str]:
+        async for line in response.content:
+            text = self.parse_chunk(line.strip())
+            if text:
+                yield text
+
+    async def acomplete(self, messages: List[Dict[str, str]]) -> str:
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections,
+                    keepalive_timeout=self.keepalive_timeout,
+                ),
+                headers=self.headers,
+                raise_for_status=True,
+            )
+        matcher = self.stop_matcher
+        if self.stream and matcher is not None:
+            payload = {**self.payload(messages), "stream": True}
+            async with self.session.post(self.url, json=payload) as response:
+                stream = await aconsume(self._chunks(response), matcher)
+                if stream.stopped:
+                    # Drop the connection instead of reading the rest of the stream.
+                    response.close()
+                return stream.text
+
+        async with self.session.post(self.url, json=self.payload(messages)) as response:
+            text = self.parse(await response.json())
+        return matcher.cut(text) if matcher is not None else text
+
+    async def aclose(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
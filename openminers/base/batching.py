@@ -0,0 +1,186 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import queue
+import torch
+import threading
+import bittensor as bt
+from concurrent.futures import Future, TimeoutError
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Tuple
+from openminers.base.deadline import (
+    DeadlineExpired,
+    accepts_deadline,
+    max_time_kwargs,
+    remaining,
+)
+
+if TYPE_CHECKING:
+    from openminers.base.stopping import StopSequences
+
+
+class BatchScheduler:
+    """Collects concurrent requests into batches for a single batched call.
+
+    Requests submitted within `batch_window` seconds of the first queued request
+    are grouped, up to `max_batch_size`, and passed together to `generate_fn`. The
+    i-th output of `generate_fn` is returned to the caller that submitted the i-th
+    input, errors are raised in every caller of the failed batch.
+
+    Items submitted with a deadline are dropped if it passes while they are queued
+    and their caller stops waiting at it. When `generate_fn` takes a deadline, it
+    gets the latest one of the batch, None if any item has none.
+    """
+
+    def __init__(
+        self,
+        generate_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int,
+        batch_window: float,
+    ):
+        self.generate_fn = generate_fn
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.pass_deadline = accepts_deadline(generate_fn)
+        self.queue: "queue.Queue[Tuple[Any, Optional[float], Future]]" = queue.Queue()
+        self.should_exit: bool = False
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, item: Any, deadline: Optional[float] = None) -> Any:
+        """Queues an item and blocks until its batch has been generated.
+
+        Raises DeadlineExpired once the time.time() deadline has passed.
+        """
+        future = Future()
+        self.queue.put((item, deadline, future))
+        try:
+            return future.result(timeout=remaining(deadline))
+        except TimeoutError:
+            raise DeadlineExpired()
+
+    def stop(self):
+        self.should_exit = True
+        self.thread.join(5)
+
+    def _collect(self) -> List[Tuple[Any, Optional[float], Future]]:
+        try:
+            batch = [self.queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Drain already queued requests even once the window has closed.
+                batch.append(
+                    self.queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self.queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while not self.should_exit:
+            now = time.time()
+            batch = []
+            for item, deadline, future in self._collect():
+                if deadline is not None and now >= deadline:
+                    future.set_exception(DeadlineExpired())
+                else:
+                    batch.append((item, deadline, future))
+            if not batch:
+                continue
+
+            items = [item for item, _, _ in batch]
+            deadlines = [deadline for _, deadline, _ in batch]
+            kwargs = {}
+            if self.pass_deadline:
+                kwargs["deadline"] = None if None in deadlines else max(deadlines)
+            try:
+                outputs = self.generate_fn(items, **kwargs)
+                if len(outputs) != len(batch):
+                    raise ValueError(
+                        f"Expected {len(batch)} outputs from batched generation, got {len(outputs)}"
+                    )
+                for (_, _, future), output in zip(batch, outputs):
+                    future.set_result(output)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                bt.logging.error(f"Error in batched generation: {e}")
+
+
+def generate_batch(
+    model: "torch.nn.Module",
+    tokenizer: "transformers.PreTrainedTokenizer",
+    prompts: List[str],
+    device: Any = None,
+    stop_sequences: Optional["StopSequences"] = None,
+    deadline: Optional[float] = None,
+    **generate_kwargs,
+) -> List[str]:
+    """Left-pads prompts, runs one `generate` call and decodes only the new tokens of each row.
+
+    With stop_sequences, generation ends once every row has produced one and each
+    row is cut before its own stop sequence. With a deadline, it ends there.
+    """
+    from transformers import StoppingCriteriaList
+
+    pad_token_id = tokenizer.pad_token_id
+    if pad_token_id is None:
+        pad_token_id = tokenizer.eos_token_id
+
+    # Padded by hand, the tokenizer is shared with the miner and keeps its own settings.
+    encoded = tokenizer(prompts)["input_ids"]
+    length = max(len(ids) for ids in encoded)
+    inputs = {
+        "input_ids": torch.tensor(
+            [[pad_token_id] * (length - len(ids)) + ids for ids in encoded]
+        ),
+        "attention_mask": torch.tensor(
+            [[0] * (length - len(ids)) + [1] * len(ids) for ids in encoded]
+        ),
+    }
+    if device is not None:
+        inputs = {name: tensor.to(device) for name, tensor in inputs.items()}
+
+    stop = None
+    if stop_sequences is not None:
+        stop = stop_sequences.criteria()
+        generate_kwargs["stopping_criteria"] = StoppingCriteriaList(
+            [*generate_kwargs.get("stopping_criteria", []), stop]
+        )
+
+    with torch.inference_mode():
+        output = model.generate(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            pad_token_id=pad_token_id,
+            **generate_kwargs,
+            **max_time_kwargs(deadline),
+        )
+    if stop is not None:
+        output = stop.truncate(output, pad_token_id)
+
+    return tokenizer.batch_decode(
+        output[:, inputs["input_ids"].shape[1] :], skip_special_tokens=True
+    )
@@ -14,40 +14,40 @@
 # THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
-import time
-import json
-import wandb
-import hashlib
 import bittensor as bt
 from typing import Union, Tuple, Callable
 
+from .prompt_cache import hash_messages
+
 
 def is_prompt_in_cache(self, forward_call: "bt.TextPromptingForwardCall") -> bool:
-    # Hashes prompt
-    # Note: Could be improved using a similarity check
-    prompt = json.dumps(list(forward_call.messages))
-    prompt_key = hashlib.sha256(prompt.encode()).hexdigest()
-    current_block = self.metagraph.block
+    # Hashes prompt, near duplicates are caught by is_prompt_near_duplicate
+    prompt_key = hash_messages(forward_call.messages)
+    current_block = self.block_tracker.block
+
+    # Sanitize cache first so prompts older than the block span do not match
+    self.prompt_cache.expire(
+        current_block - self.config.miner.blacklist.prompt_cache_block_span
+    )
 
-    should_blacklist: bool
     # Check if prompt is in cache, if not add it
-    if prompt_key in self.prompt_cache:
-        should_blacklist = True
-    else:
-        caller_hotkey = forward_call.src_hotkey
-        self.prompt_cache[prompt_key] = (caller_hotkey, current_block)
-        should_blacklist = False
+    return self.prompt_cache.check_and_add(
+        prompt_key, forward_call.src_hotkey, current_block
+    )
 
-    # Sanitize cache by removing old entries according to block span
-    keys_to_remove = []
-    for key, (_, block) in self.prompt_cache.items():
-        if block + self.config.miner.blacklist.prompt_cache_block_span < current_block:
-            keys_to_remove.append(key)
 
-    for key in keys_to_remove:
-        del self.prompt_cache[key]
+def is_prompt_near_duplicate(self, forward_call: "bt.TextPromptingForwardCall") -> bool:
+    # MinHash signature of the prompt
+    signature = self.near_duplicate_index.signature(forward_call.messages)
+    current_block = self.block_tracker.block
 
-    return should_blacklist
+    # Sanitize index first so only prompts within the block span can match
+    self.near_duplicate_index.expire(
+        current_block - self.config.miner.blacklist.prompt_cache_block_span
+    )
+
+    # Check if a similar prompt is in the index, if not add it
+    return self.near_duplicate_index.check_and_add(signature, current_block)
 
 
 def default_blacklist(
@@ -62,34 +62,31 @@ def default_blacklist(
         return True, "blacklisted hotkey"
 
     # Check registration if we do not allow non-registered users
-    if (
-        not self.config.miner.blacklist.allow_non_registered
-        and self.metagraph is not None
-        and forward_call.src_hotkey not in self.metagraph.hotkeys
-    ):
+    uid = self.metagraph_view.uid(forward_call.src_hotkey)
+    if not self.config.miner.blacklist.allow_non_registered and uid is None:
         return True, "hotkey not registered"
 
-    # If the user is registered, it has a UID.
-    uid = self.metagraph.hotkeys.index(forward_call.src_hotkey)
-
     # Check if the key has validator permit
-    if (
-        self.config.miner.blacklist.force_validator_permit
-        and not self.metagraph.validator_permit[uid]
+    if self.config.miner.blacklist.force_validator_permit and (
+        uid is None or not self.metagraph_view.validator_permit[uid]
     ):
         return True, "validator permit required"
 
     if is_prompt_in_cache(self, forward_call):
         return True, "prompt already sent recently"
 
-    # request period
-    if forward_call.src_hotkey in self.request_timestamps:
-        period = time.time() - self.request_timestamps[forward_call.src_hotkey][0]
-        if period < self.config.miner.blacklist.min_request_period * 60:
-            return (
-                True,
-                f"{forward_call.src_hotkey} request frequency exceeded {len(self.request_timestamps[forward_call.src_hotkey])} requests in {self.config.miner.blacklist.min_request_period} minutes.",
-            )
+    if self.near_duplicate_index is not None and is_prompt_near_duplicate(
+        self, forward_call
+    ):
+        return True, "similar prompt already sent recently"
+
+    # Rate limit, passing requests take a token from the bucket of the hotkey.
+    stake = self.metagraph_view.stake[uid] if uid is not None else 0.0
+    if not self.rate_limiter.acquire(forward_call.src_hotkey, stake=stake):
+        return (
+            True,
+            f"{forward_call.src_hotkey} request rate exceeded, burst of {self.rate_limiter.burst} requests refilled at {self.rate_limiter.refill_rate * 60:.2f} per minute.",
+        )
 
     # Otherwise the user is not blacklisted.
     return False, "passed blacklist"
@@ -130,12 +127,15 @@ def blacklist(
 
         # Finally, log and return the blacklist result.
         bt.logging.trace(f"blacklisted: {does_blacklist}, reason: {reason}")
-        if does_blacklist and self.config.wandb.on:
-            wandb.log(
+        self.telemetry.increment("blacklist_calls")
+        if does_blacklist:
+            self.telemetry.increment("blacklisted")
+            self.telemetry.log(
+                "blacklist",
                 {
                     "blacklisted": float(does_blacklist),
                     "return_message": reason,
                     "hotkey": forward_call.src_hotkey,
-                }
+                },
             )
         return does_blacklist, reason
@@ -0,0 +1,98 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import threading
+import bittensor as bt
+
+# Target block time of the chain in seconds.
+BLOCK_TIME = 12.0
+
+
+class BlockTracker:
+    """Keeps an estimate of the chain block height without an RPC per read.
+
+    A background thread refreshes the height from subtensor every
+    `refresh_interval` seconds and reads in between extrapolate from the block time.
+    Estimates never move backwards. `staleness` is the number of seconds since the
+    last successful refresh, so callers can tell when the estimate may have drifted.
+    """
+
+    def __init__(
+        self,
+        subtensor: "bt.Subtensor",
+        refresh_interval: float = BLOCK_TIME,
+        block_time: float = BLOCK_TIME,
+    ):
+        self.subtensor = subtensor
+        self.refresh_interval = refresh_interval
+        self.block_time = block_time
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: threading.Thread = None
+
+        self.last_block: int = 0
+        self.last_refresh: float = None
+        self.highest_block: int = 0
+
+    @property
+    def block(self) -> int:
+        with self.lock:
+            if self.last_refresh is None:
+                return self.highest_block
+            elapsed = time.monotonic() - self.last_refresh
+            estimate = self.last_block + int(elapsed / self.block_time)
+            self.highest_block = max(self.highest_block, estimate)
+            return self.highest_block
+
+    @property
+    def staleness(self) -> float:
+        """Seconds since the last successful refresh, inf before the first one."""
+        if self.last_refresh is None:
+            return float("inf")
+        return time.monotonic() - self.last_refresh
+
+    def refresh(self) -> int:
+        """Reads the current block from subtensor and returns the new estimate."""
+        block = int(self.subtensor.get_current_block())
+        with self.lock:
+            self.last_block = block
+            self.last_refresh = time.monotonic()
+            self.highest_block = max(self.highest_block, block)
+        return self.block
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(5)
+            self.thread = None
+
+    def _loop(self):
+        while not self.stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                bt.logging.warning(
+                    f"Failed to refresh block, estimate is {self.staleness:.0f}s stale: {e}"
+                )
@@ -0,0 +1,201 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Stands in for the content while splitting a role format into its markers.
+_CONTENT = "\x00content\x00"
+
+
+@dataclass
+class ChatTemplate:
+    """How a miner renders chat messages into a prompt for its model.
+
+    `roles` maps each role to a format string of the message `content`, or to None
+    to leave the role out. Messages of other roles are rendered with `other_roles`,
+    or left out when it is None. Contents are stripped unless `strip` is False. The
+    model completes `generation_prompt`, appended to the rendered messages, and its
+    text is cut at the first of the `stop` strings.
+
+    Role formats are compiled once into the markers around the content, rendering
+    joins markers and contents in a single pass.
+    """
+
+    roles: Dict[str, Optional[str]]
+    generation_prompt: str = ""
+    stop: List[str] = field(default_factory=list)
+    strip: bool = True
+    other_roles: Optional[str] = None
+
+    def __post_init__(self):
+        self.markers: Dict[str, Optional[Tuple[str, str]]] = {
+            role: None if template is None else self._compile(template)
+            for role, template in self.roles.items()
+        }
+        self.other_markers: Optional[Tuple[str, str]] = (
+            None if self.other_roles is None else self._compile(self.other_roles)
+        )
+
+    @staticmethod
+    def _compile(template: str) -> Tuple[str, str]:
+        prefix, suffix = template.format(content=_CONTENT).split(_CONTENT)
+        return prefix, suffix
+
+    def marker(self, role: str) -> Optional[Tuple[str, str]]:
+        return self.markers.get(role, self.other_markers)
+
+    def messages(
+        self, messages: List[Dict[str, str]], system_prompt: Optional[str] = None
+    ) -> Iterator[Tuple[str, str]]:
+        """Yields the (role, content) pairs rendered, a system_prompt replaces a leading system message."""
+        marker, strip = self.marker, self.strip
+        for index, message in enumerate(messages):
+            role = message["role"]
+            if marker(role) is None:
+                continue
+            if index == 0 and role == "system" and system_prompt is not None:
+                continue
+            yield role, message["content"].strip() if strip else message["content"]
+
+    def render(
+        self, messages: List[Dict[str, str]], system_prompt: Optional[str] = None
+    ) -> str:
+        """Renders messages, a system_prompt replaces a leading system message."""
+        get, other_markers, strip = self.markers.get, self.other_markers, self.strip
+        parts = []
+        if system_prompt is not None:
+            parts.append(system_prompt)
+            if messages and messages[0]["role"] == "system":
+                messages = messages[1:]
+        append = parts.append
+        for message in messages:
+            marker = get(message["role"], other_markers)
+            if marker is not None:
+                content = message["content"]
+                append(marker[0])
+                append(content.strip() if strip else content)
+                append(marker[1])
+        return "".join(parts)
+
+    def postprocess(self, text: str) -> str:
+        """Cuts text at the first stop string, stripping it when there are stops."""
+        if not self.stop:
+            return text
+        for stop in self.stop:
+            text = text.split(stop)[0]
+        return text.strip()
+
+    def tokenized(
+        self, tokenizer: "transformers.PreTrainedTokenizer", max_cached: int = 4096
+    ) -> "TokenizedChatTemplate":
+        return TokenizedChatTemplate(self, tokenizer, max_cached)
+
+
+class TokenizedChatTemplate:
+    """A ChatTemplate rendering messages straight to token ids.
+
+    Role markers, the generation prompt and system prompts are tokenized once.
+    Contents are tokenized in one batched call, and kept in an LRU of `max_cached`
+    entries since every turn of a conversation sends the earlier messages again.
+    Markers and contents are tokenized apart, so the ids can differ from those of
+    the rendered text where a tokenizer merges characters across their boundary.
+    """
+
+    def __init__(
+        self,
+        template: ChatTemplate,
+        tokenizer: "transformers.PreTrainedTokenizer",
+        max_cached: int = 4096,
+    ):
+        self.template = template
+        self.tokenizer = tokenizer
+        self.max_cached = max_cached
+        self.markers: Dict[str, Tuple[List[int], List[int]]] = {
+            role: (self.encode(marker[0]), self.encode(marker[1]))
+            for role, marker in template.markers.items()
+            if marker is not None
+        }
+        self.other_markers: Optional[Tuple[List[int], List[int]]] = None
+        if template.other_markers is not None:
+            prefix, suffix = template.other_markers
+            self.other_markers = (self.encode(prefix), self.encode(suffix))
+        self.generation_prompt = self.encode(template.generation_prompt)
+        self.cache: "OrderedDict[str, List[int]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+    def encode(self, text: str) -> List[int]:
+        return self.tokenizer.encode(text, add_special_tokens=False) if text else []
+
+    def _contents(self, contents: List[str]) -> List[List[int]]:
+        with self.lock:
+            return self._cached_contents(contents)
+
+    def _cached_contents(self, contents: List[str]) -> List[List[int]]:
+        cache = self.cache
+        missing = [
+            content for content in dict.fromkeys(contents) if content not in cache
+        ]
+        self.stats["hits"] += len(contents) - len(missing)
+        self.stats["misses"] += len(missing)
+        if missing:
+            encoded = self.tokenizer(missing, add_special_tokens=False)["input_ids"]
+            cache.update(zip(missing, encoded))
+        ids = []
+        for content in contents:
+            cache.move_to_end(content)
+            ids.append(cache[content])
+        while len(cache) > self.max_cached:
+            cache.popitem(last=False)
+        return ids
+
+    def render(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None,
+        add_generation_prompt: bool = False,
+    ) -> List[int]:
+        """Token ids of the rendered messages, followed by the generation prompt if asked."""
+        selected = list(self.template.messages(messages, system_prompt))
+        ids: List[int] = []
+        if system_prompt is not None:
+            ids += self._contents([system_prompt])[0]
+        contents = self._contents([content for _, content in selected])
+        markers, other_markers = self.markers, self.other_markers
+        for (role, _), content_ids in zip(selected, contents):
+            prefix, suffix = markers.get(role, other_markers)
+            ids += prefix
+            ids += content_ids
+            ids += suffix
+        if add_generation_prompt:
+            ids += self.generation_prompt
+        return ids
+
+
+# `role: content` lines, the prompt format of most miners without a chat template of
+# their own and of the completion (not chat) APIs.
+ROLE_LINES = ChatTemplate(
+    roles={
+        "system": "system: {content}\n",
+        "assistant": "assistant: {content}\n",
+        "user": "user: {content}\n",
+    },
+    strip=False,
+)
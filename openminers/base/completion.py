@@ -0,0 +1,79 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import torch
+from typing import Any, Dict, List, Sequence
+
+
+def decode_new_tokens(
+    tokenizer: "transformers.PreTrainedTokenizer",
+    sequences: torch.Tensor,
+    prompt_length: int,
+) -> List[str]:
+    """Decodes the tokens of each sequence after its first prompt_length tokens."""
+    return tokenizer.batch_decode(
+        sequences[:, prompt_length:], skip_special_tokens=True
+    )
+
+
+def trim_completion(text: str, stop: Sequence[str] = ()) -> str:
+    """Returns text up to the first stop sequence, without surrounding whitespace.
+
+    A stop sequence opening the text is dropped first, since models often start
+    their answer with the role marker of the assistant.
+    """
+    text = text.strip()
+    for marker in stop:
+        if text.startswith(marker):
+            text = text[len(marker) :]
+            break
+    end = len(text)
+    for marker in stop:
+        index = text.find(marker, 0, end)
+        if index >= 0:
+            end = index
+    return text[:end].strip()
+
+
+def _new_tokens_pipeline() -> type:
+    from transformers import TextGenerationPipeline
+
+    class NewTokensPipeline(TextGenerationPipeline):
+        """Text generation pipeline returning only the text of the new tokens.
+
+        The stock pipeline decodes the prompt and completion, then decodes the
+        prompt again to cut it off. This one slices the token ids at the prompt
+        length and decodes the new tokens only. Pass it as pipeline_class to
+        transformers.pipeline.
+        """
+
+        def postprocess(self, model_outputs, **kwargs) -> List[Dict[str, str]]:
+            input_ids = model_outputs["input_ids"]
+            prompt_length = 0 if input_ids is None else input_ids.shape[1]
+            texts = decode_new_tokens(
+                self.tokenizer, model_outputs["generated_sequence"][0], prompt_length
+            )
+            return [{"generated_text": text} for text in texts]
+
+    return NewTokensPipeline
+
+
+def __getattr__(name: str) -> Any:
+    # NewTokensPipeline subclasses a transformers pipeline, only import it when asked for.
+    if name != "NewTokensPipeline":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = _new_tokens_pipeline()
+    return value
@@ -44,6 +44,12 @@ def add_args(cls, parser: argparse.ArgumentParser):
         help="Blocks until the miner sets weights on chain",
         default=100,
     )
+    parser.add_argument(
+        "--miner.block_refresh_interval",
+        type=float,
+        help="Seconds between block height refreshes, reads in between extrapolate from the block time.",
+        default=12.0,
+    )
 
     # Blacklist.
     parser.add_argument(
@@ -86,11 +92,63 @@ def add_args(cls, parser: argparse.ArgumentParser):
         help="Amount of blocks to keep a prompt in cache",
         default=50,
     )
+    parser.add_argument(
+        "--miner.blacklist.near_duplicate_threshold",
+        type=float,
+        help="Blacklist prompts whose estimated Jaccard similarity to a cached prompt reaches this threshold, 0 disables it",
+        default=0.0,
+    )
+    parser.add_argument(
+        "--miner.blacklist.near_duplicate_max_entries",
+        type=int,
+        help="Maximum number of prompts kept for near duplicate detection",
+        default=100000,
+    )
+    parser.add_argument(
+        "--miner.blacklist.rate_limit_burst",
+        type=float,
+        help="Maximum number of requests a hotkey can send in a burst",
+        default=50,
+    )
+    parser.add_argument(
+        "--miner.blacklist.rate_limit_refill",
+        type=float,
+        help="Requests per minute added back to the burst of each hotkey",
+        default=50 / 30,
+    )
+    parser.add_argument(
+        "--miner.blacklist.rate_limit_stake_scale",
+        type=float,
+        help="Stake at which the burst and refill rate of a hotkey double, 0 disables stake scaling",
+        default=0.0,
+    )
+
+    # Deprecated, mapped onto the token bucket rate limit by check_config.
     parser.add_argument(
         "--miner.blacklist.min_request_period",
         type=int,
-        help="Time period (in minute) to serve a maximum of 50 requests for each hotkey",
-        default=30,
+        help="Deprecated, use --miner.blacklist.rate_limit_refill. Time period (in minute) to serve --miner.priority.len_request_timestamps requests for each hotkey",
+        default=None,
+    )
+    parser.add_argument(
+        "--miner.priority.len_request_timestamps",
+        type=int,
+        help="Deprecated, use --miner.blacklist.rate_limit_burst. Number of requests each hotkey can send per --miner.blacklist.min_request_period",
+        default=None,
+    )
+
+    # Shared state.
+    parser.add_argument(
+        "--miner.shared_state.path",
+        type=str,
+        help="Share the prompt cache and rate limits with every miner process using this path prefix, files are memory mapped so /dev/shm is a good location",
+        default=None,
+    )
+    parser.add_argument(
+        "--miner.shared_state.capacity",
+        type=int,
+        help="Number of entries of each shared table",
+        default=2**16,
     )
 
     # Priority.
@@ -109,12 +167,6 @@ def add_args(cls, parser: argparse.ArgumentParser):
         help="Time (in minute) it takes to make the stake twice more important in the priority queue",
         default=10,
     )
-    parser.add_argument(
-        "--miner.priority.len_request_timestamps",
-        type=int,
-        help="Number of historic request timestamps to record",
-        default=50,
-    )
     # Switches.
     parser.add_argument(
         "--miner.no_set_weights",
@@ -166,6 +218,38 @@ def add_args(cls, parser: argparse.ArgumentParser):
         default=None,
     )
 
+    # Telemetry
+    parser.add_argument(
+        "--miner.telemetry.sample_rate",
+        type=int,
+        help="Log the full payload of 1 in N requests, counters are aggregated for every request.",
+        default=1,
+    )
+    parser.add_argument(
+        "--miner.telemetry.max_queue_size",
+        type=int,
+        help="Records waiting to be flushed before new ones are dropped.",
+        default=10000,
+    )
+    parser.add_argument(
+        "--miner.telemetry.flush_interval",
+        type=float,
+        help="Maximum seconds a record waits before being flushed.",
+        default=1.0,
+    )
+    parser.add_argument(
+        "--miner.telemetry.jsonl_path",
+        type=str,
+        help="Append telemetry records to this JSONL file.",
+        default=None,
+    )
+    parser.add_argument(
+        "--miner.telemetry.sqlite_path",
+        type=str,
+        help="Insert telemetry records into this SQLite database.",
+        default=None,
+    )
+
     bt.wallet.add_args(parser)
     bt.axon.add_args(parser)
     bt.subtensor.add_args(parser)
@@ -185,7 +269,31 @@ def help(cls):
     parser.print_help()
 
 
+def map_deprecated_args(config: "bt.Config"):
+    """Maps the removed request period flags onto the token bucket rate limit.
+
+    They allowed len_request_timestamps requests per min_request_period minutes,
+    which is a burst of that many requests refilled over the period.
+    """
+    period = config.miner.blacklist.get("min_request_period")
+    length = config.miner.priority.get("len_request_timestamps")
+    if period is None and length is None:
+        return
+
+    bt.logging.warning(
+        "--miner.blacklist.min_request_period and --miner.priority.len_request_timestamps "
+        "are deprecated, use --miner.blacklist.rate_limit_burst and "
+        "--miner.blacklist.rate_limit_refill instead."
+    )
+    if length is not None:
+        config.miner.blacklist.rate_limit_burst = length
+    config.miner.blacklist.rate_limit_refill = (
+        config.miner.blacklist.rate_limit_burst / (period if period is not None else 30)
+    )
+
+
 def check_config(cls, config: "bt.Config"):
+    map_deprecated_args(config)
     bt.axon.check_config(config)
     bt.wallet.check_config(config)
     bt.logging.check_config(config)
@@ -0,0 +1,432 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import copy
+import time
+import queue
+import torch
+import threading
+import bittensor as bt
+from concurrent.futures import Future, TimeoutError
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .deadline import DeadlineExpired, remaining
+
+if TYPE_CHECKING:
+    from .stopping import StopSequences
+
+# Legacy cache layout: one (key, value) pair per layer, each (batch, heads, seq, head_dim).
+PastKeyValues = Tuple[Tuple[torch.Tensor, torch.Tensor], ...]
+
+
+def _left_pad(past_key_values: PastKeyValues, length: int) -> PastKeyValues:
+    pad = length - past_key_values[0][0].shape[-2]
+    if pad == 0:
+        return past_key_values
+    return tuple(
+        (
+            torch.nn.functional.pad(key, (0, 0, pad, 0)),
+            torch.nn.functional.pad(value, (0, 0, pad, 0)),
+        )
+        for key, value in past_key_values
+    )
+
+
+class _Sequence:
+    def __init__(
+        self,
+        input_ids: List[int],
+        max_new_tokens: int,
+        future: Future,
+        deadline: Optional[float] = None,
+    ):
+        self.input_ids = input_ids
+        self.max_new_tokens = max_new_tokens
+        self.future = future
+        self.deadline = deadline
+        self.generated: List[int] = []
+
+
+class ContinuousBatchingEngine:
+    """Iteration-level batching of token generation.
+
+    Where BatchScheduler runs fixed batches through `generate`, the engine owns the
+    decode loop: new requests are prefilled and joined to the running batch between
+    decode steps and finished sequences leave it straight away, so short requests
+    never wait for the longest sequence of their batch. The key/value cache of the
+    running batch is kept left-padded in the (batch, heads, seq, head_dim) layout
+    used by GPT-2, GPT-NeoX and LLaMA models.
+
+    Takes the generate kwargs and stop_sequences of generate_batch and exposes the
+    same blocking `submit(prompt)` as BatchScheduler. A sequence given a deadline
+    leaves the batch with the tokens generated so far once it passes.
+    """
+
+    def __init__(
+        self,
+        model: "torch.nn.Module",
+        tokenizer: "transformers.PreTrainedTokenizer",
+        max_batch_size: int,
+        device: Any = None,
+        stop_sequences: Optional["StopSequences"] = None,
+        **generate_kwargs,
+    ):
+        if (
+            generate_kwargs.get("max_new_tokens") is None
+            and generate_kwargs.get("max_length") is None
+        ):
+            raise ValueError("One of max_new_tokens or max_length is required.")
+
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.device = device if device is not None else model.device
+        self.stop_sequences = stop_sequences
+        self._configure(generate_kwargs)
+
+        # State of the running batch, only touched by the engine thread.
+        self.active: List[_Sequence] = []
+        self.past_key_values: PastKeyValues = None
+        self.attention_mask: torch.LongTensor = None
+        self.next_tokens: torch.LongTensor = None
+
+        self.queue: "queue.Queue[Tuple[str, Optional[int], Optional[float], Future]]" = (
+            queue.Queue()
+        )
+        self.should_exit: bool = False
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def _configure(self, generate_kwargs: Dict[str, Any]):
+        """Reads generate kwargs the way `generate` does, on top of model.generation_config.
+
+        The engine only decodes one greedy or sampled sequence per prompt, kwargs
+        asking for anything else raise a ValueError. `logits_processor` and
+        `stopping_criteria` are applied to each row on its own.
+        """
+        from transformers import (
+            LogitsProcessorList,
+            NoBadWordsLogitsProcessor,
+            NoRepeatNGramLogitsProcessor,
+            RepetitionPenaltyLogitsProcessor,
+            TemperatureLogitsWarper,
+            TopKLogitsWarper,
+            TopPLogitsWarper,
+            TypicalLogitsWarper,
+        )
+
+        generate_kwargs = dict(generate_kwargs)
+        self.processors = LogitsProcessorList(
+            generate_kwargs.pop("logits_processor", None) or []
+        )
+        self.stopping_criteria = list(
+            generate_kwargs.pop("stopping_criteria", None) or []
+        )
+        config = copy.deepcopy(self.model.generation_config)
+        unused = config.update(**generate_kwargs)
+        if unused:
+            bt.logging.warning(
+                f"Continuous batching ignores generate kwargs {sorted(unused)}"
+            )
+        if (
+            config.num_beams > 1
+            or config.num_return_sequences > 1
+            or config.penalty_alpha is not None
+            or config.constraints
+            or config.force_words_ids
+        ):
+            raise ValueError(
+                "Continuous batching only supports greedy search and sampling."
+            )
+
+        self.max_new_tokens = config.max_new_tokens
+        self.max_length = config.max_length
+        self.min_new_tokens = config.min_new_tokens or 0
+        self.min_length = config.min_length or 0
+        eos_token_id = config.eos_token_id
+        if eos_token_id is None:
+            eos_token_id = self.tokenizer.eos_token_id
+        self.eos_token_ids = set(
+            eos_token_id if isinstance(eos_token_id, (list, tuple)) else [eos_token_id]
+        )
+
+        # Processors look at the tokens of a row, warpers only at its scores.
+        if config.repetition_penalty is not None and config.repetition_penalty != 1.0:
+            self.processors.append(
+                RepetitionPenaltyLogitsProcessor(config.repetition_penalty)
+            )
+        if config.no_repeat_ngram_size is not None and config.no_repeat_ngram_size > 0:
+            self.processors.append(
+                NoRepeatNGramLogitsProcessor(config.no_repeat_ngram_size)
+            )
+        if config.bad_words_ids is not None:
+            self.processors.append(
+                NoBadWordsLogitsProcessor(
+                    config.bad_words_ids, list(self.eos_token_ids)
+                )
+            )
+
+        self.do_sample = config.do_sample
+        self.warpers = LogitsProcessorList()
+        if self.do_sample:
+            if config.temperature is not None and config.temperature != 1.0:
+                self.warpers.append(TemperatureLogitsWarper(config.temperature))
+            if config.top_k is not None and config.top_k != 0:
+                self.warpers.append(TopKLogitsWarper(config.top_k))
+            if config.top_p is not None and config.top_p < 1.0:
+                self.warpers.append(TopPLogitsWarper(config.top_p))
+            if config.typical_p is not None and config.typical_p < 1.0:
+                self.warpers.append(TypicalLogitsWarper(config.typical_p))
+
+    def submit(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> str:
+        """Queues a prompt and blocks until its completion has been generated.
+
+        Raises DeadlineExpired if the time.time() deadline passes before it starts.
+        """
+        future = Future()
+        request = (prompt, max_new_tokens, deadline, future)
+        self.queue.put(request)
+        try:
+            return future.result(timeout=remaining(deadline))
+        except TimeoutError:
+            if not future.cancel():
+                # Already decoding, it leaves the batch at the next step.
+                return future.result()
+            with self.queue.mutex:
+                try:
+                    self.queue.queue.remove(request)
+                except ValueError:
+                    # Taken by the engine thread, which skips cancelled requests.
+                    pass
+            raise DeadlineExpired()
+
+    def stop(self):
+        self.should_exit = True
+        self.thread.join(5)
+
+    def _loop(self):
+        with torch.inference_mode():
+            while not self.should_exit:
+                self._admit()
+                if not self.active:
+                    continue
+                try:
+                    self._step()
+                except Exception as e:
+                    self._fail(e)
+
+    def _admit(self):
+        while len(self.active) < self.max_batch_size:
+            try:
+                # Only block for new requests while there is nothing to decode.
+                if self.active:
+                    request = self.queue.get_nowait()
+                else:
+                    request = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                return
+
+            future = request[-1]
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                self._prefill(*request)
+            except Exception as e:
+                future.set_exception(e)
+                bt.logging.error(f"Error in continuous batching prefill: {e}")
+
+    def _prefill(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int],
+        deadline: Optional[float],
+        future: Future,
+    ):
+        if deadline is not None and time.time() >= deadline:
+            future.set_exception(DeadlineExpired())
+            return
+
+        input_ids = self.tokenizer(prompt)["input_ids"]
+        if max_new_tokens is None:
+            max_new_tokens = (
+                self.max_new_tokens
+                if self.max_new_tokens is not None
+                else self.max_length - len(input_ids)
+            )
+        sequence = _Sequence(input_ids, max_new_tokens, future, deadline)
+        if max_new_tokens <= 0:
+            future.set_result("")
+            return
+
+        output = self.model(
+            input_ids=torch.tensor([input_ids], device=self.device), use_cache=True
+        )
+        token = self._sample(output.logits[:, -1, :], [sequence])
+        if self._append(sequence, token.item()):
+            return
+
+        attention_mask = torch.ones(
+            1, len(input_ids), dtype=torch.long, device=self.device
+        )
+        self._join(sequence, output.past_key_values, attention_mask, token)
+
+    def _join(
+        self,
+        sequence: _Sequence,
+        past_key_values: PastKeyValues,
+        attention_mask: torch.LongTensor,
+        token: torch.LongTensor,
+    ):
+        if not self.active:
+            self.past_key_values = past_key_values
+            self.attention_mask = attention_mask
+            self.next_tokens = token
+        else:
+            length = max(self.attention_mask.shape[1], attention_mask.shape[1])
+            batch = _left_pad(self.past_key_values, length)
+            joined = _left_pad(past_key_values, length)
+            self.past_key_values = tuple(
+                (torch.cat([key, new_key]), torch.cat([value, new_value]))
+                for (key, value), (new_key, new_value) in zip(batch, joined)
+            )
+            self.attention_mask = torch.cat(
+                [
+                    torch.nn.functional.pad(
+                        self.attention_mask, (length - self.attention_mask.shape[1], 0)
+                    ),
+                    torch.nn.functional.pad(
+                        attention_mask, (length - attention_mask.shape[1], 0)
+                    ),
+                ]
+            )
+            self.next_tokens = torch.cat([self.next_tokens, token])
+        self.active.append(sequence)
+
+    def _step(self):
+        # The pending tokens are not in the cache yet, their position is the
+        # number of real tokens already cached for each row.
+        position_ids = self.attention_mask.sum(dim=-1, keepdim=True)
+        attention_mask = torch.nn.functional.pad(self.attention_mask, (0, 1), value=1)
+        output = self.model(
+            input_ids=self.next_tokens[:, None],
+            past_key_values=self.past_key_values,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            use_cache=True,
+        )
+        self.past_key_values = output.past_key_values
+        self.attention_mask = attention_mask
+        self.next_tokens = self._sample(output.logits[:, -1, :], self.active)
+
+        keep = [
+            row
+            for row, (sequence, token) in enumerate(
+                zip(self.active, self.next_tokens.tolist())
+            )
+            if not self._append(sequence, token)
+        ]
+        if len(keep) < len(self.active):
+            self._retire(keep)
+
+    def _retire(self, keep: List[int]):
+        """Drops finished rows from the batch and trims padding no row needs anymore."""
+        self.active = [self.active[row] for row in keep]
+        if not self.active:
+            self.past_key_values = self.attention_mask = self.next_tokens = None
+            return
+
+        index = torch.tensor(keep, device=self.device)
+        attention_mask = self.attention_mask[index]
+        start = int((attention_mask.sum(dim=0) > 0).nonzero()[0])
+        self.attention_mask = attention_mask[:, start:]
+        self.past_key_values = tuple(
+            (key[index, :, start:], value[index, :, start:])
+            for key, value in self.past_key_values
+        )
+        self.next_tokens = self.next_tokens[index]
+
+    def _append(self, sequence: _Sequence, token: int) -> bool:
+        """Records a sampled token and resolves the caller once the sequence is finished.
+
+        A sequence ending with one of the stop sequences finishes without it.
+        """
+        finished = token in self.eos_token_ids
+        if not finished:
+            sequence.generated.append(token)
+            finished = (
+                len(sequence.generated) >= sequence.max_new_tokens
+                or (sequence.deadline is not None and time.time() >= sequence.deadline)
+                or self._should_stop(sequence)
+            )
+        if finished:
+            sequence.future.set_result(
+                self.tokenizer.decode(sequence.generated, skip_special_tokens=True)
+            )
+        return finished
+
+    def _should_stop(self, sequence: _Sequence) -> bool:
+        if self.stop_sequences is not None:
+            tail = sequence.generated[-self.stop_sequences.max_length :]
+            matched = int(self.stop_sequences.matches(torch.tensor([tail]))[0])
+            if matched:
+                del sequence.generated[-matched:]
+                return True
+        if self.stopping_criteria:
+            input_ids = self._input_ids(sequence)
+            return any(
+                bool(criteria(input_ids, None)) for criteria in self.stopping_criteria
+            )
+        return False
+
+    def _input_ids(self, sequence: _Sequence) -> torch.LongTensor:
+        return torch.tensor(
+            [sequence.input_ids + sequence.generated], device=self.device
+        )
+
+    def _sample(
+        self, logits: torch.FloatTensor, sequences: List[_Sequence]
+    ) -> torch.LongTensor:
+        logits = logits.float()
+        for row, sequence in enumerate(sequences):
+            min_new_tokens = max(
+                self.min_new_tokens, self.min_length - len(sequence.input_ids)
+            )
+            if len(sequence.generated) < min_new_tokens:
+                for eos_token_id in self.eos_token_ids:
+                    logits[row, eos_token_id] = float("-inf")
+            if self.processors:
+                logits[row : row + 1] = self.processors(
+                    self._input_ids(sequence), logits[row : row + 1]
+                )
+        if not self.do_sample:
+            return logits.argmax(dim=-1)
+        # Warpers only look at the scores.
+        logits = self.warpers(None, logits)
+        return torch.multinomial(torch.softmax(logits, dim=-1), 1).squeeze(-1)
+
+    def _fail(self, e: Exception):
+        for sequence in self.active:
+            if not sequence.future.done():
+                sequence.future.set_exception(e)
+        self.active = []
+        self.past_key_values = self.attention_mask = self.next_tokens = None
+        bt.logging.error(f"Error in continuous batching decode step: {e}")
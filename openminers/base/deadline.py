@@ -0,0 +1,67 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import inspect
+import functools
+from typing import Callable, Dict, Optional
+
+
+class DeadlineExpired(Exception):
+    """Raised for requests whose caller stopped waiting before any work started."""
+
+
+def call_deadline(forward_call: "bt.TextPromptingForwardCall", margin: float = 0.0):
+    """Returns the time.time() after which the caller of forward_call stops waiting.
+
+    That is its start_time plus the timeout sent by the validator, less `margin`
+    seconds for sending the response back. None when the call carries no timeout.
+    """
+    start_time = getattr(forward_call, "start_time", None)
+    timeout = getattr(forward_call, "timeout", None)
+    if start_time is None or not timeout:
+        return None
+    return start_time + timeout - margin
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """Returns the seconds left before deadline, None without a deadline."""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.time())
+
+
+def max_time_kwargs(deadline: Optional[float]) -> Dict[str, float]:
+    """Returns the generate kwargs stopping a transformers generation at deadline.
+
+    Generation stops with the tokens produced so far once max_time has elapsed.
+    """
+    if deadline is None:
+        return {}
+    return {"max_time": remaining(deadline)}
+
+
+@functools.lru_cache(maxsize=None)
+def _accepts_deadline(func: Callable) -> bool:
+    try:
+        return "deadline" in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def accepts_deadline(func: Callable) -> bool:
+    """Returns whether func, a miner forward, takes a deadline keyword argument."""
+    return _accepts_deadline(getattr(func, "__func__", func))
@@ -16,11 +16,23 @@
 # DEALINGS IN THE SOFTWARE.
 
 import time
-import wandb
 import random
 import bittensor as bt
 import traceback
-from typing import Callable, Dict, List, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from concurrent.futures import TimeoutError
+
+from .deadline import DeadlineExpired, accepts_deadline
+from .response_cache import hash_history
+from .semantic_cache import conversation_context, last_user_message
+
+
+def processed_history(self, messages: List[Dict[str, str]]) -> Union[str, List]:
+    """Returns the prompt the miner builds from messages, when it has _process_history."""
+    process_history = getattr(self, "_process_history", None)
+    if process_history is None:
+        return messages
+    return process_history(messages)
 
 
 def forward(
@@ -28,15 +40,103 @@ def forward(
     func: Callable,
     messages: List[Dict[str, str]],
     log_data: Dict[str, Union[str, float]] = None,
+    deadline: Optional[float] = None,
 ) -> str:
-    """Forwards a list of messages to the miner's forward function."""
+    """Forwards a list of messages to the miner's forward function.
+
+    With a deadline, the time.time() after which the caller stops waiting, expired
+    requests are dropped and the deadline is passed to miner forward functions
+    taking one, so they can stop generating in time.
+    """
 
-    # Run the subclass forward function.
+    # Run the subclass forward function, deterministic miners are served from the response cache.
+    cache_hit = False
+    coalesced = False
     try:
         start_time = time.time()
-        response = func(messages)
+        if deadline is not None and start_time >= deadline:
+            raise DeadlineExpired()
+
+        history = None
+        if self.response_cache is not None or self.single_flight is not None:
+            history = processed_history(self, messages)
+
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self.response_cache.key(history)
+            response = self.response_cache.get(cache_key)
+            cache_hit = response is not None
+
+        # Then from the completion of a similar last user message in the same conversation.
+        semantic_vector = None
+        if not cache_hit and self.semantic_cache is not None:
+            query = last_user_message(messages)
+            if query is not None:
+                semantic_context = conversation_context(messages)
+                response, semantic_vector = self.semantic_cache.lookup(
+                    query, context=semantic_context
+                )
+                cache_hit = response is not None
+
+        def generate() -> Tuple[str, bool]:
+            if deadline is not None and accepts_deadline(func):
+                response = func(messages, deadline=deadline)
+            else:
+                response = func(messages)
+            if deadline is not None and time.time() >= deadline:
+                # Likely cut short by the deadline, not a completion to serve again.
+                self.telemetry.increment("forward_deadline_hits")
+                return response, False
+            if cache_key is not None:
+                self.response_cache.put(cache_key, response)
+            if semantic_vector is not None:
+                self.semantic_cache.add(
+                    semantic_vector, response, context=semantic_context
+                )
+            return response, True
+
+        if not cache_hit:
+            # Identical prompts already being generated share that generation.
+            if self.single_flight is not None:
+                # Waiting longer than our own deadline is wasted.
+                timeout = None if deadline is None else deadline - time.time()
+                led = False
+
+                def lead() -> Tuple[str, bool]:
+                    nonlocal led
+                    led = True
+                    return generate()
+
+                try:
+                    (response, complete), coalesced = self.single_flight.do(
+                        hash_history(history), lead, timeout=timeout
+                    )
+                except TimeoutError:
+                    if deadline is not None and time.time() >= deadline:
+                        raise DeadlineExpired()
+                    raise
+                except DeadlineExpired:
+                    if led:
+                        raise
+                    # The leader's deadline expired, not necessarily ours.
+                    complete, coalesced = False, True
+                if coalesced and not complete:
+                    # The leader ran out of its own time, generate up to ours instead.
+                    if deadline is not None and time.time() >= deadline:
+                        raise DeadlineExpired()
+                    response, _ = generate()
+                    coalesced = False
+            else:
+                response, _ = generate()
         success = 1
 
+    # Nobody is waiting on the response anymore, skip the model work.
+    except DeadlineExpired:
+        bt.logging.debug("Dropped a forward call past its deadline")
+        self.telemetry.increment("forward_expired")
+        response = ""
+        success = 0
+
     # There was an error in the error function.
     except Exception as e:
         bt.logging.error(f"Error in forward function: { e }")
@@ -44,20 +144,28 @@ def forward(
         success = 0
 
     finally:
+        # Count every request, the full payload is only logged for sampled ones.
+        forward_elapsed = time.time() - start_time
+        self.telemetry.increment("forward_calls")
+        self.telemetry.increment("forward_success", success)
+        self.telemetry.increment("forward_elapsed", forward_elapsed)
+        self.telemetry.increment("forward_cache_hits", cache_hit)
+        self.telemetry.increment("forward_coalesced", coalesced)
+
         # Log the response length and qtime.
-        if self.config.wandb.on:
-            wandb_log_data = {
-                "messages": messages,
-                "completion": response,
-                "end_time": time.time(),
-                "block": self.subtensor.block,
-                "forward_elapsed": time.time() - start_time,
-                "forward_success": success,
-            }
-
-            wandb.log(
-                wandb_log_data if log_data == None else {**log_data, **wandb_log_data}
-            )
+        log_record = {
+            "messages": messages,
+            "completion": response,
+            "end_time": time.time(),
+            "block": self.block_tracker.block,
+            "forward_elapsed": forward_elapsed,
+            "forward_success": success,
+            "forward_cache_hit": cache_hit,
+            "forward_coalesced": coalesced,
+        }
+        self.telemetry.log(
+            "forward", log_record if log_data == None else {**log_data, **log_record}
+        )
 
         # Return the response.
         return response
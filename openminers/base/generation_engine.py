@@ -0,0 +1,134 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import torch
+import bittensor as bt
+from typing import Any, Dict, List, Optional, Union
+
+from .batching import BatchScheduler
+from .chat_template import ChatTemplate, TokenizedChatTemplate
+from .continuous_batching import ContinuousBatchingEngine
+from .deadline import max_time_kwargs
+from .prefix_cache import PrefixCachedGenerator
+
+
+class GenerationEngine:
+    """Chat generation with a transformers causal language model.
+
+    Renders messages with `template`, generates under torch.inference_mode with an
+    attention mask and decodes only the new tokens. Prompts go through the batch
+    scheduler or prefix cache of the miner when it set them up (see
+    BasePromptingMiner.enable_generation_engine), else through one generate call.
+    With `pretokenize`, that call takes the ids of a TokenizedChatTemplate instead
+    of tokenizing the rendered prompt.
+    """
+
+    def __init__(
+        self,
+        model: "torch.nn.Module",
+        tokenizer: "transformers.PreTrainedTokenizer",
+        template: ChatTemplate,
+        device: Any = "cpu",
+        system_prompt: Optional[str] = None,
+        pretokenize: bool = False,
+        **generate_kwargs,
+    ):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.template = template
+        self.device = device
+        self.system_prompt = system_prompt
+        self.generate_kwargs = generate_kwargs
+        self.batch_scheduler: Union[BatchScheduler, ContinuousBatchingEngine] = None
+        self.prefix_cache: PrefixCachedGenerator = None
+        self.token_template: Optional[TokenizedChatTemplate] = (
+            template.tokenized(tokenizer) if pretokenize else None
+        )
+
+    @classmethod
+    def from_pretrained(
+        cls,
+        model_name: str,
+        template: ChatTemplate,
+        device: Any = "cuda",
+        tokenizer_kwargs: Optional[Dict[str, Any]] = None,
+        model_kwargs: Optional[Dict[str, Any]] = None,
+        **kwargs,
+    ) -> "GenerationEngine":
+        """Loads model_name in float16 and moves it to device."""
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+
+        bt.logging.info("Loading " + str(model_name))
+        tokenizer = AutoTokenizer.from_pretrained(
+            model_name, **(tokenizer_kwargs or {})
+        )
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.float16,
+            low_cpu_mem_usage=True,
+            **(model_kwargs or {}),
+        )
+        bt.logging.info("Model loaded!")
+        if device != "cpu":
+            model = model.to(device)
+        return cls(model, tokenizer, template, device=device, **kwargs)
+
+    def render(self, messages: List[Dict[str, str]]) -> str:
+        return self.template.render(messages, self.system_prompt)
+
+    def generate(self, prompt: str, deadline: Optional[float] = None) -> str:
+        """Returns the raw text generated after prompt."""
+        if self.batch_scheduler is not None:
+            return self.batch_scheduler.submit(prompt, deadline=deadline)
+        if self.prefix_cache is not None:
+            return self.prefix_cache.generate(prompt, deadline)
+
+        inputs = self.tokenizer(prompt, return_tensors="pt")
+        return self.generate_ids(inputs["input_ids"], deadline)
+
+    def generate_ids(
+        self, input_ids: torch.Tensor, deadline: Optional[float] = None
+    ) -> str:
+        """Returns the text generated after the (1, length) prompt input_ids."""
+        input_ids = input_ids.to(self.device)
+        with torch.inference_mode():
+            output = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                pad_token_id=self.tokenizer.eos_token_id,
+                **self.generate_kwargs,
+                **max_time_kwargs(deadline),
+            )
+        return self.tokenizer.decode(
+            output[0, input_ids.shape[1] :], skip_special_tokens=True
+        )
+
+    def __call__(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
+        if (
+            self.token_template is not None
+            and self.batch_scheduler is None
+            and self.prefix_cache is None
+        ):
+            ids = self.token_template.render(
+                messages, self.system_prompt, add_generation_prompt=True
+            )
+            generation = self.generate_ids(torch.tensor([ids]), deadline)
+        else:
+            prompt = self.render(messages) + self.template.generation_prompt
+            generation = self.generate(prompt, deadline)
+        return self.template.postprocess(generation)
@@ -0,0 +1,261 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import math
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .async_backend import AsyncBackend
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram.
+
+    Buckets grow geometrically from `min_latency` to `max_latency`, so percentiles
+    are accurate to one bucket width (about 12% with 20 buckets per decade). Once
+    `max_count` latencies have been observed every count is halved, which weights
+    recent latencies over old ones.
+    """
+
+    def __init__(
+        self,
+        min_latency: float = 1e-3,
+        max_latency: float = 120.0,
+        buckets_per_decade: int = 20,
+        max_count: int = 1000,
+    ):
+        self.min_latency = min_latency
+        self.log_growth = math.log(10) / buckets_per_decade
+        self.max_count = max_count
+        size = math.ceil(math.log(max_latency / min_latency) / self.log_growth) + 1
+        self.counts: List[float] = [0.0] * size
+        self.count = 0.0
+
+    def bucket(self, latency: float) -> int:
+        if latency <= self.min_latency:
+            return 0
+        index = int(math.log(latency / self.min_latency) / self.log_growth)
+        return min(index, len(self.counts) - 1)
+
+    def observe(self, latency: float):
+        if self.count >= self.max_count:
+            self.counts = [count / 2 for count in self.counts]
+            self.count /= 2
+        self.counts[self.bucket(latency)] += 1
+        self.count += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Returns the upper edge of the bucket holding the q quantile, None when empty."""
+        if self.count == 0:
+            return None
+        target, total = q * self.count, 0.0
+        for index, count in enumerate(self.counts):
+            total += count
+            if total >= target and count > 0:
+                break
+        return self.min_latency * math.exp(self.log_growth * (index + 1))
+
+
+class CircuitBreaker:
+    """Stops sending requests to a provider after consecutive failures.
+
+    Opens after `failure_threshold` consecutive failures. After `reset_timeout`
+    seconds it lets one trial request through (half open): a success closes it, a
+    failure opens it again. Only used from the event loop, so it takes no lock.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float = None
+        self.trial = False
+        self.opens = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.time() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        """Returns whether a request may be sent, claiming the trial when half open."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial:
+            self.trial = True
+            return True
+        return False
+
+    def release(self):
+        """Gives back the trial of a request that was cancelled before completing."""
+        self.trial = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.time()
+            self.opens += 1
+
+
+@dataclass
+class Provider:
+    backend: AsyncBackend
+    histogram: LatencyHistogram = field(default_factory=LatencyHistogram)
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    wins: int = 0
+    errors: int = 0
+
+
+class HedgedRouter(AsyncBackend):
+    """Backend racing several provider backends against their tail latency.
+
+    Each request goes to the first provider, in the given order, whose circuit
+    breaker is closed. If it has not answered after the `hedge_percentile` of its
+    observed latency (`hedge_delay` until `min_samples` latencies are observed), the
+    next provider is sent the same request, up to `max_hedges` times. A provider
+    that fails is replaced by the next one straight away. The first completion
+    wins and the requests still running are cancelled.
+    """
+
+    name = "router"
+
+    def __init__(
+        self,
+        backends: List[AsyncBackend],
+        hedge_percentile: float = 0.9,
+        hedge_delay: float = 1.0,
+        min_hedge_delay: float = 0.01,
+        min_samples: int = 20,
+        max_hedges: int = 1,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        **kwargs,
+    ):
+        super(HedgedRouter, self).__init__(**kwargs)
+        self.providers = [
+            Provider(backend, breaker=CircuitBreaker(failure_threshold, reset_timeout))
+            for backend in backends
+        ]
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.max_hedges = max_hedges
+        self.stats.update({"hedges": 0, "hedge_wins": 0, "failovers": 0, "rejected": 0})
+
+    def delay(self, provider: Provider) -> float:
+        """Returns how long to wait on provider before hedging its request."""
+        if provider.histogram.count < self.min_samples:
+            return self.hedge_delay
+        return max(
+            self.min_hedge_delay, provider.histogram.percentile(self.hedge_percentile)
+        )
+
+    async def _call(self, provider: Provider, messages: List[Dict[str, str]]) -> str:
+        start = time.perf_counter()
+        try:
+            completion = await provider.backend.agenerate(messages)
+        except asyncio.CancelledError:
+            provider.breaker.release()
+            raise
+        except Exception:
+            provider.errors += 1
+            provider.breaker.record_failure()
+            raise
+        provider.histogram.observe(time.perf_counter() - start)
+        provider.breaker.record_success()
+        return completion
+
+    async def acomplete(self, messages: List[Dict[str, str]]) -> str:
+        waiting = list(self.providers)
+        running: Dict[asyncio.Future, Provider] = {}
+
+        def launch() -> Optional[Provider]:
+            while waiting:
+                provider = waiting.pop(0)
+                if provider.breaker.allow():
+                    task = asyncio.ensure_future(self._call(provider, messages))
+                    running[task] = provider
+                    return provider
+            return None
+
+        provider = launch()
+        if provider is None:
+            self.stats["rejected"] += 1
+            raise RuntimeError("the circuit breaker of every provider is open")
+        first, hedges, error = provider, 0, None
+        try:
+            while running:
+                hedging = hedges < self.max_hedges and waiting
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=self.delay(provider) if hedging else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    owner = running.pop(task)
+                    if task.exception() is None:
+                        owner.wins += 1
+                        if owner is not first:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+                if done:
+                    # Fail over to the next providers in place of the failed ones.
+                    for _ in done:
+                        failover = launch()
+                        if failover is not None:
+                            provider = failover
+                            self.stats["failovers"] += 1
+                else:
+                    hedge = launch()
+                    if hedge is not None:
+                        provider = hedge
+                        hedges += 1
+                        self.stats["hedges"] += 1
+            raise error
+        finally:
+            for task in running:
+                task.cancel()
+
+    def provider_stats(self) -> Dict[str, Dict]:
+        """Returns the latency percentiles, breaker state and counters per provider."""
+        return {
+            provider.backend.name: {
+                "p50": provider.histogram.percentile(0.5),
+                "p99": provider.histogram.percentile(0.99),
+                "breaker": provider.breaker.state,
+                "wins": provider.wins,
+                "errors": provider.errors,
+            }
+            for provider in self.providers
+        }
+
+    async def aclose(self):
+        for provider in self.providers:
+            await provider.backend.aclose()
@@ -0,0 +1,75 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import bittensor as bt
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def _to_list(values: Any) -> List[Any]:
+    if values is None:
+        return []
+    if hasattr(values, "tolist"):
+        return values.tolist()
+    return [value.item() if hasattr(value, "item") else value for value in values]
+
+
+class MetagraphView:
+    """Snapshot of the metagraph fields read on every request.
+
+    The metagraph keeps hotkeys in a python list, so membership checks and
+    `hotkeys.index` are linear scans. The view is rebuilt once per metagraph sync
+    and answers hotkey to uid, stake and validator permit lookups in O(1).
+    """
+
+    def __init__(
+        self,
+        hotkeys: Sequence[str] = (),
+        stake: Optional[Sequence[float]] = None,
+        validator_permit: Optional[Sequence[bool]] = None,
+    ):
+        self.hotkeys: List[str] = list(hotkeys)
+        self.hotkey_to_uid: Dict[str, int] = {
+            hotkey: uid for uid, hotkey in enumerate(self.hotkeys)
+        }
+        self.stake: List[float] = (
+            [float(s) for s in stake] if stake is not None else [0.0] * len(hotkeys)
+        )
+        self.validator_permit: List[bool] = (
+            [bool(p) for p in validator_permit]
+            if validator_permit is not None
+            else [False] * len(hotkeys)
+        )
+
+    @classmethod
+    def from_metagraph(cls, metagraph: "bt.metagraph") -> "MetagraphView":
+        if metagraph is None:
+            return cls()
+        return cls(
+            hotkeys=metagraph.hotkeys,
+            stake=_to_list(metagraph.S),
+            validator_permit=_to_list(metagraph.validator_permit),
+        )
+
+    def __contains__(self, hotkey: str) -> bool:
+        return hotkey in self.hotkey_to_uid
+
+    def __len__(self) -> int:
+        return len(self.hotkeys)
+
+    def uid(self, hotkey: str) -> Optional[int]:
+        """Returns the uid of a registered hotkey or None."""
+        return self.hotkey_to_uid.get(hotkey)
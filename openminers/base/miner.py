@@ -26,6 +26,13 @@ from typing import List, Dict, Union, Tuple
 
 from .run import run
 from .mock import MockSubtensor
+from .telemetry import Telemetry
+from .block_tracker import BlockTracker
+from .sharded_state import ShardedPromptCache
+from .near_duplicate import NearDuplicateIndex
+from .rate_limiter import TokenBucketRateLimiter
+from .shared_state import SharedPromptCache, SharedRateLimiter
+from .metagraph_view import MetagraphView
 from .config import config, check_config
 
 
@@ -69,8 +76,34 @@ class BaseMiner(ABC):
         self.config.merge(super_config)
         check_config(BaseMiner, self.config)
 
-        # Instantiate prompt cache where key is the encoded prompt and value is a tuple of hotkey and block
-        self.prompt_cache: Dict[str, Tuple[str, int]] = {}
+        # Instantiate prompt cache where key is the encoded prompt and value is a tuple of hotkey and block,
+        # and the per hotkey request rate limiter. Both can be shared by every miner process on the host.
+        rate_limit = dict(
+            burst=self.config.miner.blacklist.rate_limit_burst,
+            refill_rate=self.config.miner.blacklist.rate_limit_refill / 60,
+            stake_scale=self.config.miner.blacklist.rate_limit_stake_scale,
+        )
+        if self.config.miner.shared_state.path:
+            self.prompt_cache = SharedPromptCache(
+                f"{self.config.miner.shared_state.path}.prompt_cache",
+                capacity=self.config.miner.shared_state.capacity,
+            )
+            self.rate_limiter = SharedRateLimiter(
+                f"{self.config.miner.shared_state.path}.rate_limiter",
+                capacity=self.config.miner.shared_state.capacity,
+                **rate_limit,
+            )
+        else:
+            self.prompt_cache = ShardedPromptCache()
+            self.rate_limiter = TokenBucketRateLimiter(**rate_limit)
+
+        # Instantiate the near duplicate prompt index if enabled.
+        self.near_duplicate_index: NearDuplicateIndex = None
+        if self.config.miner.blacklist.near_duplicate_threshold > 0:
+            self.near_duplicate_index = NearDuplicateIndex(
+                threshold=self.config.miner.blacklist.near_duplicate_threshold,
+                max_entries=self.config.miner.blacklist.near_duplicate_max_entries,
+            )
 
         # Instantiate logging.
         bt.logging(config=self.config, logging_dir=self.config.miner.full_path)
@@ -92,10 +125,20 @@ class BaseMiner(ABC):
         else:
             self.subtensor = subtensor or bt.subtensor(self.config)
 
+        # Track the block height in the background so reads on the request path are free.
+        self.block_tracker = BlockTracker(
+            self.subtensor, refresh_interval=self.config.miner.block_refresh_interval
+        )
+        self.block_tracker.refresh()
+        self.block_tracker.start()
+
         # Instantiate metagraph.
         self.metagraph = self.subtensor.metagraph(self.config.netuid)
         self.metagraph.sync(lite=True, subtensor=self.subtensor)
 
+        # Index the metagraph for per-request hotkey lookups, rebuilt on every sync.
+        self.metagraph_view = MetagraphView.from_metagraph(self.metagraph)
+
         # Instantiate wallet.
         self.wallet = wallet or bt.wallet(self.config)
 
@@ -116,13 +159,16 @@ class BaseMiner(ABC):
                 magic=True,
                 tags=tags,
             )
+
+        # Instantiate telemetry, records are written to the sinks by a background thread.
+        self.telemetry = Telemetry.from_config(self.config)
+        self.telemetry.start()
+
         # Instantiate runners.
         self.should_exit: bool = False
         self.is_running: bool = False
         self.thread: threading.Thread = None
 
-        self.request_timestamps = {}
-
     def run(self):
         run(self)
 
@@ -147,3 +193,5 @@ class BaseMiner(ABC):
 
     def __exit__(self, exc_type, exc_value, traceback):
         self.stop_run_thread()
+        self.block_tracker.stop()
+        self.telemetry.stop()
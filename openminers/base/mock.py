@@ -41,3 +41,46 @@ class MockSubtensor:
 
     def metagraph(self, netuid: int) -> "bt.Metagraph":
         return self.mock_metagraph
+
+
+class OfflineMetagraph:
+    """In memory metagraph with the fields read by the miner, never touches the chain."""
+
+    def __init__(
+        self,
+        hotkeys: List[str],
+        stake: Optional[List[float]] = None,
+        validator_permit: Optional[List[bool]] = None,
+        block: int = 0,
+    ):
+        import torch
+
+        n = len(hotkeys)
+        self.hotkeys = list(hotkeys)
+        self.uids = torch.arange(n)
+        self.S = torch.tensor(stake if stake is not None else [0.0] * n)
+        self.validator_permit = torch.tensor(
+            validator_permit if validator_permit is not None else [False] * n
+        )
+        self.T = torch.zeros(n)
+        self.I = torch.zeros(n)
+        self.C = torch.zeros(n)
+        self.D = torch.zeros(n)
+        self.block = torch.tensor(block)
+
+    def sync(self, lite: bool = True, subtensor: "bt.Subtensor" = None):
+        return self
+
+
+class OfflineSubtensor(MockSubtensor):
+    """MockSubtensor serving an OfflineMetagraph, for running miners without a network."""
+
+    def __init__(self, metagraph: OfflineMetagraph):
+        self.mock_metagraph = metagraph
+        self.start_time = time.time()
+
+    def subnetwork_n(self, netuid: int) -> int:
+        return len(self.mock_metagraph.hotkeys)
+
+    def set_weights(self, *args, **kwargs) -> bool:
+        return True
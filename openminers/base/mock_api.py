@@ -0,0 +1,144 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import re
+import json
+import random
+import asyncio
+from aiohttp import web
+from typing import Optional
+
+from .async_backend import EventLoopThread
+
+
+class MockAPIServer:
+    """Local HTTP server answering the completion endpoints of every API backend.
+
+    Serves the routes of OpenAIBackend, CohereBackend, AI21Backend,
+    AlephAlphaBackend and GooseAIBackend under `url`, so any of them can be
+    pointed at it with base_url. Each request waits `latency` seconds, or
+    `tail_latency` seconds with probability `tail_probability`, and fails with a
+    500 with probability `error_rate`. Requests with `"stream": true` to the
+    OpenAI, Cohere and GooseAI routes get the completion one word at a time, every
+    `stream_interval` seconds, until the client hangs up. Runs on its own event
+    loop thread.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        tail_latency: float = 0.0,
+        tail_probability: float = 0.0,
+        error_rate: float = 0.0,
+        completion: str = "Hello World!",
+        seed: Optional[int] = None,
+        stream_interval: float = 0.0,
+    ):
+        self.latency = latency
+        self.tail_latency = tail_latency
+        self.tail_probability = tail_probability
+        self.error_rate = error_rate
+        self.completion = completion
+        self.random = random.Random(seed)
+        self.stream_interval = stream_interval
+        self.requests = 0
+        self.chunks_sent = 0
+        self.connections = set()
+        self.last_body = None
+        self.loop_thread: EventLoopThread = None
+        self.runner: web.AppRunner = None
+        self.url: str = None
+
+    async def handle(self, request: "web.Request") -> "web.Response":
+        self.requests += 1
+        self.connections.add(request.transport)
+        self.last_body = await request.json()
+        tail = self.random.random() < self.tail_probability
+        await asyncio.sleep(self.tail_latency if tail else self.latency)
+        if self.random.random() < self.error_rate:
+            raise web.HTTPInternalServerError(text="mock server error")
+
+        text = self.completion
+        route = request.match_info.route.name
+        if self.last_body.get("stream") and route in ("openai", "cohere", "gooseai"):
+            return await self.stream(request, route)
+
+        bodies = {
+            "openai": {"choices": [{"message": {"content": text}}]},
+            "cohere": {"generations": [{"text": text}]},
+            "ai21": {"completions": [{"data": {"text": text}}]},
+            "alephalpha": {"completions": [{"completion": text}]},
+            "gooseai": {"choices": [{"text": text}]},
+        }
+        return web.json_response(bodies[route])
+
+    async def stream(self, request: "web.Request", route: str) -> "web.StreamResponse":
+        events = {
+            "openai": lambda word: {"choices": [{"delta": {"content": word}}]},
+            "gooseai": lambda word: {"choices": [{"text": word}]},
+        }
+        response = web.StreamResponse()
+        await response.prepare(request)
+        try:
+            for word in re.findall(r"\s*\S+", self.completion):
+                if route == "cohere":
+                    line = json.dumps({"text": word, "is_finished": False}) + "\n"
+                else:
+                    line = f"data: {json.dumps(events[route](word))}\n\n"
+                await response.write(line.encode())
+                self.chunks_sent += 1
+                await asyncio.sleep(self.stream_interval)
+            if route == "cohere":
+                await response.write(b'{"is_finished": true}\n')
+            else:
+                await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            # The client hung up, as backends do once they have read a stop string.
+            pass
+        return response
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post("/chat/completions", self.handle, name="openai")
+        app.router.add_post("/generate", self.handle, name="cohere")
+        app.router.add_post("/complete", self.handle, name="alephalpha")
+        app.router.add_post("/{model}/complete", self.handle, name="ai21")
+        app.router.add_post("/engines/{model}/completions", self.handle, name="gooseai")
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    def start(self) -> "MockAPIServer":
+        self.loop_thread = EventLoopThread()
+        self.loop_thread.run(self._start())
+        return self
+
+    def stop(self):
+        if self.runner is not None:
+            self.loop_thread.run(self.runner.cleanup())
+            self.runner = None
+        self.loop_thread.loop.call_soon_threadsafe(self.loop_thread.loop.stop)
+
+    def __enter__(self) -> "MockAPIServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
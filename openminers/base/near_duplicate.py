@@ -0,0 +1,217 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import re
+import hashlib
+import threading
+import numpy as np
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Set, Tuple
+
+from .prompt_cache import block_bucket
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize_messages(messages: Iterable[Any]) -> List[str]:
+    """Returns the lower cased words of a message list, ignoring whitespace and punctuation."""
+    words = []
+    for message in messages:
+        if isinstance(message, dict):
+            message = f"{message.get('role', '')} {message.get('content', '')}"
+        words.extend(WORD_PATTERN.findall(str(message).lower()))
+    return words
+
+
+def shingle_hashes(words: List[str], shingle_size: int) -> np.ndarray:
+    """Returns 64 bit hashes of every run of shingle_size consecutive words."""
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [
+            " ".join(words[i : i + shingle_size])
+            for i in range(len(words) - shingle_size + 1)
+        ]
+    return np.fromiter(
+        (
+            int.from_bytes(
+                hashlib.blake2b(s.encode(), digest_size=8).digest(), "little"
+            )
+            for s in set(shingles)
+        ),
+        dtype=np.uint64,
+    )
+
+
+def optimal_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """Returns (bands, rows) whose LSH threshold (1 / bands) ** (1 / rows) is closest below threshold."""
+    options = [
+        (num_perm // rows, rows)
+        for rows in range(1, num_perm + 1)
+        if num_perm % rows == 0
+    ]
+    below = [
+        option for option in options if (1 / option[0]) ** (1 / option[1]) <= threshold
+    ]
+    return min(
+        below or options,
+        key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold),
+    )
+
+
+class NearDuplicateIndex:
+    """MinHash LSH index of recent prompts, flagging prompts similar to one already seen.
+
+    Prompts are reduced to MinHash signatures over word shingles. Signatures are split
+    into bands and prompts sharing a band are candidates, kept only if their estimated
+    Jaccard similarity reaches `threshold`. Entries are bucketed by block like the
+    PromptCache for expiry, and the oldest are evicted beyond `max_entries`.
+
+    `check_and_add` splits reads from writes: the candidates are compared without
+    any lock, then `lock` is only held to check the entries added meanwhile and to
+    insert, so concurrent requests never wait on each other's comparisons.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        shingle_size: int = 3,
+        max_entries: int = 100000,
+        seed: int = 1,
+    ):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+
+        # Multiply-shift hash family, a fixed seed keeps signatures stable across processes.
+        generator = np.random.default_rng(seed)
+        self.multipliers = generator.integers(
+            1, 2**63, size=num_perm, dtype=np.uint64
+        ) | np.uint64(1)
+        self.increments = generator.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+        # Entry ids increase with insertion, entries from next_entry on are newer than a read.
+        self.next_entry = 0
+        self.signatures: Dict[int, np.ndarray] = {}
+        self.tables: List[Dict[bytes, Set[int]]] = [{} for _ in range(self.bands)]
+        self.buckets: Deque[Tuple[int, Deque[int]]] = deque()
+        # Held by every write, reads go without it.
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def signature(self, messages: Iterable[Any]) -> np.ndarray:
+        hashes = shingle_hashes(normalize_messages(messages), self.shingle_size)
+        permuted = (hashes[:, None] * self.multipliers + self.increments) >> np.uint64(
+            32
+        )
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def query(self, signature: np.ndarray) -> bool:
+        """Returns whether a prompt similar to signature is in the index."""
+        return self._query(signature, self._band_keys(signature))
+
+    def add(self, signature: np.ndarray, block: int):
+        keys = self._band_keys(signature)
+        with self.lock:
+            self._add(signature, keys, block)
+
+    def check_and_add(self, signature: np.ndarray, block: int) -> bool:
+        """Atomically adds signature and returns whether a similar prompt was indexed.
+
+        Signatures similar to one already in the index are not added.
+        """
+        keys = self._band_keys(signature)
+        since = self.next_entry
+        if self._query(signature, keys):
+            return True
+        with self.lock:
+            # Only entries added since the read above are left to compare.
+            if self._query(signature, keys, since):
+                return True
+            self._add(signature, keys, block)
+        return False
+
+    def expire(self, min_block: int) -> int:
+        """Removes every entry inserted before min_block and returns how many were removed."""
+        # Most requests have nothing to expire, they skip the lock.
+        try:
+            if self.buckets[0][0] >= min_block:
+                return 0
+        except IndexError:
+            return 0
+
+        removed = 0
+        with self.lock:
+            while self.buckets and self.buckets[0][0] < min_block:
+                _, entries = self.buckets.popleft()
+                for entry in entries:
+                    self._remove(entry)
+                removed += len(entries)
+        return removed
+
+    def _query(self, signature: np.ndarray, keys: List[bytes], since: int = 0) -> bool:
+        candidates = set()
+        for band, key in enumerate(keys):
+            # Copies the set in one step, writers may change it concurrently.
+            candidates.update(self.tables[band].get(key, ()))
+        for candidate in candidates:
+            if candidate < since:
+                continue
+            # Removed since the candidates were collected.
+            other = self.signatures.get(candidate)
+            if (
+                other is not None
+                and np.count_nonzero(other == signature)
+                >= self.threshold * self.num_perm
+            ):
+                return True
+        return False
+
+    def _add(self, signature: np.ndarray, keys: List[bytes], block: int):
+        entry = self.next_entry
+        self.signatures[entry] = signature
+        for band, key in enumerate(keys):
+            self.tables[band].setdefault(key, set()).add(entry)
+        # Published last, so a reader never skips an entry it did not see.
+        self.next_entry = entry + 1
+
+        block_bucket(self.buckets, block, deque).append(entry)
+
+        while len(self.signatures) > self.max_entries:
+            _, entries = self.buckets[0]
+            self._remove(entries.popleft())
+            if not entries:
+                self.buckets.popleft()
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def _remove(self, entry: int):
+        signature = self.signatures.pop(entry)
+        for band, key in enumerate(self._band_keys(signature)):
+            entries = self.tables[band][key]
+            entries.discard(entry)
+            if not entries:
+                del self.tables[band][key]
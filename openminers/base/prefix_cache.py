@@ -0,0 +1,245 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import torch
+import itertools
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .continuous_batching import PastKeyValues
+from .deadline import max_time_kwargs
+
+
+def _nbytes(past_key_values: PastKeyValues) -> int:
+    return sum(
+        key.numel() * key.element_size() + value.numel() * value.element_size()
+        for key, value in past_key_values
+    )
+
+
+def _slice(
+    past_key_values: PastKeyValues, start: int, end: int = None
+) -> PastKeyValues:
+    # Copy so a stored segment never pins the storage of the full cache it was cut from.
+    return tuple(
+        (key[:, :, start:end].clone(), value[:, :, start:end].clone())
+        for key, value in past_key_values
+    )
+
+
+def _concat(segments: List[PastKeyValues]) -> PastKeyValues:
+    if len(segments) == 1:
+        return segments[0]
+    return tuple(
+        (
+            torch.cat([segment[layer][0] for segment in segments], dim=2),
+            torch.cat([segment[layer][1] for segment in segments], dim=2),
+        )
+        for layer in range(len(segments[0]))
+    )
+
+
+class _Node:
+    def __init__(
+        self,
+        tokens: Tuple[int, ...],
+        past_key_values: Optional[PastKeyValues],
+        parent: Optional["_Node"],
+    ):
+        self.tokens = tokens
+        self.past_key_values = past_key_values
+        self.parent = parent
+        self.children: Dict[int, "_Node"] = {}
+        self.last_access: int = 0
+        self.nbytes: int = _nbytes(past_key_values) if past_key_values else 0
+
+
+class KVRadixTree:
+    """Radix tree of key/value cache segments keyed on prompt token ids.
+
+    Each edge stores the cache of its own tokens only, so prompts sharing a prefix
+    share its memory. Lookups return the longest cached prefix of a prompt with the
+    segments along the path concatenated. Least recently used leaves are evicted
+    once the stored caches exceed `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes: int = 0
+        self.root = _Node((), None, None)
+        self.clock = itertools.count(1)
+        self.lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "lookups": 0,
+            "hits": 0,
+            "prompt_tokens": 0,
+            "saved_prefill_tokens": 0,
+            "evictions": 0,
+        }
+
+    @property
+    def hit_rate(self) -> float:
+        return self.stats["hits"] / max(self.stats["lookups"], 1)
+
+    def match(self, input_ids: List[int]) -> Tuple[int, Optional[PastKeyValues]]:
+        """Returns the length of the longest cached prefix of input_ids and its cache."""
+        with self.lock:
+            node, position, segments = self.root, 0, []
+            tick = next(self.clock)
+            while position < len(input_ids):
+                child = node.children.get(input_ids[position])
+                if child is None:
+                    break
+                common = _common_prefix(child.tokens, input_ids, position)
+                child.last_access = tick
+                if common < len(child.tokens):
+                    segments.append(_slice(child.past_key_values, 0, common))
+                    position += common
+                    break
+                segments.append(child.past_key_values)
+                position += common
+                node = child
+
+            self.stats["lookups"] += 1
+            self.stats["prompt_tokens"] += len(input_ids)
+            if position > 0:
+                self.stats["hits"] += 1
+                self.stats["saved_prefill_tokens"] += position
+            return position, _concat(segments) if segments else None
+
+    def insert(self, input_ids: List[int], past_key_values: PastKeyValues):
+        """Stores the cache of input_ids, past_key_values must cover exactly those tokens."""
+        with self.lock:
+            node, position = self.root, 0
+            tick = next(self.clock)
+            while position < len(input_ids):
+                child = node.children.get(input_ids[position])
+                if child is None:
+                    leaf = _Node(
+                        tuple(input_ids[position:]),
+                        _slice(past_key_values, position),
+                        node,
+                    )
+                    leaf.last_access = tick
+                    node.children[input_ids[position]] = leaf
+                    self.nbytes += leaf.nbytes
+                    break
+
+                common = _common_prefix(child.tokens, input_ids, position)
+                if common < len(child.tokens):
+                    child = self._split(child, common)
+                child.last_access = tick
+                position += common
+                node = child
+
+            self._evict()
+
+    def _split(self, node: _Node, length: int) -> _Node:
+        """Splits the edge into node at length and returns the new upper node."""
+        upper = _Node(
+            node.tokens[:length], _slice(node.past_key_values, 0, length), node.parent
+        )
+        upper.last_access = node.last_access
+        node.parent.children[node.tokens[0]] = upper
+
+        self.nbytes -= node.nbytes
+        node.tokens = node.tokens[length:]
+        node.past_key_values = _slice(node.past_key_values, length)
+        node.nbytes = _nbytes(node.past_key_values)
+        node.parent = upper
+        upper.children[node.tokens[0]] = node
+        self.nbytes += upper.nbytes + node.nbytes
+        return upper
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes:
+            leaf = min(self._leaves(), key=lambda node: node.last_access, default=None)
+            if leaf is None:
+                return
+            del leaf.parent.children[leaf.tokens[0]]
+            self.nbytes -= leaf.nbytes
+            self.stats["evictions"] += 1
+
+    def _leaves(self):
+        stack = list(self.root.children.values())
+        while stack:
+            node = stack.pop()
+            if node.children:
+                stack.extend(node.children.values())
+            else:
+                yield node
+
+
+def _common_prefix(tokens: Tuple[int, ...], input_ids: List[int], start: int) -> int:
+    length = min(len(tokens), len(input_ids) - start)
+    for i in range(length):
+        if tokens[i] != input_ids[start + i]:
+            return i
+    return length
+
+
+class PrefixCachedGenerator:
+    """Generates completions while reusing cached key/values of shared prompt prefixes.
+
+    The longest cached prefix of a prompt is looked up in a KVRadixTree, only the
+    unseen suffix is prefilled and the resulting cache is stored for later requests
+    before `generate` continues from it.
+    """
+
+    def __init__(
+        self,
+        model: "torch.nn.Module",
+        tokenizer: "transformers.PreTrainedTokenizer",
+        max_bytes: int,
+        device: Any = None,
+        **generate_kwargs,
+    ):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device if device is not None else model.device
+        self.generate_kwargs = generate_kwargs
+        self.tree = KVRadixTree(max_bytes)
+
+    def generate(self, prompt: str, deadline: Optional[float] = None) -> str:
+        input_ids = self.tokenizer(prompt)["input_ids"]
+
+        # generate always feeds the last prompt token itself, cache everything before it.
+        prefix = input_ids[:-1]
+        with torch.inference_mode():
+            matched, past_key_values = self.tree.match(prefix)
+            if matched < len(prefix):
+                output = self.model(
+                    input_ids=torch.tensor([prefix[matched:]], device=self.device),
+                    past_key_values=past_key_values,
+                    use_cache=True,
+                )
+                past_key_values = output.past_key_values
+                self.tree.insert(prefix, past_key_values)
+
+            input_tensor = torch.tensor([input_ids], device=self.device)
+            output = self.model.generate(
+                input_tensor,
+                attention_mask=torch.ones_like(input_tensor),
+                past_key_values=past_key_values,
+                pad_token_id=self.tokenizer.eos_token_id,
+                **self.generate_kwargs,
+                **max_time_kwargs(deadline),
+            )
+
+        return self.tokenizer.decode(
+            output[0][len(input_ids) :], skip_special_tokens=True
+        )
@@ -15,42 +15,30 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import wandb
 import bittensor as bt
 from typing import List, Dict, Union, Tuple, Callable
-import time
-
-
-def record_request_timestamps(self, forward_call: "bt.TextPromptingForwardCall"):
-    timestamp_length = self.config.miner.priority.len_request_timestamps
-    if forward_call.src_hotkey not in self.request_timestamps:
-        self.request_timestamps[forward_call.src_hotkey] = [0] * timestamp_length
-
-    self.request_timestamps[forward_call.src_hotkey].append(forward_call.start_time)
-    self.request_timestamps[forward_call.src_hotkey] = self.request_timestamps[
-        forward_call.src_hotkey
-    ][-timestamp_length:]
-
-    return self.request_timestamps
 
 
 def default_priority(self, forward_call: "bt.TextPromptingForwardCall") -> float:
-    # Check if the key is registered.
-    registered = False
-    if self.metagraph is not None:
-        registered = forward_call.src_hotkey in self.metagraph.hotkeys
+    # Check if the key is registered, if so it has a UID.
+    uid = self.metagraph_view.uid(forward_call.src_hotkey)
 
     # Non-registered users have a default priority.
-    if not registered:
+    if uid is None:
         return self.config.miner.priority.default
 
-    # If the user is registered, it has a UID.
-    uid = self.metagraph.hotkeys.index(forward_call.src_hotkey)
-    stake_amount = self.metagraph.S[uid].item()
+    stake_amount = self.metagraph_view.stake[uid]
+
+    # Tokens left in the rate limit bucket of the hotkey.
+    tokens = self.rate_limiter.tokens(forward_call.src_hotkey, stake=stake_amount)
+    refill_rate = self.rate_limiter.refill_rate * self.rate_limiter.scale(stake_amount)
+    if tokens is not None and refill_rate <= 0:
+        # Buckets never refill, there is no banking time to reward.
+        priority = stake_amount
 
-    # request period
-    if forward_call.src_hotkey in self.request_timestamps:
-        period = time.time() - self.request_timestamps[forward_call.src_hotkey][-10]
+    elif tokens is not None:
+        # Time it took to bank the tokens left, quieter hotkeys have banked more.
+        period = tokens / refill_rate
         period_scale = period / (
             self.config.miner.priority.time_stake_multiplicate * 60
         )
@@ -59,8 +47,6 @@ def default_priority(self, forward_call: "bt.TextPromptingForwardCall") -> float
     else:
         priority = self.config.miner.priority.default
 
-    record_request_timestamps(self, forward_call)
-
     return priority
 
 
@@ -0,0 +1,102 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import hashlib
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Tuple
+
+
+def hash_messages(messages: Iterable[Any]) -> bytes:
+    """Returns a compact digest of a message list without serializing it to json.
+
+    Every message is fed to the hasher with a length prefix so that different
+    splits of the same characters across messages never collide.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    for message in messages:
+        if isinstance(message, dict):
+            message = f"{message.get('role', '')}\x1f{message.get('content', '')}"
+        encoded = str(message).encode()
+        hasher.update(len(encoded).to_bytes(8, "little"))
+        hasher.update(encoded)
+    return hasher.digest()
+
+
+def block_bucket(
+    buckets: Deque[Tuple[int, Any]], block: int, new_bucket: Callable[[], Any]
+) -> Any:
+    """Returns the bucket of block from buckets sorted by block, opening it if needed.
+
+    An entry from a block before the last bucket, like after the block estimate was
+    re-anchored, gets a bucket of its own block so that it still expires on time.
+    """
+    # Blocks almost always move forward, so the search starts at the last bucket.
+    position = len(buckets)
+    while position > 0 and buckets[position - 1][0] > block:
+        position -= 1
+    if position > 0 and buckets[position - 1][0] == block:
+        return buckets[position - 1][1]
+    bucket = new_bucket()
+    buckets.insert(position, (block, bucket))
+    return bucket
+
+
+class PromptCache:
+    """Prompt dedupe cache with entries bucketed by the block they were inserted at.
+
+    Lookups go through a plain dict while a deque of (block, keys) buckets keeps
+    the insertion order, so expiring old prompts only touches the buckets that
+    fall out of the block span instead of walking the whole cache.
+    """
+
+    def __init__(self):
+        self.entries: Dict[bytes, Tuple[str, int]] = {}
+        self.buckets: Deque[Tuple[int, List[bytes]]] = deque()
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self.entries
+
+    def __getitem__(self, key: bytes) -> Tuple[str, int]:
+        return self.entries[key]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, key: bytes, hotkey: str, block: int):
+        """Adds a prompt key, keys already present keep their original block."""
+        if key in self.entries:
+            return
+        self.entries[key] = (hotkey, block)
+
+        block_bucket(self.buckets, block, list).append(key)
+
+    def check_and_add(self, key: bytes, hotkey: str, block: int) -> bool:
+        """Adds a prompt key and returns whether it was already present."""
+        if key in self.entries:
+            return True
+        self.add(key, hotkey, block)
+        return False
+
+    def expire(self, min_block: int) -> int:
+        """Removes every entry inserted before min_block and returns how many were removed."""
+        removed = 0
+        while self.buckets and self.buckets[0][0] < min_block:
+            _, keys = self.buckets.popleft()
+            for key in keys:
+                del self.entries[key]
+            removed += len(keys)
+        return removed
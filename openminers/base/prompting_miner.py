@@ -17,12 +17,24 @@
 
 import torch
 import argparse
+import functools
+import threading
 import bittensor as bt
 
 from abc import ABC
-from typing import List, Dict, Union, Tuple, Callable, Union
+from typing import Any, List, Dict, Union, Tuple, Callable, Union
 
 from .forward import forward
+from .deadline import call_deadline
+from .async_backend import AsyncBackend
+from .batching import BatchScheduler, generate_batch
+from .continuous_batching import ContinuousBatchingEngine
+from .generation_engine import GenerationEngine
+from .prefix_cache import PrefixCachedGenerator
+from .response_cache import ResponseCache, is_deterministic
+from .response_store import ResponseStore
+from .semantic_cache import HashingEncoder, SemanticCache, TransformerEncoder
+from .single_flight import SingleFlight
 from .priority import priority
 from .blacklist import blacklist
 from .miner import BaseMiner
@@ -30,6 +42,12 @@ from .config import config, check_config
 
 
 class BasePromptingMiner(BaseMiner, ABC):
+    # Set by subclasses whose models keep (batch, heads, seq, head_dim) key/value caches.
+    supports_continuous_batching: bool = False
+
+    # Set by subclasses generating through self.prefix_cache once enable_prefix_cache set it.
+    supports_prefix_cache: bool = False
+
     @classmethod
     def config(cls) -> "bt.Config":
         parser = argparse.ArgumentParser()
@@ -40,12 +58,144 @@ class BasePromptingMiner(BaseMiner, ABC):
     def add_super_args(cls, parser: argparse.ArgumentParser):
         """Add arguments specific to BasePromptingMiner to parser."""
         cls.add_args(parser)
+        cls.add_neuron_args(parser)
+
+    @classmethod
+    def check_neuron_config(cls, config: "bt.Config"):
+        """Rejects neuron flags the miner would otherwise silently ignore."""
+        if config.neuron.prefix_cache_mb > 0 and not cls.supports_prefix_cache:
+            raise ValueError(
+                f"{cls.__name__} does not support --neuron.prefix_cache_mb, set it to 0."
+            )
+
+    @classmethod
+    def add_neuron_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
             "--neuron.max_batch_size",
             type=int,
-            help="The maximum batch size for forward requests.",
+            help="The maximum batch size for forward requests. Batching is disabled unless greater than 1.",
             default=-1,
         )
+        parser.add_argument(
+            "--neuron.batch_window_ms",
+            type=float,
+            help="How long (in milliseconds) to wait for more requests before running a batch.",
+            default=10.0,
+        )
+        parser.add_argument(
+            "--neuron.continuous_batching",
+            action="store_true",
+            help="Admit and retire requests at every decode step instead of batching whole generate calls.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.prefix_cache_mb",
+            type=float,
+            help="Memory budget (in megabytes) for key/values of prompt prefixes shared across requests, 0 disables it.",
+            default=0.0,
+        )
+        parser.add_argument(
+            "--neuron.response_cache_mb",
+            type=float,
+            help="Memory budget (in megabytes) for completions of miners with deterministic generation, 0 disables it.",
+            default=64.0,
+        )
+        parser.add_argument(
+            "--neuron.response_cache_ttl",
+            type=float,
+            help="How long (in seconds) a cached completion can be served.",
+            default=3600.0,
+        )
+        parser.add_argument(
+            "--neuron.response_cache_path",
+            type=str,
+            help="SQLite file keeping cached completions across restarts, can be shared by miners on the host.",
+            default=None,
+        )
+        parser.add_argument(
+            "--neuron.response_cache_disk_mb",
+            type=float,
+            help="Disk budget (in megabytes) for completions in --neuron.response_cache_path.",
+            default=1024.0,
+        )
+        parser.add_argument(
+            "--neuron.semantic_cache_threshold",
+            type=float,
+            help="Serve the completion of an earlier last user message with at least this cosine similarity, 0 disables it.",
+            default=0.0,
+        )
+        parser.add_argument(
+            "--neuron.semantic_cache_max_vectors",
+            type=int,
+            help="How many embedded messages the semantic cache keeps.",
+            default=10000,
+        )
+        parser.add_argument(
+            "--neuron.semantic_cache_encoder",
+            type=str,
+            help='Encoder for the semantic cache, "hashing" or the name of a transformers model run on CPU.',
+            default="hashing",
+        )
+        parser.add_argument(
+            "--neuron.no_single_flight",
+            action="store_true",
+            help="Generate every request instead of sharing one generation between concurrent identical prompts.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.single_flight_timeout",
+            type=float,
+            help="How long (in seconds) a request waits on the generation of an identical prompt.",
+            default=60.0,
+        )
+        parser.add_argument(
+            "--neuron.api_max_connections",
+            type=int,
+            help="Keep-alive connections API miners hold open to their provider.",
+            default=100,
+        )
+        parser.add_argument(
+            "--neuron.api_max_in_flight",
+            type=int,
+            help="Maximum concurrent requests API miners send to their provider.",
+            default=256,
+        )
+        parser.add_argument(
+            "--neuron.api_timeout",
+            type=float,
+            help="Deadline (in seconds) of a request to the provider of an API miner.",
+            default=12.0,
+        )
+        parser.add_argument(
+            "--neuron.api_base_url",
+            type=str,
+            help="Overrides the provider URL of API miners, e.g. to point them at a mock server.",
+            default=None,
+        )
+        parser.add_argument(
+            "--neuron.pretokenize_prompts",
+            action="store_true",
+            help="Build the prompt ids of generation engine miners from pre-tokenized role markers and cached messages.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.api_stream",
+            action="store_true",
+            help="Stream completions from providers that support it and hang up at the first stop string.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.deadline_margin",
+            type=float,
+            help="Seconds kept from the validator timeout to send the response back, generation stops before.",
+            default=0.25,
+        )
+        parser.add_argument(
+            "--neuron.ignore_deadline",
+            action="store_true",
+            help="Generate full completions even when the validator stops waiting before.",
+            default=False,
+        )
         parser.add_argument(
             "--neuron.max_sequence_len",
             type=int,
@@ -55,6 +205,45 @@ class BasePromptingMiner(BaseMiner, ABC):
 
     def __init__(self, *args, **kwargs):
         super(BasePromptingMiner, self).__init__(*args, **kwargs)
+        self.check_neuron_config(self.config)
+
+        # Set by subclasses through enable_batching.
+        self.batch_scheduler: Union[BatchScheduler, ContinuousBatchingEngine] = None
+
+        # Set by subclasses through enable_prefix_cache.
+        self.prefix_cache: PrefixCachedGenerator = None
+
+        # Set by transformers miners through enable_generation_engine.
+        self.engine: GenerationEngine = None
+
+        # Set by API miners, requests to their provider run on a shared event loop.
+        self.backend: AsyncBackend = None
+
+        # Set by subclasses through enable_response_cache.
+        self.response_cache: ResponseCache = None
+
+        # Concurrent requests for the same processed history share one generation.
+        self.single_flight: SingleFlight = None
+        if not self.config.neuron.no_single_flight:
+            self.single_flight = SingleFlight(
+                timeout=self.config.neuron.single_flight_timeout
+            )
+
+        # Opt-in, in front of every miner.
+        self.semantic_cache: SemanticCache = None
+        if self.config.neuron.semantic_cache_threshold > 0:
+            if self.config.neuron.semantic_cache_encoder == "hashing":
+                encoder = HashingEncoder()
+            else:
+                encoder = TransformerEncoder(self.config.neuron.semantic_cache_encoder)
+            self.semantic_cache = SemanticCache(
+                encoder,
+                threshold=self.config.neuron.semantic_cache_threshold,
+                max_vectors=self.config.neuron.semantic_cache_max_vectors,
+            )
+
+        # Deadline of the forward call running on each axon thread.
+        call_context = threading.local()
 
         # Define synapse.
         class Synapse(bt.TextPromptingSynapse):
@@ -68,13 +257,29 @@ class BasePromptingMiner(BaseMiner, ABC):
             ) -> Union[Tuple[bool, str], bool]:
                 return blacklist(self, self.blacklist, forward_call)
 
+            # Keep the deadline of the call for the forward function it runs.
+            def apply_forward_to_call(
+                _, forward_call: "bt.TextPromptingForwardCall"
+            ) -> "bt.TextPromptingForwardCall":
+                if not self.config.neuron.ignore_deadline:
+                    call_context.deadline = call_deadline(
+                        forward_call, self.config.neuron.deadline_margin
+                    )
+                try:
+                    return super(Synapse, _).apply_forward_to_call(forward_call)
+                finally:
+                    call_context.deadline = None
+
             # Build forward function.
             def forward(
                 _,
                 messages: List[Dict[str, str]],
                 log_data: Dict[str, Union[str, float]] = None,
+                deadline: float = None,
             ) -> str:
-                return forward(self, self.forward, messages, log_data)
+                if deadline is None:
+                    deadline = getattr(call_context, "deadline", None)
+                return forward(self, self.forward, messages, log_data, deadline)
 
             # Build backward function.
             # TODO(const): accept this.
@@ -88,3 +293,152 @@ class BasePromptingMiner(BaseMiner, ABC):
 
         # Instantiate synapse.
         self.synapse = Synapse(axon=self.axon)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super(BasePromptingMiner, self).__exit__(exc_type, exc_value, traceback)
+        if self.response_cache is not None and self.response_cache.store is not None:
+            self.response_cache.store.stop()
+        if self.backend is not None:
+            self.backend.close()
+
+    def enable_generation_engine(
+        self, engine: GenerationEngine, model_name: str
+    ) -> GenerationEngine:
+        """Generates through engine, with the batching and caches enabled by the config.
+
+        Batching, the prefix cache and the response cache are set up with the
+        generate kwargs of engine, see enable_batching, enable_prefix_cache and
+        enable_response_cache. With --neuron.pretokenize_prompts, prompts that go
+        through neither are built as token ids by a TokenizedChatTemplate.
+        """
+        self.engine = engine
+        self.enable_batching(
+            engine.model,
+            engine.tokenizer,
+            device=engine.device,
+            **engine.generate_kwargs,
+        )
+        self.enable_prefix_cache(
+            engine.model,
+            engine.tokenizer,
+            device=engine.device,
+            **engine.generate_kwargs,
+        )
+        self.enable_response_cache(model_name, **engine.generate_kwargs)
+        if self.config.neuron.pretokenize_prompts and engine.token_template is None:
+            engine.token_template = engine.template.tokenized(engine.tokenizer)
+        engine.batch_scheduler = self.batch_scheduler
+        engine.prefix_cache = self.prefix_cache
+        return engine
+
+    def enable_batching(
+        self,
+        model: "torch.nn.Module",
+        tokenizer: "transformers.PreTrainedTokenizer",
+        device: Any = None,
+        **generate_kwargs,
+    ) -> bool:
+        """Batches prompts submitted to self.batch_scheduler across concurrent requests.
+
+        Does nothing unless --neuron.max_batch_size is greater than 1. With
+        --neuron.continuous_batching, miners that set supports_continuous_batching
+        get a ContinuousBatchingEngine, otherwise batches go through generate_batch.
+        """
+        if self.config.neuron.max_batch_size <= 1:
+            return False
+
+        if self.config.neuron.continuous_batching:
+            if self.supports_continuous_batching:
+                self.batch_scheduler = ContinuousBatchingEngine(
+                    model,
+                    tokenizer,
+                    max_batch_size=self.config.neuron.max_batch_size,
+                    device=device,
+                    **generate_kwargs,
+                )
+                bt.logging.info(
+                    f"Continuous batching up to {self.config.neuron.max_batch_size} sequences"
+                )
+                return True
+            bt.logging.warning(
+                f"{self.__class__.__name__} does not support continuous batching, "
+                "falling back to batched generate calls."
+            )
+
+        self.batch_scheduler = BatchScheduler(
+            functools.partial(
+                generate_batch, model, tokenizer, device=device, **generate_kwargs
+            ),
+            max_batch_size=self.config.neuron.max_batch_size,
+            batch_window=self.config.neuron.batch_window_ms / 1000,
+        )
+        bt.logging.info(
+            f"Batching up to {self.config.neuron.max_batch_size} requests "
+            f"every {self.config.neuron.batch_window_ms}ms"
+        )
+        return True
+
+    def enable_prefix_cache(
+        self,
+        model: "torch.nn.Module",
+        tokenizer: "transformers.PreTrainedTokenizer",
+        device: Any = None,
+        **generate_kwargs,
+    ) -> bool:
+        """Reuses key/values of prompt prefixes seen by earlier requests in self.prefix_cache.
+
+        Does nothing unless --neuron.prefix_cache_mb is greater than 0. Only for
+        models keeping (batch, heads, seq, head_dim) key/value caches, miners
+        calling it set supports_prefix_cache.
+        """
+        if self.config.neuron.prefix_cache_mb <= 0:
+            return False
+
+        self.prefix_cache = PrefixCachedGenerator(
+            model,
+            tokenizer,
+            max_bytes=int(self.config.neuron.prefix_cache_mb * 2**20),
+            device=device,
+            **generate_kwargs,
+        )
+        bt.logging.info(
+            f"Caching prompt prefixes up to {self.config.neuron.prefix_cache_mb}MB"
+        )
+        return True
+
+    def enable_response_cache(self, model_name: str, **generation_params) -> bool:
+        """Serves repeated prompts from self.response_cache when generation is deterministic.
+
+        Does nothing if generation_params sample (see is_deterministic) or if
+        --neuron.response_cache_mb is 0. Subclasses pass every param that changes
+        the completion, the cache is keyed on them and the processed history. With
+        --neuron.response_cache_path completions are also kept on disk.
+        """
+        if self.config.neuron.response_cache_mb <= 0 or not is_deterministic(
+            generation_params
+        ):
+            return False
+
+        store = None
+        if self.config.neuron.response_cache_path:
+            store = ResponseStore(
+                self.config.neuron.response_cache_path,
+                max_bytes=int(self.config.neuron.response_cache_disk_mb * 2**20),
+            )
+            store.start()
+
+        self.response_cache = ResponseCache(
+            model_name,
+            generation_params,
+            max_bytes=int(self.config.neuron.response_cache_mb * 2**20),
+            ttl=self.config.neuron.response_cache_ttl,
+            store=store,
+        )
+        if store is not None:
+            # Warm from disk in the background, requests are served as soon as it starts.
+            threading.Thread(target=self.response_cache.warm, daemon=True).start()
+        bt.logging.info(
+            f"{self.__class__.__name__} generation is deterministic, caching completions up to "
+            f"{self.config.neuron.response_cache_mb}MB for {self.config.neuron.response_cache_ttl}s"
+        )
+        return True
@@ -0,0 +1,151 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import threading
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def refill(
+    tokens: float, refill_time: float, capacity: float, rate: float, now: float
+) -> float:
+    """Returns the tokens of a bucket last refilled at refill_time, refilled up to now."""
+    return min(capacity, tokens + max(now - refill_time, 0.0) * rate)
+
+
+class _BucketShard:
+    """Token buckets of the hotkeys of one shard, two array slots per hotkey behind one lock."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots: Dict[str, int] = {}
+        self.free_slots: List[int] = []
+        self.token_counts = array("d")
+        self.refill_times = array("d")
+
+    def refill(self, hotkey: str, capacity: float, rate: float, now: float) -> int:
+        """Refills the bucket of hotkey up to now and returns its slot, call with the lock held."""
+        slot = self.slots.get(hotkey)
+        if slot is None:
+            # New hotkeys start with a full bucket.
+            if self.free_slots:
+                slot = self.free_slots.pop()
+                self.token_counts[slot] = capacity
+                self.refill_times[slot] = now
+            else:
+                slot = len(self.token_counts)
+                self.token_counts.append(capacity)
+                self.refill_times.append(now)
+            self.slots[hotkey] = slot
+            return slot
+
+        self.token_counts[slot] = refill(
+            self.token_counts[slot], self.refill_times[slot], capacity, rate, now
+        )
+        self.refill_times[slot] = now
+        return slot
+
+
+class TokenBucketRateLimiter:
+    """Per hotkey token buckets holding up to `burst` requests, refilled at `refill_rate` per second.
+
+    Each hotkey takes two slots of array-backed storage, its token count and the time
+    of its last refill. Hotkeys are split into `stripes` shards by hash, each with its
+    own arrays and lock, so concurrent requests only contend on the lock of their
+    hotkey shard. With a `stake_scale`, both the burst and the refill rate of a
+    hotkey are multiplied by (1 + stake / stake_scale). All methods are thread-safe.
+    """
+
+    def __init__(
+        self,
+        burst: float,
+        refill_rate: float,
+        stake_scale: float = 0.0,
+        stripes: int = 64,
+    ):
+        self.burst = burst
+        self.refill_rate = refill_rate
+        self.stake_scale = stake_scale
+        self.shards: List[_BucketShard] = [_BucketShard() for _ in range(stripes)]
+
+    def scale(self, stake: float = 0.0) -> float:
+        if self.stake_scale <= 0:
+            return 1.0
+        return 1.0 + max(float(stake), 0.0) / self.stake_scale
+
+    def acquire(
+        self, hotkey: str, stake: float = 0.0, now: Optional[float] = None
+    ) -> bool:
+        """Takes a token from the bucket of hotkey, returns False if it is empty."""
+        now = time.time() if now is None else now
+        shard = self._shard(hotkey)
+        with shard.lock:
+            slot = shard.refill(hotkey, *self._bucket(stake), now)
+            if shard.token_counts[slot] < 1:
+                return False
+            shard.token_counts[slot] -= 1
+            return True
+
+    def tokens(
+        self, hotkey: str, stake: float = 0.0, now: Optional[float] = None
+    ) -> Optional[float]:
+        """Returns the tokens left for hotkey without taking one, None if it was never seen."""
+        now = time.time() if now is None else now
+        shard = self._shard(hotkey)
+        with shard.lock:
+            slot = shard.slots.get(hotkey)
+            if slot is None:
+                return None
+            capacity, rate = self._bucket(stake)
+            return refill(
+                shard.token_counts[slot], shard.refill_times[slot], capacity, rate, now
+            )
+
+    def retain(self, keep: Callable[[str], bool]) -> int:
+        """Forgets every hotkey for which keep returns False, returns how many were removed.
+
+        keep is evaluated on a snapshot of the hotkeys of each shard outside of its
+        lock, hotkeys added after the snapshot are kept until the next call.
+        """
+        removed = 0
+        for shard in self.shards:
+            with shard.lock:
+                hotkeys = list(shard.slots)
+            stale = [hotkey for hotkey in hotkeys if not keep(hotkey)]
+            if not stale:
+                continue
+            with shard.lock:
+                for hotkey in stale:
+                    slot = shard.slots.pop(hotkey, None)
+                    if slot is not None:
+                        shard.free_slots.append(slot)
+                        removed += 1
+        return removed
+
+    def __contains__(self, hotkey: str) -> bool:
+        return hotkey in self._shard(hotkey).slots
+
+    def __len__(self) -> int:
+        return sum(len(shard.slots) for shard in self.shards)
+
+    def _shard(self, hotkey: str) -> _BucketShard:
+        return self.shards[hash(hotkey) % len(self.shards)]
+
+    def _bucket(self, stake: float) -> Tuple[float, float]:
+        scale = self.scale(stake)
+        return self.burst * scale, self.refill_rate * scale
@@ -0,0 +1,161 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+from .prompt_cache import hash_messages
+from .response_store import ResponseStore
+
+
+def is_deterministic(generation_params: Dict[str, Any]) -> bool:
+    """Returns whether generate called with generation_params always gives the same completion.
+
+    Greedy and beam search decoding are deterministic, and so is sampling from the
+    single most likely token.
+    """
+    return not generation_params.get("do_sample", False) or (
+        generation_params.get("top_k") == 1
+    )
+
+
+def hash_history(history: Union[str, Iterable[Any]]) -> bytes:
+    """Returns the digest of a processed history string or a message list."""
+    if isinstance(history, str):
+        history = [history]
+    return hash_messages(history)
+
+
+class ResponseCache:
+    """LRU cache of completions keyed on the model, its generation params and the prompt.
+
+    Only valid for deterministic generation, see is_deterministic. Entries live for
+    `ttl` seconds and the least recently used ones are evicted once the keys and
+    completions take more than `max_bytes`. With a `store`, completions are also
+    written to disk, memory misses are looked up there and `warm` loads the most
+    recently used ones back. All methods are thread-safe.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        generation_params: Dict[str, Any],
+        max_bytes: int,
+        ttl: float = 3600.0,
+        store: Optional[ResponseStore] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.store = store
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[bytes, Tuple[str, float, int]]" = OrderedDict()
+        self.nbytes = 0
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+        # Every key is namespaced by the model and its generation params.
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(model_name.encode())
+        hasher.update(repr(sorted(generation_params.items())).encode())
+        self.namespace = hasher.digest()
+
+    @property
+    def hit_rate(self) -> float:
+        return self.stats["hits"] / max(self.stats["hits"] + self.stats["misses"], 1)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def key(self, history: Union[str, Iterable[Any]]) -> bytes:
+        """Returns the cache key of a processed history string or a message list."""
+        return self.namespace + hash_history(history)
+
+    def get(self, key: bytes, now: Optional[float] = None) -> Optional[str]:
+        """Returns the cached completion for key, None on a miss."""
+        now = time.time() if now is None else now
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] <= now:
+                self._remove(key)
+                self.stats["expirations"] += 1
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+
+        # Fall back to the store outside of the lock, it reads from disk.
+        stored = self.store.get(key, now) if self.store is not None else None
+        with self.lock:
+            if stored is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self._insert(key, *stored)
+            return stored[0]
+
+    def put(self, key: bytes, completion: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self.lock:
+            self._insert(key, completion, now + self.ttl)
+        if self.store is not None:
+            self.store.put(key, completion, now + self.ttl, now)
+
+    def warm(self, now: Optional[float] = None) -> int:
+        """Loads the most recently used completions of the store behind the ones already
+        in memory, up to max_bytes, and returns how many were loaded.
+        """
+        if self.store is None:
+            return 0
+        loaded = 0
+        for key, completion, expires in reversed(
+            self.store.recent(self.max_bytes, now)
+        ):
+            size = len(key) + len(completion.encode())
+            with self.lock:
+                if key in self.entries:
+                    continue
+                if self.nbytes + size > self.max_bytes:
+                    break
+                # Older than anything served since startup, so first in line for eviction.
+                self.entries[key] = (completion, expires, size)
+                self.entries.move_to_end(key, last=False)
+                self.nbytes += size
+                loaded += 1
+        return loaded
+
+    def _insert(self, key: bytes, completion: str, expires: float):
+        size = len(key) + len(completion.encode())
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (completion, expires, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: bytes):
+        _, _, size = self.entries.pop(key)
+        self.nbytes -= size
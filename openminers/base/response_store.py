@@ -0,0 +1,241 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import queue
+import sqlite3
+import threading
+import bittensor as bt
+from typing import Any, Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key BLOB PRIMARY KEY,
+    completion TEXT NOT NULL,
+    expires REAL NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+class ResponseStore:
+    """SQLite store of cached completions that survives restarts.
+
+    The database runs in WAL mode so any number of miner processes can read it
+    while one of them writes. Each thread reads through its own connection, and
+    writes go through a bounded queue to a background thread. Once completions
+    take more than `max_bytes` the writer deletes the least recently used ones
+    and checkpoints the WAL.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int,
+        max_queue_size: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        compact_interval: float = 60.0,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self.local = threading.local()
+        self.queue: "queue.Queue[Tuple[Any, ...]]" = queue.Queue(max_queue_size)
+        self.lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "dropped": 0,
+            "compacted": 0,
+        }
+        self.stop_event = threading.Event()
+        self.thread: threading.Thread = None
+        self._connection().executescript(SCHEMA)
+
+    def get(
+        self, key: bytes, now: Optional[float] = None
+    ) -> Optional[Tuple[str, float]]:
+        """Returns the completion stored for key and when it expires, None on a miss."""
+        now = time.time() if now is None else now
+        row = (
+            self._connection()
+            .execute(
+                "SELECT completion, expires FROM responses WHERE key = ? AND expires > ?",
+                (key, now),
+            )
+            .fetchone()
+        )
+        self._count("hits" if row is not None else "misses")
+        if row is not None:
+            self._enqueue(("touch", key, now))
+        return row
+
+    def put(
+        self, key: bytes, completion: str, expires: float, now: Optional[float] = None
+    ):
+        """Queues a completion for the writer, dropped and counted when the queue is full."""
+        now = time.time() if now is None else now
+        self._enqueue(("put", key, completion, expires, now))
+
+    def recent(
+        self, max_bytes: int, now: Optional[float] = None
+    ) -> List[Tuple[bytes, str, float]]:
+        """Returns the most recently used live completions taking up to max_bytes,
+        least recently used first.
+        """
+        now = time.time() if now is None else now
+        rows, total = [], 0
+        cursor = self._connection().execute(
+            "SELECT key, completion, expires, size FROM responses "
+            "WHERE expires > ? ORDER BY accessed DESC",
+            (now,),
+        )
+        for key, completion, expires, size in cursor:
+            total += size
+            if total > max_bytes:
+                break
+            rows.append((key, completion, expires))
+        cursor.close()
+        return rows[::-1]
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """Deletes expired and least recently used completions beyond max_bytes,
+        returns how many were deleted.
+        """
+        now = time.time() if now is None else now
+        connection = self._connection()
+        removed = connection.execute(
+            "DELETE FROM responses WHERE expires <= ?", (now,)
+        ).rowcount
+        removed += connection.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM ("
+            "  SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS total"
+            "  FROM responses"
+            " ) WHERE total > ?"
+            ")",
+            (self.max_bytes,),
+        ).rowcount
+        connection.commit()
+        if removed:
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._count("compacted", removed)
+        return removed
+
+    def size(self) -> int:
+        """Returns the bytes taken by the keys and completions."""
+        return (
+            self._connection()
+            .execute("SELECT COALESCE(SUM(size), 0) FROM responses")
+            .fetchone()[0]
+        )
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops the writer after writing every queued completion."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(5)
+            self.thread = None
+        self.flush()
+
+    def flush(self):
+        """Writes every queued completion from the calling thread."""
+        operations = self._drain(block=False)
+        while operations:
+            self._write(operations)
+            operations = self._drain(block=False)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def _count(self, name: str, value: int = 1):
+        with self.lock:
+            self.stats[name] += value
+
+    def _enqueue(self, operation: Tuple[Any, ...]):
+        try:
+            self.queue.put_nowait(operation)
+        except queue.Full:
+            self._count("dropped")
+
+    def _drain(self, block: bool) -> List[Tuple[Any, ...]]:
+        operations = []
+        if block:
+            try:
+                operations.append(self.queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                return operations
+        while len(operations) < self.batch_size:
+            try:
+                operations.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return operations
+
+    def _write(self, operations: List[Tuple[Any, ...]]):
+        puts, touches = [], []
+        for operation in operations:
+            if operation[0] == "put":
+                _, key, completion, expires, now = operation
+                size = len(key) + len(completion.encode())
+                puts.append((key, completion, expires, size, now))
+            else:
+                _, key, now = operation
+                touches.append((now, key))
+
+        connection = self._connection()
+        connection.executemany(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", puts
+        )
+        connection.executemany(
+            "UPDATE responses SET accessed = MAX(accessed, ?) WHERE key = ?", touches
+        )
+        connection.commit()
+        self._count("writes", len(puts))
+
+    def _loop(self):
+        last_compaction = time.time()
+        while not self.stop_event.is_set():
+            try:
+                operations = self._drain(block=True)
+                if operations:
+                    self._write(operations)
+                if time.time() - last_compaction >= self.compact_interval:
+                    self.compact()
+                    last_compaction = time.time()
+            except sqlite3.Error as e:
+                bt.logging.error(
+                    f"Failed to write cached completions to {self.path}: {e}"
+                )
@@ -15,9 +15,9 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 import time
-import wandb
 import bittensor as bt
 from .set_weights import set_weights
+from .metagraph_view import MetagraphView
 
 
 def run(self):
@@ -43,32 +43,42 @@ def run(self):
         self.axon.start()
 
     # --- Run until should_exit = True.
-    self.last_epoch_block = self.subtensor.get_current_block()
+    self.last_epoch_block = self.block_tracker.block
     bt.logging.info(f"Miner starting at block: { self.last_epoch_block }")
     while not self.should_exit:
         start_epoch = time.time()
 
         # --- Wait until next epoch.
-        current_block = self.subtensor.get_current_block()
+        current_block = self.block_tracker.block
         while (
             current_block - self.last_epoch_block
         ) < self.config.miner.blocks_per_epoch:
             # --- Wait for next block.
             time.sleep(1)
-            current_block = self.subtensor.get_current_block()
+            current_block = self.block_tracker.block
 
             # --- Check if we should exit.
             if self.should_exit:
                 break
 
+        # --- Re-anchor the block estimate once per epoch.
+        self.last_epoch_block = self.block_tracker.refresh()
+
         # --- Update the metagraph with the latest network state.
-        self.last_epoch_block = self.subtensor.get_current_block()
         self.metagraph.sync(lite=False, subtensor=self.subtensor)
-        for hotkey in self.request_timestamps:
-            if hotkey not in self.metagraph.hotkeys:
-                self.request_timestamps.pop(hotkey)
+        metagraph_view = MetagraphView.from_metagraph(self.metagraph)
+        self.metagraph_view = metagraph_view
+
+        # --- Prune per hotkey and prompt state from snapshots, one shard lock at a time.
+        self.rate_limiter.retain(lambda hotkey: hotkey in metagraph_view)
+        self.prompt_cache.prune()
 
-        self.uid = self.metagraph.hotkeys.index(self.wallet.hotkey.ss58_address)
+        # --- Like metagraph.hotkeys.index, fail once our hotkey is deregistered.
+        self.uid = metagraph_view.uid(self.wallet.hotkey.ss58_address)
+        if self.uid is None:
+            raise ValueError(
+                f"{self.wallet.hotkey.ss58_address} is not registered on netuid {self.config.netuid}"
+            )
 
         # --- Log performance.
         step_log = {
@@ -81,9 +91,40 @@ def run(self):
             "consensus": self.metagraph.C[self.uid].item(),
             "dividends": self.metagraph.D[self.uid].item(),
         }
+        prefix_cache = getattr(self, "prefix_cache", None)
+        if prefix_cache is not None:
+            step_log["prefix_cache_hit_rate"] = prefix_cache.tree.hit_rate
+            step_log["prefix_cache_saved_tokens"] = prefix_cache.tree.stats[
+                "saved_prefill_tokens"
+            ]
+        response_cache = getattr(self, "response_cache", None)
+        if response_cache is not None:
+            step_log["response_cache_hit_rate"] = response_cache.hit_rate
+            step_log.update(
+                {
+                    f"response_cache_{name}": value
+                    for name, value in response_cache.stats.items()
+                }
+            )
+            if response_cache.store is not None:
+                step_log.update(
+                    {
+                        f"response_store_{name}": value
+                        for name, value in response_cache.store.stats.items()
+                    }
+                )
+        semantic_cache = getattr(self, "semantic_cache", None)
+        if semantic_cache is not None:
+            step_log["semantic_cache_hit_rate"] = semantic_cache.hit_rate
+            step_log["semantic_cache_evictions"] = semantic_cache.stats["evictions"]
+        single_flight = getattr(self, "single_flight", None)
+        if single_flight is not None:
+            step_log["single_flight_generations_saved"] = single_flight.stats[
+                "coalesced"
+            ]
+        step_log.update(self.telemetry.snapshot())
         bt.logging.info(str(step_log))
-        if self.config.wandb.on:
-            wandb.log(step_log)
+        self.telemetry.log("epoch", step_log, sampled=False)
 
         # --- Set weights.
         if not self.config.miner.no_set_weights:
@@ -92,5 +133,5 @@ def run(self):
                 self.config.netuid,
                 self.uid,
                 self.wallet,
-                self.config.wandb.on,
+                self.telemetry,
             )
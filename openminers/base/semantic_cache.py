@@ -0,0 +1,187 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import re
+import time
+import zlib
+import threading
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+from .prompt_cache import hash_messages
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class HashingEncoder:
+    """Embeds text as signed hashes of its character n-grams, L2 normalized.
+
+    Needs no weights and takes microseconds, while still scoring paraphrases that
+    share most of their wording close to each other.
+    """
+
+    def __init__(self, dim: int = 512, ngram_size: int = 3):
+        self.dim = dim
+        self.ngram_size = ngram_size
+
+    def encode(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in WORD_PATTERN.findall(text.lower()):
+            word = f" {word} "
+            for start in range(max(len(word) - self.ngram_size + 1, 1)):
+                digest = zlib.crc32(word[start : start + self.ngram_size].encode())
+                vector[digest % self.dim] += 1.0 if digest & 2**31 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+
+class TransformerEncoder:
+    """Embeds text with the mean pooled last hidden state of a small transformers model,
+    such as sentence-transformers/all-MiniLM-L6-v2, on CPU.
+    """
+
+    def __init__(self, model_name: str, max_length: int = 128):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+        self.max_length = max_length
+        self.dim = self.model.config.hidden_size
+
+    def encode(self, text: str) -> np.ndarray:
+        inputs = self.tokenizer(
+            text, truncation=True, max_length=self.max_length, return_tensors="pt"
+        )
+        with self.torch.inference_mode():
+            hidden = self.model(**inputs).last_hidden_state[0]
+        mask = inputs["attention_mask"][0].unsqueeze(-1).to(hidden.dtype)
+        vector = ((hidden * mask).sum(0) / mask.sum()).numpy().astype(np.float32)
+        return vector / max(np.linalg.norm(vector), 1e-12)
+
+
+def _last_user_index(messages: List[Dict[str, str]]) -> Optional[int]:
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        if isinstance(message, dict) and message.get("role") == "user":
+            return index
+    return None
+
+
+def last_user_message(messages: List[Dict[str, str]]) -> Optional[str]:
+    index = _last_user_index(messages)
+    return None if index is None else messages[index].get("content", "")
+
+
+def conversation_context(messages: List[Dict[str, str]]) -> bytes:
+    """Returns a digest of the roles and contents of every message but the last user message."""
+    index = _last_user_index(messages)
+    if index is not None:
+        messages = messages[:index] + messages[index + 1 :]
+    return hash_messages(messages)
+
+
+class SemanticCache:
+    """Serves the completion of an earlier prompt whose embedding is close enough.
+
+    Embeddings of up to `max_vectors` prompts are rows of one contiguous matrix, so
+    a lookup is a single matrix-vector product followed by a top-k selection. Each
+    row also keeps the `context` digest of the rest of its conversation, like the
+    system prompt and earlier turns. The most similar of the `top_k` matches with
+    the same context is served if its cosine similarity reaches `threshold`, and the
+    least recently used row is overwritten once the matrix is full. All methods are
+    thread-safe.
+    """
+
+    def __init__(
+        self,
+        encoder: Any,
+        threshold: float = 0.9,
+        max_vectors: int = 10000,
+        top_k: int = 4,
+    ):
+        self.encoder = encoder
+        self.threshold = threshold
+        self.max_vectors = max_vectors
+        self.top_k = top_k
+        self.lock = threading.Lock()
+        self.vectors = np.zeros((max_vectors, encoder.dim), dtype=np.float32)
+        self.last_used = np.zeros(max_vectors, dtype=np.float64)
+        self.completions: List[Optional[str]] = [None] * max_vectors
+        self.contexts: List[Optional[bytes]] = [None] * max_vectors
+        self.size = 0
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def hit_rate(self) -> float:
+        return self.stats["hits"] / max(self.stats["hits"] + self.stats["misses"], 1)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def search(self, vector: np.ndarray) -> List[Tuple[int, float]]:
+        """Returns the rows of the top_k most similar prompts and their similarity."""
+        with self.lock:
+            similarities = self.vectors[: self.size] @ vector
+        if len(similarities) == 0:
+            return []
+        k = min(self.top_k, len(similarities))
+        rows = np.argpartition(-similarities, k - 1)[:k]
+        rows = rows[np.argsort(-similarities[rows])]
+        return [(int(row), float(similarities[row])) for row in rows]
+
+    def lookup(
+        self, text: str, now: Optional[float] = None, context: bytes = b""
+    ) -> Tuple[Optional[str], np.ndarray]:
+        """Returns the completion cached for a prompt similar to text in the same
+        context, None on a miss, and the embedding of text to pass on to `add`.
+        """
+        now = time.time() if now is None else now
+        vector = self.encoder.encode(text)
+        matches = self.search(vector)
+        with self.lock:
+            for row, _ in matches:
+                # The row may have been overwritten since the search, check it again.
+                if (
+                    self.contexts[row] == context
+                    and float(self.vectors[row] @ vector) >= self.threshold
+                ):
+                    self.last_used[row] = now
+                    self.stats["hits"] += 1
+                    return self.completions[row], vector
+            self.stats["misses"] += 1
+            return None, vector
+
+    def add(
+        self,
+        vector: np.ndarray,
+        completion: str,
+        now: Optional[float] = None,
+        context: bytes = b"",
+    ):
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.size < self.max_vectors:
+                row = self.size
+                self.size += 1
+            else:
+                row = int(np.argmin(self.last_used))
+                self.stats["evictions"] += 1
+            self.vectors[row] = vector
+            self.last_used[row] = now
+            self.completions[row] = completion
+            self.contexts[row] = context
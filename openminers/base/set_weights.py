@@ -1,6 +1,6 @@
 import torch
-import wandb
 import bittensor as bt
+from .telemetry import Telemetry
 
 
 def set_weights(
@@ -8,7 +8,7 @@ def set_weights(
     netuid: int,
     uid: int,
     wallet: "bt.wallet",
-    wandb_on=False,
+    telemetry: Telemetry = None,
 ) -> None:
     try:
         # --- query the chain for the most current number of peers on the network
@@ -24,10 +24,10 @@ def set_weights(
             wallet=wallet,
             version_key=1,
         )
-        if wandb_on:
-            wandb.log({"set_weights": 1})
+        if telemetry is not None:
+            telemetry.log("set_weights", {"set_weights": 1}, sampled=False)
 
     except Exception as e:
-        if wandb_on:
-            wandb.log({"set_weights": 0})
+        if telemetry is not None:
+            telemetry.log("set_weights", {"set_weights": 0}, sampled=False)
         bt.logging.error(f"Failed to set weights on chain with exception: { e }")
@@ -0,0 +1,99 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import threading
+from typing import List, Optional, Tuple
+
+from .prompt_cache import PromptCache
+
+
+class ShardedPromptCache:
+    """PromptCache split into lock striped shards by prompt key.
+
+    `check_and_add` locks a single shard and expires the old buckets of that shard
+    only, while `expire` just raises the minimum block, so the request path never
+    walks or locks the whole cache. The epoch loop calls `prune` to expire every
+    shard, one lock at a time.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self.stripes = stripes
+        self.shards: List[PromptCache] = [PromptCache() for _ in range(stripes)]
+        self.locks: List[threading.Lock] = [threading.Lock() for _ in range(stripes)]
+        self.min_block: Optional[int] = None
+
+    def shard(self, key: bytes) -> int:
+        return hash(key) % self.stripes
+
+    def __contains__(self, key: bytes) -> bool:
+        entry = self.get(key)
+        return entry is not None
+
+    def __getitem__(self, key: bytes) -> Tuple[str, int]:
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __len__(self) -> int:
+        return sum(1 for _, (_, block) in self.snapshot() if self._live(block))
+
+    def get(self, key: bytes) -> Optional[Tuple[str, int]]:
+        shard = self.shard(key)
+        with self.locks[shard]:
+            entry = self.shards[shard].entries.get(key)
+        if entry is None or not self._live(entry[1]):
+            return None
+        return entry
+
+    def add(self, key: bytes, hotkey: str, block: int):
+        """Adds a prompt key, keys already present keep their original block."""
+        self.check_and_add(key, hotkey, block)
+
+    def check_and_add(self, key: bytes, hotkey: str, block: int) -> bool:
+        """Atomically adds a prompt key and returns whether it was already present."""
+        shard = self.shard(key)
+        with self.locks[shard]:
+            cache = self.shards[shard]
+            if self.min_block is not None:
+                cache.expire(self.min_block)
+            return cache.check_and_add(key, hotkey, block)
+
+    def expire(self, min_block: int) -> int:
+        """Ignores every entry inserted before min_block, always returns 0 as removal is lazy."""
+        if self.min_block is None or min_block > self.min_block:
+            self.min_block = min_block
+        return 0
+
+    def prune(self) -> int:
+        """Removes every expired entry, shard by shard, returns how many were removed."""
+        if self.min_block is None:
+            return 0
+        removed = 0
+        for lock, cache in zip(self.locks, self.shards):
+            with lock:
+                removed += cache.expire(self.min_block)
+        return removed
+
+    def snapshot(self) -> List[Tuple[bytes, Tuple[str, int]]]:
+        items = []
+        for lock, cache in zip(self.locks, self.shards):
+            with lock:
+                items.extend(cache.entries.items())
+        return items
+
+    def _live(self, block: int) -> bool:
+        return self.min_block is None or block >= self.min_block
@@ -0,0 +1,311 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import mmap
+import time
+import fcntl
+import struct
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from .rate_limiter import refill
+
+MAGIC = b"OMSTATE1"
+HEADER = struct.Struct("<8sQQQ")
+# The first page holds the header, the byte at LOCK_OFFSET + stripe is locked per stripe.
+HEADER_SIZE = 4096
+LOCK_OFFSET = 1024
+HOTKEY_SIZE = 48
+EMPTY, USED, DELETED = 0, 1, 2
+
+
+def hotkey_key(hotkey: str) -> bytes:
+    return hashlib.blake2b(hotkey.encode(), digest_size=16).digest()
+
+
+class SharedHashTable:
+    """Fixed size open addressed hash table in a memory mapped file, shared between processes.
+
+    Slots hold a 16 byte key, the hotkey that wrote it and a struct packed value. The
+    table is split into `stripes` regions and keys only probe the region their hash
+    selects, so each region is guarded by its own lock: a threading.Lock within the
+    process plus an fcntl record lock across processes. Inserting into a region with
+    no free slot in the probe window overwrites the slot with the smallest `age`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        capacity: int,
+        value_format: str,
+        age: Callable[[Tuple], float],
+        stripes: int = 64,
+        max_probe: int = 32,
+    ):
+        if stripes > HEADER_SIZE - LOCK_OFFSET:
+            raise ValueError(
+                f"At most {HEADER_SIZE - LOCK_OFFSET} stripes are supported"
+            )
+        self.slot = struct.Struct(
+            "<B16s" + f"{HOTKEY_SIZE}s" + value_format.lstrip("<")
+        )
+        self.age = age
+        self.stripes = stripes
+        self.region = max(-(-capacity // stripes), 1)
+        self.capacity = self.region * stripes
+        self.max_probe = min(max_probe, self.region)
+        size = HEADER_SIZE + self.capacity * self.slot.size
+
+        # The first process to open the file sizes it and writes the header.
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            layout = (MAGIC, self.capacity, stripes, self.slot.size)
+            if os.fstat(self.fd).st_size == 0:
+                os.ftruncate(self.fd, size)
+                os.pwrite(self.fd, HEADER.pack(*layout), 0)
+            elif HEADER.unpack(os.pread(self.fd, HEADER.size, 0)) != layout:
+                raise ValueError(f"{path} holds a table with a different layout")
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            self.memory = mmap.mmap(self.fd, size)
+        except Exception:
+            # Closing the file also releases the lock.
+            os.close(self.fd)
+            raise
+        self.thread_locks = [threading.Lock() for _ in range(stripes)]
+
+    def get(self, key: bytes) -> Optional[Tuple[str, Tuple]]:
+        """Returns the (hotkey, value) stored under key, None if it is absent."""
+        stripe, start = self._locate(key)
+        with self._locked(stripe):
+            found, _ = self._find(stripe, start, key)
+            return None if found is None else self._read(found)
+
+    def update(
+        self,
+        key: bytes,
+        hotkey: str,
+        update: Callable[[Optional[Tuple]], Tuple[Optional[Tuple], bool]],
+    ) -> bool:
+        """Atomically applies update to the value under key and returns its result.
+
+        update receives the current value or None and returns the value to store, or
+        None to leave the table unchanged, along with a result.
+        """
+        stripe, start = self._locate(key)
+        with self._locked(stripe):
+            found, insert_at = self._find(stripe, start, key)
+            value, result = update(None if found is None else self._read(found)[1])
+            if value is not None:
+                self.slot.pack_into(
+                    self.memory,
+                    insert_at,
+                    USED,
+                    key,
+                    hotkey.encode()[:HOTKEY_SIZE],
+                    *value,
+                )
+            return result
+
+    def items(self) -> Iterator[Tuple[str, Tuple]]:
+        """Yields the (hotkey, value) of every entry, one locked stripe at a time."""
+        for stripe in range(self.stripes):
+            with self._locked(stripe):
+                entries = [
+                    self._read(offset)
+                    for offset in self._offsets(stripe)
+                    if self.memory[offset] == USED
+                ]
+            yield from entries
+
+    def delete_where(self, predicate: Callable[[str, Tuple], bool]) -> int:
+        """Deletes every entry for which predicate(hotkey, value) holds, returns how many."""
+        removed = 0
+        for stripe in range(self.stripes):
+            with self._locked(stripe):
+                for offset in self._offsets(stripe):
+                    if self.memory[offset] == USED and predicate(*self._read(offset)):
+                        self.memory[offset] = DELETED
+                        removed += 1
+        return removed
+
+    def close(self):
+        self.memory.close()
+        os.close(self.fd)
+
+    @contextmanager
+    def _locked(self, stripe: int):
+        with self.thread_locks[stripe]:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, LOCK_OFFSET + stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, LOCK_OFFSET + stripe)
+
+    def _locate(self, key: bytes) -> Tuple[int, int]:
+        hash = int.from_bytes(key[:8], "little")
+        return hash % self.stripes, (hash // self.stripes) % self.region
+
+    def _offsets(self, stripe: int) -> List[int]:
+        base = HEADER_SIZE + stripe * self.region * self.slot.size
+        return [base + index * self.slot.size for index in range(self.region)]
+
+    def _find(self, stripe: int, start: int, key: bytes) -> Tuple[Optional[int], int]:
+        """Returns the offset of key or None, and the offset to write key at."""
+        base = HEADER_SIZE + stripe * self.region * self.slot.size
+        free, oldest, oldest_age = None, None, None
+        for probe in range(self.max_probe):
+            offset = base + ((start + probe) % self.region) * self.slot.size
+            state, slot_key, _, *value = self.slot.unpack_from(self.memory, offset)
+            if state == USED:
+                if slot_key == key:
+                    return offset, offset
+                age = self.age(tuple(value))
+                if oldest is None or age < oldest_age:
+                    oldest, oldest_age = offset, age
+            elif free is None:
+                free = offset
+            if state == EMPTY:
+                # Keys are never stored past an empty slot of their probe sequence.
+                break
+        return None, free if free is not None else oldest
+
+    def _read(self, offset: int) -> Tuple[str, Tuple]:
+        _, _, hotkey, *value = self.slot.unpack_from(self.memory, offset)
+        return hotkey.rstrip(b"\0").decode(), tuple(value)
+
+
+class SharedPromptCache:
+    """PromptCache backed by a SharedHashTable so every miner process on a host shares it.
+
+    Expiry is lazy: entries inserted before the last `expire` block are ignored and
+    overwritten first once their region is full.
+    """
+
+    def __init__(self, path: str, capacity: int = 2**16, stripes: int = 64):
+        self.table = SharedHashTable(
+            path, capacity, "<q", age=lambda value: value[0], stripes=stripes
+        )
+        self.min_block: int = -(2**63)
+
+    def __contains__(self, key: bytes) -> bool:
+        entry = self.table.get(key)
+        return entry is not None and entry[1][0] >= self.min_block
+
+    def __getitem__(self, key: bytes) -> Tuple[str, int]:
+        entry = self.table.get(key)
+        if entry is None or entry[1][0] < self.min_block:
+            raise KeyError(key)
+        hotkey, (block,) = entry
+        return hotkey, block
+
+    def __len__(self) -> int:
+        return sum(1 for _, (block,) in self.table.items() if block >= self.min_block)
+
+    def add(self, key: bytes, hotkey: str, block: int):
+        """Adds a prompt key, keys already present keep their original block."""
+        self.check_and_add(key, hotkey, block)
+
+    def check_and_add(self, key: bytes, hotkey: str, block: int) -> bool:
+        """Atomically adds a prompt key and returns whether it was already present."""
+
+        def update(value):
+            if value is not None and value[0] >= self.min_block:
+                return None, True
+            return (block,), False
+
+        return self.table.update(key, hotkey, update)
+
+    def expire(self, min_block: int) -> int:
+        """Ignores every entry inserted before min_block, always returns 0 as removal is lazy."""
+        self.min_block = max(self.min_block, min_block)
+        return 0
+
+    def prune(self) -> int:
+        """Frees the slots of every expired entry, returns how many were removed."""
+        return self.table.delete_where(lambda _, value: value[0] < self.min_block)
+
+
+class SharedRateLimiter:
+    """TokenBucketRateLimiter backed by a SharedHashTable so every miner process on a host
+    draws from the same bucket per hotkey.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        burst: float,
+        refill_rate: float,
+        stake_scale: float = 0.0,
+        capacity: int = 2**16,
+        stripes: int = 64,
+    ):
+        self.burst = burst
+        self.refill_rate = refill_rate
+        self.stake_scale = stake_scale
+        self.table = SharedHashTable(
+            path, capacity, "<dd", age=lambda value: value[1], stripes=stripes
+        )
+
+    def scale(self, stake: float = 0.0) -> float:
+        if self.stake_scale <= 0:
+            return 1.0
+        return 1.0 + max(float(stake), 0.0) / self.stake_scale
+
+    def acquire(
+        self, hotkey: str, stake: float = 0.0, now: Optional[float] = None
+    ) -> bool:
+        """Takes a token from the bucket of hotkey, returns False if it is empty."""
+        now = time.time() if now is None else now
+        scale = self.scale(stake)
+
+        def update(value):
+            if value is None:
+                tokens = self.burst * scale
+            else:
+                tokens = refill(
+                    *value, self.burst * scale, self.refill_rate * scale, now
+                )
+            if tokens < 1:
+                return (tokens, now), False
+            return (tokens - 1, now), True
+
+        return self.table.update(hotkey_key(hotkey), hotkey, update)
+
+    def tokens(
+        self, hotkey: str, stake: float = 0.0, now: Optional[float] = None
+    ) -> Optional[float]:
+        """Returns the tokens left for hotkey without taking one, None if it was never seen."""
+        now = time.time() if now is None else now
+        entry = self.table.get(hotkey_key(hotkey))
+        if entry is None:
+            return None
+        scale = self.scale(stake)
+        return refill(*entry[1], self.burst * scale, self.refill_rate * scale, now)
+
+    def retain(self, keep: Callable[[str], bool]) -> int:
+        """Forgets every hotkey for which keep returns False, returns how many were removed."""
+        return self.table.delete_where(lambda hotkey, _: not keep(hotkey))
+
+    def __contains__(self, hotkey: str) -> bool:
+        return self.table.get(hotkey_key(hotkey)) is not None
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.table.items())
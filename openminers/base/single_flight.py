@@ -0,0 +1,81 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import threading
+from concurrent.futures import Future, TimeoutError
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one.
+
+    The first caller for a key runs the function while callers arriving before it
+    returns wait on its future, for at most `timeout` seconds, and get the same
+    result or exception. Keys are forgotten as soon as the call finishes, so later
+    calls run again.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.calls: Dict[Hashable, Future] = {}
+        self.stats: Dict[str, int] = {
+            "calls": 0,
+            "coalesced": 0,
+            "errors": 0,
+            "timeouts": 0,
+        }
+
+    def do(
+        self, key: Hashable, func: Callable[[], Any], timeout: Optional[float] = None
+    ) -> Tuple[Any, bool]:
+        """Returns the result of func, or of the call in flight for key, and whether
+        it was shared. Raises the exception of the call, or TimeoutError if waiting
+        for it took longer than timeout, or than the timeout given for this call.
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+                self.stats["calls"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            if self.timeout is not None:
+                timeout = (
+                    self.timeout if timeout is None else min(timeout, self.timeout)
+                )
+            try:
+                return future.result(timeout=timeout), True
+            except TimeoutError:
+                with self.lock:
+                    self.stats["timeouts"] += 1
+                raise
+
+        try:
+            result = func()
+        except BaseException as e:
+            with self.lock:
+                self.stats["errors"] += 1
+                del self.calls[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            del self.calls[key]
+        future.set_result(result)
+        return result, False
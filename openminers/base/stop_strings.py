@@ -0,0 +1,138 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+from collections import deque
+from typing import AsyncIterator, Dict, Iterable, List, Sequence
+
+
+class StopStringMatcher:
+    """Aho-Corasick automaton finding the first occurrence of any stop string.
+
+    Built once per set of stop strings. Text is scanned one character at a time
+    whatever the number of stops, and the scan carries over between chunks, so
+    a stop split across two streamed chunks is still found.
+    """
+
+    def __init__(self, stops: Sequence[str]):
+        stops = [stop for stop in stops if stop]
+        if not stops:
+            raise ValueError("At least one non empty stop string is required.")
+        self.stops = stops
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        # Length of the longest stop ending at each state, 0 when none does.
+        self.match: List[int] = [0]
+        for stop in stops:
+            state = 0
+            for char in stop:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.match.append(0)
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.match[state] = max(self.match[state], len(stop))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(char, 0)
+                self.match[child] = max(self.match[child], self.match[self.fail[child]])
+                queue.append(child)
+
+    def step(self, state: int, char: str) -> int:
+        while state and char not in self.goto[state]:
+            state = self.fail[state]
+        return self.goto[state].get(char, 0)
+
+    def stream(self) -> "StopStringStream":
+        return StopStringStream(self)
+
+    def cut(self, text: str) -> str:
+        """Returns text up to the first stop string."""
+        stream = self.stream()
+        stream.feed(text)
+        return stream.text
+
+
+class StopStringStream:
+    """Incremental scan of streamed text, `text` holds everything before the first stop."""
+
+    def __init__(self, matcher: StopStringMatcher):
+        self.matcher = matcher
+        self.state = 0
+        self.chunks: List[str] = []
+        self.length = 0
+        self.stopped = False
+        self.chunks_read = 0
+
+    def feed(self, chunk: str) -> bool:
+        """Scans chunk and returns whether a stop string has been found."""
+        if self.stopped:
+            return True
+        self.chunks_read += 1
+        step, match, state = self.matcher.step, self.matcher.match, self.state
+        for index, char in enumerate(chunk):
+            state = step(state, char)
+            if match[state]:
+                end = self.length + index + 1 - match[state]
+                text = "".join(self.chunks) + chunk
+                self.chunks, self.length = [text[:end]], end
+                self.stopped = True
+                return True
+        self.state = state
+        self.chunks.append(chunk)
+        self.length += len(chunk)
+        return False
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+
+def consume(chunks: Iterable[str], matcher: StopStringMatcher) -> StopStringStream:
+    """Reads chunks until a stop string, then closes the iterator to end generation upstream."""
+    stream = matcher.stream()
+    try:
+        for chunk in chunks:
+            if stream.feed(chunk):
+                break
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+    return stream
+
+
+async def aconsume(
+    chunks: AsyncIterator[str], matcher: StopStringMatcher
+) -> StopStringStream:
+    """Async version of consume, closing the iterator with aclose."""
+    stream = matcher.stream()
+    try:
+        async for chunk in chunks:
+            if stream.feed(chunk):
+                break
+    finally:
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    return stream
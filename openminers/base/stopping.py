@@ -0,0 +1,132 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import torch
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class StopSequences:
+    """Stop token ids and multi-token stop sequences compiled to one tensor.
+
+    Every stop is right-aligned in a (count, max_length) tensor, left-padded with -1
+    which no token id equals. A step compares the last max_length tokens of every
+    row against every stop at once, so its cost does not grow with a Python loop
+    over stops or rows. Inputs shorter than max_length are padded with -2, which
+    never matches a stop's padding. The compiled tensors are shared, each
+    `generate` call gets its own StopOnSequences from `criteria()`.
+    """
+
+    def __init__(self, sequences: Iterable[Sequence[int]]):
+        stops: List[List[int]] = []
+        for sequence in sequences:
+            sequence = [int(token) for token in sequence]
+            if sequence and sequence not in stops:
+                stops.append(sequence)
+        if not stops:
+            raise ValueError("At least one non empty stop sequence is required.")
+        self.max_length = max(len(stop) for stop in stops)
+        self.stops = torch.tensor(
+            [[-1] * (self.max_length - len(stop)) + stop for stop in stops]
+        )
+        self.lengths = torch.tensor([len(stop) for stop in stops])
+        self._devices: Dict[torch.device, Tuple[torch.Tensor, torch.Tensor]] = {}
+
+    @classmethod
+    def from_strings(
+        cls,
+        tokenizer: "transformers.PreTrainedTokenizer",
+        stops: Sequence[str] = (),
+        token_ids: Sequence[int] = (),
+    ) -> "StopSequences":
+        """Encodes stop strings, with and without a leading space, and adds the single token_ids."""
+        sequences = [[token_id] for token_id in token_ids if token_id is not None]
+        for stop in stops:
+            for text in (stop, " " + stop):
+                sequences.append(tokenizer.encode(text, add_special_tokens=False))
+        return cls(sequences)
+
+    def _on(self, device: torch.device) -> Tuple[torch.Tensor, torch.Tensor]:
+        tensors = self._devices.get(device)
+        if tensors is None:
+            tensors = self.stops.to(device), self.lengths.to(device)
+            self._devices[device] = tensors
+        return tensors
+
+    def matches(self, input_ids: torch.LongTensor, start: int = 0) -> torch.Tensor:
+        """Returns, per row, the length of the longest stop sequence ending input_ids, 0 for none.
+
+        Only stop sequences lying entirely after position `start` are matched.
+        """
+        stops, lengths = self._on(input_ids.device)
+        suffix = input_ids[:, -self.max_length :]
+        if suffix.shape[1] < self.max_length:
+            suffix = torch.nn.functional.pad(
+                suffix, (self.max_length - suffix.shape[1], 0), value=-2
+            )
+        # Padding never matches, a stop is found when all of its own tokens do.
+        hit = (suffix[:, None, :] == stops[None]).sum(-1) == lengths
+        generated = input_ids.shape[1] - start
+        if generated < self.max_length:
+            hit &= lengths <= generated
+        return (hit * lengths).amax(-1)
+
+    def criteria(self) -> "StopOnSequences":
+        return StopOnSequences(self)
+
+
+class StopOnSequences:
+    """Stopping criteria tracking which rows of a batch have produced a stop sequence.
+
+    Called by `generate` like a transformers StoppingCriteria, without subclassing
+    it so that importing this module does not import transformers.
+
+    `generate` stops once every row is done. Rows that finish earlier keep being
+    extended with the batch, `ends` holds the length at which each one should be cut
+    (without its stop sequence), or -1 for rows which never stopped. Use a new
+    instance for every `generate` call.
+    """
+
+    def __init__(self, stop: StopSequences):
+        self.stop = stop
+        self.prompt_length: Optional[int] = None
+        self.ends: Optional[torch.Tensor] = None
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
+    ) -> bool:
+        if self.ends is None:
+            # The first call sees the prompt and one new token.
+            self.prompt_length = input_ids.shape[1] - 1
+            self.ends = torch.full(
+                (input_ids.shape[0],), -1, dtype=torch.long, device=input_ids.device
+            )
+
+        matched = self.stop.matches(input_ids, self.prompt_length)
+        if not matched.any():
+            # Nothing changed since the previous step, which did not stop.
+            return False
+        newly = (matched > 0) & (self.ends < 0)
+        self.ends = torch.where(newly, input_ids.shape[1] - matched, self.ends)
+        return bool((self.ends >= 0).all())
+
+    def truncate(self, sequences: torch.Tensor, pad_token_id: int) -> torch.Tensor:
+        """Replaces the stop sequence and everything after it by pad_token_id in each row."""
+        if self.ends is None:
+            return sequences
+        positions = torch.arange(sequences.shape[1], device=sequences.device)
+        ends = torch.where(self.ends < 0, sequences.shape[1], self.ends)
+        return sequences.masked_fill(positions[None, :] >= ends[:, None], pad_token_id)
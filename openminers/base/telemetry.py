@@ -0,0 +1,203 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import json
+import time
+import queue
+import sqlite3
+import itertools
+import threading
+import bittensor as bt
+from typing import Any, Dict, List, Optional
+
+
+class Sink:
+    """Destination for batches of telemetry records, written from the flusher thread."""
+
+    def write(self, records: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class WandbSink(Sink):
+    def write(self, records: List[Dict[str, Any]]):
+        import wandb
+
+        for record in records:
+            wandb.log(record["data"])
+
+
+class JsonlSink(Sink):
+    def __init__(self, path: str):
+        self.file = open(path, "a")
+
+    def write(self, records: List[Dict[str, Any]]):
+        self.file.writelines(
+            json.dumps(record, default=str) + "\n" for record in records
+        )
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class SqliteSink(Sink):
+    def __init__(self, path: str):
+        # Only the flusher thread writes, the connection is created before it starts.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS telemetry (time REAL, kind TEXT, data TEXT)"
+        )
+        self.connection.commit()
+
+    def write(self, records: List[Dict[str, Any]]):
+        self.connection.executemany(
+            "INSERT INTO telemetry VALUES (?, ?, ?)",
+            [
+                (
+                    record["time"],
+                    record["kind"],
+                    json.dumps(record["data"], default=str),
+                )
+                for record in records
+            ],
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+class Telemetry:
+    """Batches telemetry records off the request path.
+
+    Counters are aggregated in memory for every call to `increment`. Records passed
+    to `log` go through a bounded queue to a background thread that writes them to
+    every sink in batches. With `sample_rate` N only one in N sampled records is
+    queued, and records are dropped and counted instead of blocking when the queue is
+    full.
+    """
+
+    def __init__(
+        self,
+        sinks: List[Sink],
+        max_queue_size: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        sample_rate: int = 1,
+    ):
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_rate = max(sample_rate, 1)
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(max_queue_size)
+        self.sample_counter = itertools.count()
+        self.lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.dropped: int = 0
+        self.stop_event = threading.Event()
+        self.thread: threading.Thread = None
+
+    @classmethod
+    def from_config(cls, config: "bt.Config") -> "Telemetry":
+        sinks: List[Sink] = []
+        if config.wandb.on:
+            sinks.append(WandbSink())
+        if config.miner.telemetry.jsonl_path:
+            sinks.append(JsonlSink(config.miner.telemetry.jsonl_path))
+        if config.miner.telemetry.sqlite_path:
+            sinks.append(SqliteSink(config.miner.telemetry.sqlite_path))
+        return cls(
+            sinks,
+            max_queue_size=config.miner.telemetry.max_queue_size,
+            flush_interval=config.miner.telemetry.flush_interval,
+            sample_rate=config.miner.telemetry.sample_rate,
+        )
+
+    def increment(self, name: str, value: float = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self) -> Dict[str, float]:
+        """Returns a copy of the counters including the number of dropped records."""
+        with self.lock:
+            return {**self.counters, "telemetry_dropped": self.dropped}
+
+    def log(self, kind: str, data: Dict[str, Any], sampled: bool = True) -> bool:
+        """Queues a record for the sinks, returns False if it was sampled out or dropped."""
+        if not self.sinks:
+            return False
+        if sampled and next(self.sample_counter) % self.sample_rate != 0:
+            return False
+        try:
+            self.queue.put_nowait({"time": time.time(), "kind": kind, "data": data})
+            return True
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+
+    def start(self):
+        if self.thread is not None or not self.sinks:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops the flusher after writing every queued record and closes the sinks."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(5)
+            self.thread = None
+        records = self._drain(block=False)
+        while records:
+            self._flush(records)
+            records = self._drain(block=False)
+        for sink in self.sinks:
+            sink.close()
+
+    def _drain(self, block: bool) -> List[Dict[str, Any]]:
+        records = []
+        if block:
+            try:
+                records.append(self.queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                return records
+        while len(records) < self.batch_size:
+            try:
+                records.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return records
+
+    def _flush(self, records: List[Dict[str, Any]]):
+        if not records:
+            return
+        for sink in self.sinks:
+            try:
+                sink.write(records)
+            except Exception as e:
+                bt.logging.error(
+                    f"Failed to write {len(records)} telemetry records to {sink.__class__.__name__}: {e}"
+                )
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            self._flush(self._drain(block=True))
@@ -20,10 +20,13 @@ import argparse
 import openminers
 import bittensor
 from typing import List, Dict, Optional
-from langchain.llms import AI21
+from openminers.base.api_backends import AI21Backend
+from openminers.base.chat_template import ROLE_LINES
 
 
 class AI21Miner(openminers.BasePromptingMiner):
+    template = ROLE_LINES
+
     @classmethod
     def check_config(cls, config: "bittensor.Config"):
         assert (
@@ -39,10 +42,36 @@ class AI21Miner(openminers.BasePromptingMiner):
             help="Name of the model.",
             default="j2-jumbo-instruct",
         )
+        parser.add_argument(
+            "--ai21.max_tokens",
+            type=int,
+            help="The maximum number of tokens to generate in the completion.",
+            default=256,
+        )
+        parser.add_argument(
+            "--ai21.temperature",
+            type=float,
+            help="Sampling temperature to use.",
+            default=0.7,
+        )
         parser.add_argument(
             "--ai21.stop", help="Stop tokens.", default=["user: ", "bot: ", "system: "]
         )
 
+    @classmethod
+    def build_backend(
+        cls, config: "bittensor.Config", api_key: Optional[str] = None
+    ) -> AI21Backend:
+        """Returns the API backend configured by config, also used by the router miner."""
+        return AI21Backend.from_config(
+            config,
+            api_key=api_key or config.ai21.api_key,
+            model=config.ai21.model_name,
+            maxTokens=config.ai21.max_tokens,
+            temperature=config.ai21.temperature,
+            stopSequences=config.ai21.stop,
+        )
+
     def __init__(self, api_key: Optional[str] = None, *args, **kwargs):
         super(AI21Miner, self).__init__(*args, **kwargs)
         bittensor.logging.info("Loading AI21 Model...")
@@ -50,29 +79,17 @@ class AI21Miner(openminers.BasePromptingMiner):
             raise ValueError(
                 "the miner requires passing --ai21.api_key as an argument of the config or to the constructor."
             )
-        self.model = AI21(
-            model=self.config.ai21.model_name,
-            ai21_api_key=api_key or self.config.ai21.api_key,
-            stop=self.config.ai21.stop,
-        )
+        self.backend = self.build_backend(self.config, api_key)
         bittensor.logging.info("Model loaded!")
 
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+    @classmethod
+    def _process_history(cls, history: List[Dict[str, str]]) -> str:
+        return cls.template.render(history)
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
-        history = self._process_history(messages)
-        resp = self.model(history)
-        return resp
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
+        return self.backend.generate(messages, deadline)
 
 
 if __name__ == "__main__":
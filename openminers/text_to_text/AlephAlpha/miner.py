@@ -21,10 +21,13 @@ import openminers
 import bittensor
 from rich import print
 from typing import List, Dict, Optional
-from langchain.llms import AlephAlpha
+from openminers.base.api_backends import AlephAlphaBackend
+from openminers.base.chat_template import ROLE_LINES
 
 
 class AlephAlphaMiner(openminers.BasePromptingMiner):
+    template = ROLE_LINES
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument("--aleph.api_key", type=str, help="AlephAlpha API key.")
@@ -65,39 +68,39 @@ class AlephAlphaMiner(openminers.BasePromptingMiner):
             default=0.0,
         )
 
+    @classmethod
+    def build_backend(
+        cls, config: "bittensor.Config", api_key: Optional[str] = None
+    ) -> AlephAlphaBackend:
+        """Returns the API backend configured by config, also used by the router miner."""
+        return AlephAlphaBackend.from_config(
+            config,
+            api_key=api_key or config.aleph.api_key,
+            model=config.aleph.model,
+            maximum_tokens=config.aleph.maximum_tokens,
+            temperature=config.aleph.temperature,
+            top_k=config.aleph.top_k,
+            top_p=config.aleph.top_p,
+            stop_sequences=config.aleph.stop_sequences,
+        )
+
     def __init__(self, api_key: Optional[str] = None, *args, **kwargs):
         super(AlephAlphaMiner, self).__init__(*args, **kwargs)
         if api_key is None and self.config.aleph.api_key is None:
             raise ValueError(
                 "the miner requires passing --aleph.api_key as an argument of the config or to the constructor."
             )
-        self.model = AlephAlpha(
-            aleph_alpha_api_key=api_key or self.config.aleph.api_key,
-            model=self.config.aleph.model,
-            maximum_tokens=self.config.aleph.maximum_tokens,
-            temperature=self.config.aleph.temperature,
-            top_k=self.config.aleph.top_k,
-            top_p=self.config.aleph.top_p,
-            stop_sequences=self.config.aleph.stop_sequences,
-        )
+        self.backend = self.build_backend(self.config, api_key)
 
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+    @classmethod
+    def _process_history(cls, history: List[Dict[str, str]]) -> str:
+        return cls.template.render(history)
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
         bittensor.logging.info("messages", str(messages))
-        history = self._process_history(messages)
-        bittensor.logging.info("history", str(history))
-        resp = self.model(history)
+        resp = self.backend.generate(messages, deadline)
         bittensor.logging.info("response", str(resp))
         return resp
 
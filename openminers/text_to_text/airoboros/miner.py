@@ -16,16 +16,27 @@
 # DEALINGS IN THE SOFTWARE.
 
 import time
-import torch
 import argparse
 import openminers
 import bittensor
 
-from typing import List, Dict
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from typing import List, Dict, Optional
+from openminers.base.chat_template import ChatTemplate
+from openminers.base.generation_engine import GenerationEngine
 
 
 class AiroborosMiner(openminers.BasePromptingMiner):
+    supports_continuous_batching = True
+    supports_prefix_cache = True
+    template = ChatTemplate(
+        roles={
+            "system": "{content} ",
+            "Assistant": "ASSISTANT:{content}</s>",
+            "user": "USER: {content} ",
+        },
+        generation_prompt="ASSISTANT:",
+    )
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -77,59 +88,37 @@ class AiroborosMiner(openminers.BasePromptingMiner):
     @classmethod
     def config(cls) -> "bittensor.Config":
         parser = argparse.ArgumentParser(description="Airoboros Miner Configs")
-        cls.add_args(parser)
+        cls.add_super_args(parser)
         return bittensor.config(parser)
 
     def __init__(self, *args, **kwargs):
         super(AiroborosMiner, self).__init__(*args, **kwargs)
-        bittensor.logging.info("Loading " + str(self.config.airoboros.model_name))
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            self.config.airoboros.model_name, use_fast=False
-        )
-        self.model = AutoModelForCausalLM.from_pretrained(
+        self.enable_generation_engine(
+            GenerationEngine.from_pretrained(
+                self.config.airoboros.model_name,
+                self.template,
+                device=self.config.airoboros.device,
+                tokenizer_kwargs={"use_fast": False},
+                model_kwargs={"device_map": self.config.airoboros.device_map},
+                system_prompt=(
+                    self.config.airoboros.system_prompt
+                    if self.config.airoboros.do_prompt_injection
+                    else None
+                ),
+                max_new_tokens=self.config.airoboros.max_new_tokens,
+                temperature=self.config.airoboros.temperature,
+                do_sample=self.config.airoboros.do_sample,
+            ),
             self.config.airoboros.model_name,
-            torch_dtype=torch.float16,
-            low_cpu_mem_usage=True,
-            device_map=self.config.airoboros.device_map,
         )
-        bittensor.logging.info("Model loaded!")
-
-        if self.config.airoboros.device != "cpu":
-            self.model = self.model.to(self.config.airoboros.device)
 
-    def _process_history(self, history: List[str]) -> str:
-        processed_history = ""
-        if self.config.airoboros.do_prompt_injection:
-            processed_history += self.config.airoboros.system_prompt
-        for message in history:
-            if message["role"] == "system":
-                if (
-                    not self.config.airoboros.do_prompt_injection
-                    or message != history[0]
-                ):
-                    processed_history += "" + message["content"].strip() + " "
-            if message["role"] == "Assistant":
-                processed_history += "ASSISTANT:" + message["content"].strip() + "</s>"
-            if message["role"] == "user":
-                processed_history += "USER: " + message["content"].strip() + " "
-        return processed_history
+    def _process_history(self, history: List[Dict[str, str]]) -> str:
+        return self.engine.render(history)
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
-        history = self._process_history(messages)
-        prompt = history + "ASSISTANT:"
-        input_ids = self.tokenizer.encode(prompt, return_tensors="pt").to(
-            self.config.airoboros.device
-        )
-        output = self.model.generate(
-            input_ids,
-            max_length=input_ids.shape[1] + self.config.airoboros.max_new_tokens,
-            temperature=self.config.airoboros.temperature,
-            do_sample=self.config.airoboros.do_sample,
-            pad_token_id=self.tokenizer.eos_token_id,
-        )
-        generation = self.tokenizer.decode(
-            output[0][input_ids.shape[1] :], skip_special_tokens=True
-        )
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
+        generation = self.engine(messages, deadline)
 
         # Logging input and generation if debugging is active
         bittensor.logging.debug("Message: " + str(messages))
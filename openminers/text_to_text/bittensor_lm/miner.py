@@ -22,17 +22,32 @@ import argparse
 import bittensor
 import deepspeed
 import openminers
-from typing import List, Dict
+from typing import List, Dict, Optional
+from openminers.base.deadline import max_time_kwargs
+from openminers.base.chat_template import ChatTemplate, ROLE_LINES
+from openminers.base.completion import (
+    NewTokensPipeline,
+    decode_new_tokens,
+    trim_completion,
+)
 
 import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
 
 
 class CerebrasBTLMMiner(openminers.BasePromptingMiner):
+    template = ROLE_LINES
+    # Contents only, one per line, without roles or system messages.
+    vanilla_template = ChatTemplate(
+        roles={"system": None}, strip=False, other_roles="{content}\n"
+    )
+    # Role markers the model may go on to write after its answer.
+    stop_sequences = ["system:", "user:", "assistant:"]
+
     @classmethod
     def config(cls) -> "bittensor.Config":
         parser = argparse.ArgumentParser(description="Bittensor-LM Miner Configs")
-        cls.add_args(parser)
+        cls.add_super_args(parser)
         return bittensor.config(parser)
 
     @classmethod
@@ -112,6 +127,7 @@ class CerebrasBTLMMiner(openminers.BasePromptingMiner):
 
         self.pipe = pipeline(
             "text-generation",
+            pipeline_class=NewTokensPipeline,
             model=model,
             tokenizer=tokenizer,
             device=self.config.btlm.device,
@@ -128,36 +144,32 @@ class CerebrasBTLMMiner(openminers.BasePromptingMiner):
                 replace_with_kernel_inject=False,
             )
 
+        self.enable_response_cache(
+            "cerebras/btlm-3b-8k-base",
+            do_sample=self.config.btlm.do_sample,
+            max_new_tokens=self.config.btlm.max_length,
+            no_repeat_ngram_size=self.config.btlm.no_repeat_ngram_size,
+        )
+
     def backward(
         self, messages: List[Dict[str, str]], response: str, rewards: torch.FloatTensor
     ) -> str:
         pass
 
-    def _process_history(self, history: List[Dict[str, str]]) -> str:
-        processed_history = ""
+    def _system_prompt(self) -> Optional[str]:
         if self.config.btlm.do_prompt_injection:
-            processed_history += self.config.btlm.system_prompt
-        for message in history:
-            if message["role"] == "system":
-                if not self.config.btlm.do_prompt_injection or message != history[0]:
-                    processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+            return self.config.btlm.system_prompt
+        return None
+
+    def _process_history(self, history: List[Dict[str, str]]) -> str:
+        return self.template.render(history, self._system_prompt())
 
     def _process_history_vanilla(self, history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        if self.config.btlm.do_prompt_injection:
-            processed_history += self.config.btlm.system_prompt
-        for message in history:
-            if message["role"] == "system":
-                continue
-            processed_history += message["content"] + "\n"
-        return processed_history
-
-    def forward(self, messages: List[Dict[str, str]]) -> str:
+        return self.vanilla_template.render(history, self._system_prompt())
+
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
         if self.config.btlm.use_vanilla_process_history:
             history = self._process_history_vanilla(messages)
         else:
@@ -165,11 +177,10 @@ class CerebrasBTLMMiner(openminers.BasePromptingMiner):
             history += "assistant: "
 
         bittensor.logging.debug("History: {}".format(history))
-        generation = (
-            self.pipe(history)[0]["generated_text"]
-            .split(":")[-1]
-            .replace(str(history), "")
-        )
+        generation = self.pipe(history, **max_time_kwargs(deadline))[0][
+            "generated_text"
+        ]
+        generation = trim_completion(generation, self.stop_sequences)
         bittensor.logging.debug("Generation: {}".format(generation))
         return generation
 
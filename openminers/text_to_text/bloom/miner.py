@@ -19,7 +19,14 @@ import time
 import torch
 import argparse
 import openminers
-from typing import List, Dict
+from typing import List, Dict, Optional
+from openminers.base.deadline import max_time_kwargs
+from openminers.base.chat_template import ChatTemplate
+from openminers.base.completion import (
+    NewTokensPipeline,
+    decode_new_tokens,
+    trim_completion,
+)
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline, AutoConfig
 from transformers.deepspeed import HfDeepSpeedConfig
 import deepspeed
@@ -31,6 +38,17 @@ world_size = int(os.getenv("WORLD_SIZE", "1"))
 
 
 class BloomChatMiner(openminers.BasePromptingMiner):
+    template = ChatTemplate(
+        roles={
+            "system": "<human>: {content}\n",
+            "assistant": "<bot>: {content}\n",
+            "user": "<human>: {content}\n",
+        },
+        strip=False,
+    )
+    # Role markers the model may go on to write after its answer.
+    stop_sequences = ["<human>:", "<bot>:"]
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -68,7 +86,7 @@ class BloomChatMiner(openminers.BasePromptingMiner):
     @classmethod
     def config(cls) -> "bittensor.Config":
         parser = argparse.ArgumentParser(description="Bloom Miner Config")
-        cls.add_args(parser)
+        cls.add_super_args(parser)
         return bittensor.config(parser)
 
     def __init__(self, *args, **kwargs):
@@ -170,24 +188,19 @@ class BloomChatMiner(openminers.BasePromptingMiner):
 
             self.pipe = pipeline(
                 "text-generation",
+                pipeline_class=NewTokensPipeline,
                 model=self.model,
                 tokenizer=self.tokenizer,
                 device_map="auto",
             )
 
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "<human>: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "<bot>: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "<human>: " + message["content"] + "\n"
-        return processed_history
-
-    def forward(self, messages: List[Dict[str, str]]) -> str:
+    @classmethod
+    def _process_history(cls, history: List[Dict[str, str]]) -> str:
+        return cls.template.render(history)
+
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
         history = self._process_history(messages)
 
         if self.config.deployment_framework == "deepspeed":
@@ -195,24 +208,22 @@ class BloomChatMiner(openminers.BasePromptingMiner):
                 device=self.local_rank
             )
             with torch.no_grad():
-                outputs = self.ds_engine.module.generate(inputs, max_length=60)
-            resp = self.tokenizer.decode(outputs[0], skip_special_tokens=True).replace(
-                str(history), ""
-            )
+                outputs = self.ds_engine.module.generate(
+                    inputs, max_length=60, **max_time_kwargs(deadline)
+                )
+            resp = decode_new_tokens(self.tokenizer, outputs, inputs.shape[1])[0]
 
         else:
-            resp = (
-                self.pipe(
-                    history,
-                    max_new_tokens=self.config.bloom.max_new_tokens,
-                    do_sample=True,
-                    top_k=10,
-                    num_return_sequences=1,
-                    eos_token_id=self.tokenizer.eos_token_id,
-                )[0]["generated_text"]
-                .split(":")[-1]
-                .replace(str(history), "")
-            )
+            resp = self.pipe(
+                history,
+                max_new_tokens=self.config.bloom.max_new_tokens,
+                do_sample=True,
+                top_k=10,
+                num_return_sequences=1,
+                eos_token_id=self.tokenizer.eos_token_id,
+                **max_time_kwargs(deadline),
+            )[0]["generated_text"]
+        resp = trim_completion(resp, self.stop_sequences)
 
         # Logging input and generation if debugging is active
         bittensor.logging.debug("Message: " + str(messages))
@@ -19,11 +19,22 @@ import time
 import argparse
 import openminers
 import bittensor
-from typing import List, Dict
+from typing import List, Dict, Optional
+from openminers.base.deadline import max_time_kwargs
+from openminers.base.chat_template import ROLE_LINES
+from openminers.base.completion import (
+    NewTokensPipeline,
+    decode_new_tokens,
+    trim_completion,
+)
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
 
 
 class CerebrasMiner(openminers.BasePromptingMiner):
+    template = ROLE_LINES
+    # Role markers the model may go on to write after its answer.
+    stop_sequences = ["system:", "user:", "assistant:"]
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -68,6 +79,7 @@ class CerebrasMiner(openminers.BasePromptingMiner):
         )
         self.pipe = pipeline(
             "text-generation",
+            pipeline_class=NewTokensPipeline,
             model=model,
             tokenizer=tokenizer,
             device=0,
@@ -76,25 +88,25 @@ class CerebrasMiner(openminers.BasePromptingMiner):
             no_repeat_ngram_size=self.config.cerebras.no_repeat_ngram_size,
         )
 
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+        self.enable_response_cache(
+            "cerebras/Cerebras-GPT-{}".format(self.config.cerebras.model_size),
+            do_sample=False,
+            max_new_tokens=self.config.cerebras.max_length,
+            no_repeat_ngram_size=self.config.cerebras.no_repeat_ngram_size,
+        )
+
+    @classmethod
+    def _process_history(cls, history: List[Dict[str, str]]) -> str:
+        return cls.template.render(history)
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
         history = self._process_history(messages)
-        return (
-            self.pipe(history)[0]["generated_text"]
-            .split(":")[-1]
-            .replace(str(history), "")
-        )
+        generation = self.pipe(history, **max_time_kwargs(deadline))[0][
+            "generated_text"
+        ]
+        return trim_completion(generation, self.stop_sequences)
 
 
 if __name__ == "__main__":
@@ -20,10 +20,13 @@ import argparse
 import openminers
 import bittensor
 from typing import List, Dict, Optional
-from langchain.llms import Cohere
+from openminers.base.api_backends import CohereBackend
+from openminers.base.chat_template import ROLE_LINES
 
 
 class CohereMiner(openminers.BasePromptingMiner):
+    template = ROLE_LINES
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -82,40 +85,41 @@ class CohereMiner(openminers.BasePromptingMiner):
         )
         parser.add_argument("--cohere.api_key", type=str, help="API key for Cohere.")
 
+    @classmethod
+    def build_backend(
+        cls, config: "bittensor.Config", api_key: Optional[str] = None
+    ) -> CohereBackend:
+        """Returns the API backend configured by config, also used by the router miner."""
+        return CohereBackend.from_config(
+            config,
+            api_key=api_key or config.cohere.api_key,
+            model=config.cohere.model_name,
+            max_tokens=config.cohere.max_tokens,
+            temperature=config.cohere.temperature,
+            k=config.cohere.k,
+            p=config.cohere.p,
+            frequency_penalty=config.cohere.frequency_penalty,
+            presence_penalty=config.cohere.presence_penalty,
+            truncate=config.cohere.truncate,
+            stop_sequences=([config.cohere.stop] if config.cohere.stop else None),
+        )
+
     def __init__(self, api_key: Optional[str] = None, *args, **kwargs):
         super(CohereMiner, self).__init__(*args, **kwargs)
         if api_key is None and self.config.cohere.api_key is None:
             raise ValueError(
                 "the miner requires passing --cohere.api_key as an argument of the config or to the constructor."
             )
-        self.model = Cohere(
-            model=self.config.cohere.model_name,
-            cohere_api_key=api_key or self.config.cohere.api_key,
-            max_tokens=self.config.cohere.max_tokens,
-            temperature=self.config.cohere.temperature,
-            k=self.config.cohere.k,
-            p=self.config.cohere.p,
-            frequency_penalty=self.config.cohere.frequency_penalty,
-            presence_penalty=self.config.cohere.presence_penalty,
-            truncate=self.config.cohere.truncate,
-            stop=self.config.cohere.stop,
-        )
+        self.backend = self.build_backend(self.config, api_key)
 
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+    @classmethod
+    def _process_history(cls, history: List[Dict[str, str]]) -> str:
+        return cls.template.render(history)
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
-        history = self._process_history(messages)
-        return self.model(history)
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
+        return self.backend.generate(messages, deadline)
 
 
 if __name__ == "__main__":
@@ -23,11 +23,18 @@ import bittensor
 import deepspeed
 import os
 
-from typing import List, Dict
+from typing import List, Dict, Optional
+from openminers.base.deadline import max_time_kwargs
+from openminers.base.chat_template import ChatTemplate
+from openminers.base.stopping import StopSequences
+from openminers.base.completion import (
+    NewTokensPipeline,
+    decode_new_tokens,
+    trim_completion,
+)
 from transformers import (
     AutoTokenizer,
     pipeline,
-    StoppingCriteria,
     StoppingCriteriaList,
     AutoModelForCausalLM,
     AutoConfig,
@@ -35,20 +42,17 @@ from transformers import (
 from transformers.deepspeed import HfDeepSpeedConfig
 
 
-class StopOnTokens(StoppingCriteria):
-    def __init__(self, stop_token_ids: List[int]):
-        self.stop_token_ids = stop_token_ids
-
-    def __call__(
-        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
-    ) -> bool:
-        for stop_id in self.stop_token_ids:
-            if input_ids[0][-1] == stop_id:
-                return True
-        return False
-
-
 class FalconMiner(openminers.BasePromptingMiner):
+    template = ChatTemplate(
+        roles={
+            "system": "{content} ",
+            "assistant": "Assistant:{content}</s>",
+            "user": "User: {content} ",
+        }
+    )
+    # Role markers the model may go on to write after its answer.
+    stop_sequences = ["User:", "Assistant:", "ASSISTANT:"]
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -134,7 +138,7 @@ class FalconMiner(openminers.BasePromptingMiner):
     @classmethod
     def config(cls) -> "bittensor.Config":
         parser = argparse.ArgumentParser(description="Falcon Miner Config")
-        cls.add_args(parser)
+        cls.add_super_args(parser)
         return bittensor.config(parser)
 
     def __init__(self, *args, **kwargs):
@@ -145,7 +149,9 @@ class FalconMiner(openminers.BasePromptingMiner):
         self.stop_token_ids = self.tokenizer.convert_tokens_to_ids(
             ["</s>", "<|endoftext|>"]
         )
-        self.stop = StopOnTokens(self.stop_token_ids)
+        self.stop = StopSequences.from_strings(
+            self.tokenizer, self.stop_sequences, token_ids=self.stop_token_ids
+        )
 
         if self.config.deployment_framework == "deepspeed":
             # distributed setup
@@ -256,24 +262,44 @@ class FalconMiner(openminers.BasePromptingMiner):
                 kwargs["device_map"] = self.config.falcon.device_map
             else:
                 kwargs["device"] = self.config.falcon.device
-            self.model = pipeline("text-generation", **kwargs)
+            self.model = pipeline(
+                "text-generation", pipeline_class=NewTokensPipeline, **kwargs
+            )
             bittensor.logging.info("Model loaded!")
 
-    def _process_history(self, history: List[str]) -> str:
-        processed_history = ""
+            # Each batched row stops on its own, at eos or at a role marker.
+            self.enable_batching(
+                self.model.model,
+                self.tokenizer,
+                device=self.model.device,
+                max_length=self.config.falcon.max_length,
+                temperature=self.config.falcon.temperature,
+                do_sample=self.config.falcon.do_sample,
+                top_k=self.config.falcon.top_k,
+                eos_token_id=self.stop_token_ids,
+                repetition_penalty=self.config.falcon.repetition_penalty,
+                stop_sequences=self.stop,
+            )
+
+            self.enable_response_cache(
+                self.config.falcon.model_name,
+                max_length=self.config.falcon.max_length,
+                temperature=self.config.falcon.temperature,
+                do_sample=self.config.falcon.do_sample,
+                top_k=self.config.falcon.top_k,
+                num_return_sequences=self.config.falcon.num_return_sequences,
+                repetition_penalty=self.config.falcon.repetition_penalty,
+            )
+
+    def _process_history(self, history: List[Dict[str, str]]) -> str:
+        system_prompt = None
         if self.config.falcon.do_prompt_injection:
-            processed_history += self.config.falcon.system_prompt
-        for message in history:
-            if message["role"] == "system":
-                if not self.config.falcon.do_prompt_injection or message != history[0]:
-                    processed_history += "" + message["content"].strip() + " "
-            if message["role"] == "assistant":
-                processed_history += "Assistant:" + message["content"].strip() + "</s>"
-            if message["role"] == "user":
-                processed_history += "User: " + message["content"].strip() + " "
-        return processed_history
-
-    def forward(self, messages: List[Dict[str, str]]) -> str:
+            system_prompt = self.config.falcon.system_prompt
+        return self.template.render(history, system_prompt)
+
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
         history = self._process_history(messages)
         prompt = history + "ASSISTANT:"
 
@@ -282,27 +308,28 @@ class FalconMiner(openminers.BasePromptingMiner):
                 device=self.local_rank
             )
             with torch.no_grad():
-                outputs = self.ds_engine.module.generate(inputs, max_length=60)
-            generation = self.tokenizer.decode(
-                outputs[0], skip_special_tokens=True
-            ).replace(str(history), "")
+                outputs = self.ds_engine.module.generate(
+                    inputs, max_length=60, **max_time_kwargs(deadline)
+                )
+            generation = decode_new_tokens(self.tokenizer, outputs, inputs.shape[1])[0]
+
+        elif self.batch_scheduler is not None:
+            generation = self.batch_scheduler.submit(prompt, deadline=deadline)
 
         else:
-            generation = (
-                self.model(
-                    prompt,
-                    max_length=self.config.falcon.max_length,
-                    do_sample=self.config.falcon.do_sample,
-                    top_k=self.config.falcon.top_k,
-                    num_return_sequences=self.config.falcon.num_return_sequences,
-                    eos_token_id=self.tokenizer.eos_token_id,
-                    pad_token_id=self.tokenizer.pad_token_id,
-                    repetition_penalty=self.config.falcon.repetition_penalty,
-                    stopping_criteria=StoppingCriteriaList([self.stop]),
-                )[0]["generated_text"]
-                .split(":")[-1]
-                .replace(str(history), "")
-            )
+            generation = self.model(
+                prompt,
+                max_length=self.config.falcon.max_length,
+                do_sample=self.config.falcon.do_sample,
+                top_k=self.config.falcon.top_k,
+                num_return_sequences=self.config.falcon.num_return_sequences,
+                eos_token_id=self.tokenizer.eos_token_id,
+                pad_token_id=self.tokenizer.pad_token_id,
+                repetition_penalty=self.config.falcon.repetition_penalty,
+                stopping_criteria=StoppingCriteriaList([self.stop.criteria()]),
+                **max_time_kwargs(deadline),
+            )[0]["generated_text"]
+        generation = trim_completion(generation, self.stop_sequences)
 
         # Logging input and generation if debugging is active
         bittensor.logging.debug("Message: " + str(messages))
@@ -21,16 +21,18 @@ import openminers
 import bittensor
 
 from typing import List, Dict, Any, Optional
-from langchain.llms import GooseAI
+from openminers.base.api_backends import GooseAIBackend
+from openminers.base.chat_template import ROLE_LINES
 
 
 class GooseMiner(openminers.BasePromptingMiner):
+    template = ROLE_LINES
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
             "--gooseai.api_key",
             type=str,
-            required=True,
             help="GooseAI api key required.",
         )
         parser.add_argument(
@@ -94,42 +96,43 @@ class GooseMiner(openminers.BasePromptingMiner):
             help="Adjust the probability of specific tokens being generated",
         )
 
+    @classmethod
+    def build_backend(
+        cls, config: "bittensor.Config", api_key: Optional[str] = None
+    ) -> GooseAIBackend:
+        """Returns the API backend configured by config, also used by the router miner."""
+        return GooseAIBackend.from_config(
+            config,
+            api_key=api_key or config.gooseai.api_key,
+            model=config.gooseai.model_name,
+            temperature=config.gooseai.temperature,
+            max_tokens=config.gooseai.max_tokens,
+            top_p=config.gooseai.top_p,
+            min_tokens=config.gooseai.min_tokens,
+            frequency_penalty=config.gooseai.frequency_penalty,
+            presence_penalty=config.gooseai.presence_penalty,
+            n=config.gooseai.n,
+            logit_bias=config.gooseai.logit_bias or None,
+            **config.gooseai.model_kwargs,
+        )
+
     def __init__(self, api_key: Optional[str] = None, *args, **kwargs):
         super(GooseMiner, self).__init__(*args, **kwargs)
         if api_key is None and self.config.gooseai.api_key is None:
             raise ValueError(
                 "the miner requires passing --gooseai.api_key as an argument of the config or to the constructor."
             )
-        model_kwargs = {
-            "model": self.config.gooseai.model_name,
-            "n_ctx": self.config.gooseai.max_tokens,
-            "n_parts": self.config.gooseai.n,
-            "temp": self.config.gooseai.temperature,
-            "top_p": self.config.gooseai.top_p,
-            "repeat_penalty": self.config.gooseai.frequency_penalty,
-        }
-        self.model = GooseAI(
-            gooseai_api_key=api_key or self.config.gooseai.api_key,
-            model_kwargs=model_kwargs,
-        )
+        self.backend = self.build_backend(self.config, api_key)
 
-    @staticmethod
-    def _process_history(history: List[dict]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+    @classmethod
+    def _process_history(cls, history: List[Dict[str, str]]) -> str:
+        return cls.template.render(history)
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
         bittensor.logging.info("messages", str(messages))
-        history = self._process_history(messages)
-        bittensor.logging.info("history", str(history))
-        resp = self.model(history)
+        resp = self.backend.generate(messages, deadline)
         bittensor.logging.info("response", str(resp))
         return resp
 
@@ -21,9 +21,15 @@ import openminers
 import bittensor as bt
 from typing import List, Dict
 from langchain.llms import GPT4All
+from openminers.base.stop_strings import StopStringMatcher, consume
+from openminers.base.chat_template import ROLE_LINES
 
 
 class GPT4ALLMiner(openminers.BasePromptingMiner):
+    template = ROLE_LINES
+    stop_sequences = ["user: ", "bot: ", "system: "]
+    stop_matcher = StopStringMatcher(stop_sequences)
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -153,30 +159,30 @@ class GPT4ALLMiner(openminers.BasePromptingMiner):
             top_p=self.config.gpt4all.top_p,
             top_k=self.config.gpt4all.top_k,
             echo=self.config.gpt4all.echo,
-            stop=["user: ", "bot: ", "system: "],
+            stop=self.stop_sequences,
             repeat_last_n=self.config.gpt4all.repeat_last_n,
             repeat_penalty=self.config.gpt4all.repeat_penalty,
             n_batch=self.config.gpt4all.n_batch,
             streaming=self.config.gpt4all.streaming,
         )
 
-    @staticmethod
-    def _process_history(history: List[dict]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+    @classmethod
+    def _process_history(cls, history: List[Dict[str, str]]) -> str:
+        return cls.template.render(history)
 
     def forward(self, messages: List[Dict[str, str]]) -> str:
         bt.logging.info("messages", str(messages))
         history = self._process_history(messages)
         bt.logging.info("history", str(history))
-        resp = self.model(history)
+        if self.config.gpt4all.streaming:
+            # Read tokens as they are generated, closing the generator at a stop string
+            # ends generation instead of running on to n_predict tokens.
+            tokens = self.model.client.generate(
+                history, streaming=True, **self.model._default_params()
+            )
+            resp = consume(tokens, self.stop_matcher).text
+        else:
+            resp = self.stop_matcher.cut(self.model(history))
         bt.logging.info("response", str(resp))
         return resp
 
@@ -19,7 +19,14 @@ import time
 import torch
 import argparse
 import openminers
-from typing import List, Dict
+from typing import List, Dict, Optional
+from openminers.base.deadline import max_time_kwargs
+from openminers.base.chat_template import ROLE_LINES
+from openminers.base.completion import (
+    NewTokensPipeline,
+    decode_new_tokens,
+    trim_completion,
+)
 from transformers import (
     AutoTokenizer,
     AutoModelForCausalLM,
@@ -39,6 +46,13 @@ deployment_framework = "accelerate"
 
 
 class LlamaMiner(openminers.BasePromptingMiner):
+    template = ROLE_LINES
+    # Role markers the model may go on to write after its answer.
+    stop_sequences = ["system:", "user:", "assistant:"]
+
+    supports_continuous_batching = True
+    supports_prefix_cache = True
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -97,10 +111,21 @@ class LlamaMiner(openminers.BasePromptingMiner):
             help="Description of stopping_criteria",
         )
 
+    @classmethod
+    def check_neuron_config(cls, config: "bittensor.Config"):
+        super().check_neuron_config(config)
+        if (
+            config.deployment_framework == "deepspeed"
+            and config.neuron.prefix_cache_mb > 0
+        ):
+            raise ValueError(
+                "--neuron.prefix_cache_mb is not supported with deepspeed."
+            )
+
     @classmethod
     def config(cls) -> "bittensor.Config":
         parser = argparse.ArgumentParser(description="Falcon Miner Config")
-        cls.add_args(parser)
+        cls.add_super_args(parser)
         return bittensor.config(parser)
 
     def __init__(self, *args, **kwargs):
@@ -209,25 +234,39 @@ class LlamaMiner(openminers.BasePromptingMiner):
 
             self.pipe = pipeline(
                 "text-generation",
+                pipeline_class=NewTokensPipeline,
                 model=self.model,
                 tokenizer=self.tokenizer,
                 torch_dtype=torch.bfloat16,
                 device_map="auto",
             )
 
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+            self.enable_batching(
+                self.model,
+                self.tokenizer,
+                device=self.model.device,
+                max_length=200,
+                do_sample=True,
+                top_k=10,
+                eos_token_id=self.tokenizer.eos_token_id,
+            )
+            self.enable_prefix_cache(
+                self.model,
+                self.tokenizer,
+                device=self.model.device,
+                max_length=200,
+                do_sample=True,
+                top_k=10,
+                eos_token_id=self.tokenizer.eos_token_id,
+            )
+
+    @classmethod
+    def _process_history(cls, history: List[Dict[str, str]]) -> str:
+        return cls.template.render(history)
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
         history = self._process_history(messages)
         if self.config.deployment_framework == "deepspeed":
             t_generate_start = time.time()
@@ -235,23 +274,25 @@ class LlamaMiner(openminers.BasePromptingMiner):
                 device=self.local_rank
             )
             with torch.no_grad():
-                outputs = self.ds_engine.module.generate(inputs, max_length=60)
-            resp = self.tokenizer.decode(outputs[0], skip_special_tokens=True).replace(
-                str(history), ""
-            )
+                outputs = self.ds_engine.module.generate(
+                    inputs, max_length=60, **max_time_kwargs(deadline)
+                )
+            resp = decode_new_tokens(self.tokenizer, outputs, inputs.shape[1])[0]
+        elif self.batch_scheduler is not None:
+            resp = self.batch_scheduler.submit(history, deadline=deadline)
+        elif self.prefix_cache is not None:
+            resp = self.prefix_cache.generate(history, deadline)
         else:
-            resp = (
-                self.pipe(
-                    history,
-                    max_length=200,
-                    do_sample=True,
-                    top_k=10,
-                    num_return_sequences=1,
-                    eos_token_id=self.tokenizer.eos_token_id,
-                )[0]["generated_text"]
-                .split(":")[-1]
-                .replace(str(history), "")
-            )
+            resp = self.pipe(
+                history,
+                max_length=200,
+                do_sample=True,
+                top_k=10,
+                num_return_sequences=1,
+                eos_token_id=self.tokenizer.eos_token_id,
+                **max_time_kwargs(deadline),
+            )[0]["generated_text"]
+        resp = trim_completion(resp, self.stop_sequences)
 
         # Logging input and generation if debugging is active
         bittensor.logging.debug("Message: " + str(messages))
@@ -16,16 +16,28 @@
 # DEALINGS IN THE SOFTWARE.
 
 import time
-import torch
 import argparse
 import openminers
 import bittensor
 
-from typing import List, Dict
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from typing import List, Dict, Optional
+from openminers.base.chat_template import ChatTemplate
+from openminers.base.generation_engine import GenerationEngine
 
 
 class NeoxtMiner(openminers.BasePromptingMiner):
+    supports_continuous_batching = True
+    supports_prefix_cache = True
+    template = ChatTemplate(
+        roles={
+            "system": "<human>: {content}\n",
+            "assistant": "<bot>: {content}\n",
+            "user": "<human>: {content}\n",
+        },
+        generation_prompt="<bot>:",
+        stop=["<human>"],
+    )
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -70,51 +82,30 @@ class NeoxtMiner(openminers.BasePromptingMiner):
 
     def __init__(self, *args, **kwargs):
         super(NeoxtMiner, self).__init__(*args, **kwargs)
-
-        # Load the NeoXT model.
-        self.tokenizer = AutoTokenizer.from_pretrained(self.config.neoxt.model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(
+        self.enable_generation_engine(
+            GenerationEngine.from_pretrained(
+                self.config.neoxt.model_name,
+                self.template,
+                device=self.config.neoxt.device,
+                system_prompt=(
+                    self.config.neoxt.system_prompt
+                    if self.config.neoxt.do_prompt_injection
+                    else None
+                ),
+                max_new_tokens=self.config.neoxt.max_new_tokens,
+                temperature=self.config.neoxt.temperature,
+                do_sample=self.config.neoxt.do_sample,
+            ),
             self.config.neoxt.model_name,
-            torch_dtype=torch.float16,
-            low_cpu_mem_usage=True,
         )
-        if self.config.neoxt.device != "cpu":
-            self.model = self.model.to(self.config.neoxt.device)
-
-    def _process_history(self, history: List[str]) -> str:
-        processed_history = ""
-
-        if self.config.neoxt.do_prompt_injection:
-            processed_history += self.config.neoxt.system_prompt
 
-        for message in history:
-            if message["role"] == "system":
-                if not self.config.neoxt.do_prompt_injection or message == history[0]:
-                    processed_history += "<human>: " + message["content"].strip() + "\n"
+    def _process_history(self, history: List[Dict[str, str]]) -> str:
+        return self.engine.render(history)
 
-            if message["role"] == "assistant":
-                processed_history += "<bot>: " + message["content"].strip() + "\n"
-            if message["role"] == "user":
-                processed_history += "<human>: " + message["content"].strip() + "\n"
-        return processed_history
-
-    def forward(self, messages: List[Dict[str, str]]) -> str:
-        history = self._process_history(messages)
-        prompt = history + "<bot>:"
-        input_ids = self.tokenizer.encode(prompt, return_tensors="pt").to(
-            self.config.neoxt.device
-        )
-        output = self.model.generate(
-            input_ids,
-            max_length=input_ids.shape[1] + self.config.neoxt.max_new_tokens,
-            temperature=self.config.neoxt.temperature,
-            do_sample=self.config.neoxt.do_sample,
-            pad_token_id=self.tokenizer.eos_token_id,
-        )
-        generated_text = self.tokenizer.decode(
-            output[0][input_ids.shape[1] :], skip_special_tokens=True
-        )
-        generation = generated_text.split("<human>")[0].strip()
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
+        generation = self.engine(messages, deadline)
 
         # Logging input and generation if debugging is active
         bittensor.logging.debug(
@@ -16,11 +16,11 @@
 # DEALINGS IN THE SOFTWARE.
 import os
 import time
-import openai
 import argparse
 import bittensor
 import openminers
 from typing import List, Dict, Optional
+from openminers.base.api_backends import OpenAIBackend
 
 
 class OpenAIMiner(openminers.BasePromptingMiner):
@@ -78,9 +78,26 @@ class OpenAIMiner(openminers.BasePromptingMiner):
     @classmethod
     def config(cls) -> "bittensor.Config":
         parser = argparse.ArgumentParser(description="OpenAI Miner Configs")
-        cls.add_args(parser)
+        cls.add_super_args(parser)
         return bittensor.config(parser)
 
+    @classmethod
+    def build_backend(
+        cls, config: "bittensor.Config", api_key: Optional[str] = None
+    ) -> OpenAIBackend:
+        """Returns the API backend configured by config, also used by the router miner."""
+        return OpenAIBackend.from_config(
+            config,
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            model=config.openai.model_name,
+            temperature=config.openai.temperature,
+            max_tokens=config.openai.max_tokens,
+            top_p=config.openai.top_p,
+            frequency_penalty=config.openai.frequency_penalty,
+            presence_penalty=config.openai.presence_penalty,
+            n=config.openai.n,
+        )
+
     def __init__(self, api_key: Optional[str] = None, *args, **kwargs):
         super(OpenAIMiner, self).__init__(*args, **kwargs)
         if api_key is None:
@@ -89,20 +106,12 @@ class OpenAIMiner(openminers.BasePromptingMiner):
             )
         if self.config.wandb.on:
             self.wandb_run.tags = self.wandb_run.tags + ("openai_miner",)
-        openai.api_key = api_key
+        self.backend = self.build_backend(self.config, api_key)
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
-        resp = openai.ChatCompletion.create(
-            model=self.config.openai.model_name,
-            messages=messages,
-            temperature=self.config.openai.temperature,
-            max_tokens=self.config.openai.max_tokens,
-            top_p=self.config.openai.top_p,
-            frequency_penalty=self.config.openai.frequency_penalty,
-            presence_penalty=self.config.openai.presence_penalty,
-            n=self.config.openai.n,
-        )["choices"][0]["message"]["content"]
-        return resp
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
+        return self.backend.generate(messages, deadline)
 
 
 if __name__ == "__main__":
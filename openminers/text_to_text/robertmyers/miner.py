@@ -19,11 +19,22 @@ import time
 import torch
 import argparse
 import openminers
-from typing import List, Dict
+from typing import List, Dict, Optional
+from openminers.base.deadline import max_time_kwargs
+from openminers.base.chat_template import ROLE_LINES
+from openminers.base.completion import (
+    NewTokensPipeline,
+    decode_new_tokens,
+    trim_completion,
+)
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
 
 
 class RobertMyersMiner(openminers.BasePromptingMiner):
+    template = ROLE_LINES
+    # Role markers the model may go on to write after its answer.
+    stop_sequences = ["system:", "user:", "assistant:"]
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         pass
@@ -38,31 +49,22 @@ class RobertMyersMiner(openminers.BasePromptingMiner):
         self.pipe = pipeline(
             "text-generation",
             self.model,
+            pipeline_class=NewTokensPipeline,
             tokenizer=tokenizer,
             device=0,
             max_new_tokens=256,
         )
 
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+    @classmethod
+    def _process_history(cls, history: List[Dict[str, str]]) -> str:
+        return cls.template.render(history)
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
         history = self._process_history(messages)
-        resp = (
-            self.pipe(history)[0]["generated_text"]
-            .split(":")[-1]
-            .replace(str(history), "")
-        )
-        return resp
+        resp = self.pipe(history, **max_time_kwargs(deadline))[0]["generated_text"]
+        return trim_completion(resp, self.stop_sequences)
 
 
 if __name__ == "__main__":
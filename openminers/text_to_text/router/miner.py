@@ -0,0 +1,120 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import argparse
+import bittensor
+import openminers
+from typing import List, Dict, Optional
+from openminers.base.hedged_router import HedgedRouter
+
+# Provider name to the API miner whose arguments and backend the router reuses.
+PROVIDERS = {
+    "openai": "OpenAIMiner",
+    "cohere": "CohereMiner",
+    "ai21": "AI21Miner",
+    "alephalpha": "AlephAlphaMiner",
+    "gooseai": "GooseMiner",
+}
+
+
+class RouterMiner(openminers.BasePromptingMiner):
+    @classmethod
+    def add_args(cls, parser: argparse.ArgumentParser):
+        parser.add_argument(
+            "--router.providers",
+            type=str,
+            nargs="+",
+            default=["openai", "cohere"],
+            choices=list(PROVIDERS),
+            help="API providers to route to, in order of preference.",
+        )
+        parser.add_argument(
+            "--router.hedge_percentile",
+            type=float,
+            default=0.9,
+            help="Percentile of a provider's observed latency after which the request is hedged to the next provider.",
+        )
+        parser.add_argument(
+            "--router.hedge_delay",
+            type=float,
+            default=1.0,
+            help="Seconds before hedging while a provider has too few observed latencies.",
+        )
+        parser.add_argument(
+            "--router.min_samples",
+            type=int,
+            default=20,
+            help="Observed latencies needed before hedging at the percentile.",
+        )
+        parser.add_argument(
+            "--router.max_hedges",
+            type=int,
+            default=1,
+            help="Maximum number of hedge requests per forward call.",
+        )
+        parser.add_argument(
+            "--router.failure_threshold",
+            type=int,
+            default=5,
+            help="Consecutive failures after which a provider's circuit breaker opens.",
+        )
+        parser.add_argument(
+            "--router.reset_timeout",
+            type=float,
+            default=30.0,
+            help="Seconds an open circuit breaker waits before a trial request.",
+        )
+        for name in PROVIDERS.values():
+            getattr(openminers, name).add_args(parser)
+
+    @classmethod
+    def config(cls) -> "bittensor.Config":
+        parser = argparse.ArgumentParser(description="Router Miner Configs")
+        cls.add_super_args(parser)
+        return bittensor.config(parser)
+
+    def __init__(self, *args, **kwargs):
+        super(RouterMiner, self).__init__(*args, **kwargs)
+        backends = [
+            getattr(openminers, PROVIDERS[provider]).build_backend(self.config)
+            for provider in self.config.router.providers
+        ]
+        self.backend = HedgedRouter(
+            backends,
+            hedge_percentile=self.config.router.hedge_percentile,
+            hedge_delay=self.config.router.hedge_delay,
+            min_samples=self.config.router.min_samples,
+            max_hedges=self.config.router.max_hedges,
+            failure_threshold=self.config.router.failure_threshold,
+            reset_timeout=self.config.router.reset_timeout,
+            max_in_flight=self.config.neuron.api_max_in_flight,
+            timeout=self.config.neuron.api_timeout,
+        )
+
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
+        resp = self.backend.generate(messages, deadline)
+        bittensor.logging.debug("router", str(self.backend.provider_stats()))
+        return resp
+
+
+if __name__ == "__main__":
+    with RouterMiner():
+        while True:
+            print("running...", time.time())
+            time.sleep(1)
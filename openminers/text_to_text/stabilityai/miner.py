@@ -21,27 +21,36 @@ import argparse
 import openminers
 import bittensor
 from typing import List, Dict, Optional
+from openminers.base.deadline import max_time_kwargs
+from openminers.base.chat_template import ChatTemplate
+from openminers.base.stopping import StopSequences
+from openminers.base.completion import (
+    NewTokensPipeline,
+    decode_new_tokens,
+    trim_completion,
+)
 from transformers import (
     AutoTokenizer,
     AutoModelForCausalLM,
     pipeline,
-    StoppingCriteria,
     StoppingCriteriaList,
 )
 
 
-class StopOnTokens(StoppingCriteria):
-    def __call__(
-        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
-    ) -> bool:
-        stop_ids = [50278, 50279, 50277, 1, 0]
-        for stop_id in stop_ids:
-            if input_ids[0][-1] == stop_id:
-                return True
-        return False
-
-
 class StabilityAIMiner(openminers.BasePromptingMiner):
+    template = ChatTemplate(
+        roles={
+            "system": "<|SYSTEM|>: {content}\n",
+            "assistant": "<|ASSISTANT|>: {content}\n",
+            "user": "<|USER|>: {content}\n",
+        },
+        strip=False,
+    )
+    # Role markers the model may go on to write after its answer.
+    stop_sequences = ["<|SYSTEM|>:", "<|USER|>:", "<|ASSISTANT|>:"]
+    # <|USER|>, <|ASSISTANT|>, <|SYSTEM|>, <|padding|> and <|endoftext|>.
+    stop = StopSequences([[50278], [50279], [50277], [1], [0]])
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -140,6 +149,7 @@ class StabilityAIMiner(openminers.BasePromptingMiner):
         self.pipe = pipeline(
             "text-generation",
             self.model,
+            pipeline_class=NewTokensPipeline,
             tokenizer=self.tokenizer,
             device=0,
             max_new_tokens=self.config.stabilityai.max_tokens,
@@ -149,31 +159,25 @@ class StabilityAIMiner(openminers.BasePromptingMiner):
             temperature=self.config.stabilityai.temperature,
             top_p=self.config.stabilityai.top_p,
             top_k=self.config.stabilityai.top_k,
-            stopping_criteria=StoppingCriteriaList([StopOnTokens()]),
         )
         bittensor.logging.info(
             "StabilityAI {}B model loaded".format(self.config.stabilityai.model_size)
         )
 
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "<|SYSTEM|>: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "<|ASSISTANT|>: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "<|USER|>: " + message["content"] + "\n"
-        return processed_history
+    @classmethod
+    def _process_history(cls, history: List[Dict[str, str]]) -> str:
+        return cls.template.render(history)
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
+    def forward(
+        self, messages: List[Dict[str, str]], deadline: Optional[float] = None
+    ) -> str:
         history = self._process_history(messages)
-        return (
-            self.pipe(history)[0]["generated_text"]
-            .split(":")[-1]
-            .replace(str(history), "")
-        )
+        generation = self.pipe(
+            history,
+            stopping_criteria=StoppingCriteriaList([self.stop.criteria()]),
+            **max_time_kwargs(deadline),
+        )[0]["generated_text"]
+        return trim_completion(generation, self.stop_sequences)
 
 
 if __name__ == "__main__":
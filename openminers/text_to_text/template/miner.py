@@ -30,7 +30,7 @@ class TemplateMiner(openminers.BasePromptingMiner):
     @classmethod
     def config(cls) -> "bittensor.Config":
         parser = argparse.ArgumentParser(description="Template Configs")
-        cls.add_args(parser)
+        cls.add_super_args(parser)
         return bittensor.config(parser)
 
     def forward(self, messages: List[Dict[str, str]]) -> str:
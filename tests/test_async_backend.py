@@ -0,0 +1,128 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import asyncio
+import unittest
+from openminers.base.mock_api import MockAPIServer
+from openminers.base.api_backends import (
+    AI21Backend,
+    AlephAlphaBackend,
+    CohereBackend,
+    GooseAIBackend,
+    OpenAIBackend,
+    format_history,
+)
+
+MESSAGES = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "user", "content": "Hi"},
+]
+
+
+class AsyncBackendTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = MockAPIServer(latency=0.01).start()
+        self.backends = []
+
+    def tearDown(self):
+        for backend in self.backends:
+            backend.close()
+        self.server.stop()
+
+    def backend(self, cls, **kwargs):
+        backend = cls(api_key="key", base_url=self.server.url, **kwargs)
+        self.backends.append(backend)
+        return backend
+
+    def test_providers(self):
+        """Test that every provider backend sends its request shape and parses its response."""
+        prompt = format_history(MESSAGES)
+        expected = {
+            OpenAIBackend: {"model": "gpt-3.5-turbo", "messages": MESSAGES},
+            CohereBackend: {"model": "command-xlarge-nightly", "prompt": prompt},
+            AI21Backend: {"prompt": prompt},
+            AlephAlphaBackend: {"model": "luminous-base", "prompt": prompt},
+            GooseAIBackend: {"prompt": prompt},
+        }
+        for cls, body in expected.items():
+            backend = self.backend(cls)
+            self.assertEqual(backend.generate(MESSAGES), "Hello World!")
+            self.assertEqual(self.server.last_body, body)
+
+    def test_generation_params(self):
+        """Test that generation params are sent and unset ones are dropped."""
+        backend = self.backend(
+            OpenAIBackend, temperature=0.5, max_tokens=None, max_in_flight=4
+        )
+        backend.generate(MESSAGES)
+        self.assertEqual(self.server.last_body["temperature"], 0.5)
+        self.assertNotIn("max_tokens", self.server.last_body)
+        self.assertEqual(backend.max_in_flight, 4)
+
+    def test_deadline(self):
+        """Test that a request fails once its deadline passes."""
+        self.server.latency = 1.0
+        backend = self.backend(OpenAIBackend)
+        start = time.time()
+        with self.assertRaises(asyncio.TimeoutError):
+            backend.generate(MESSAGES, deadline=time.time() + 0.1)
+        self.assertLess(time.time() - start, 0.9)
+        with self.assertRaises(asyncio.TimeoutError):
+            backend.generate(MESSAGES, deadline=time.time() - 1)
+        self.assertEqual(backend.stats["timeouts"], 2)
+
+    def test_server_error(self):
+        """Test that a failed request raises and is counted."""
+        self.server.error_rate = 1.0
+        backend = self.backend(OpenAIBackend)
+        with self.assertRaises(Exception):
+            backend.generate(MESSAGES)
+        self.assertEqual(backend.stats["errors"], 1)
+
+    def test_in_flight_limit(self):
+        """Test that at most max_in_flight requests are sent at once."""
+        self.server.latency = 0.05
+        backend = self.backend(OpenAIBackend, max_in_flight=4)
+        peak = 0
+
+        async def watch():
+            nonlocal peak
+            while True:
+                peak = max(peak, backend.in_flight)
+                await asyncio.sleep(0.005)
+
+        async def burst():
+            watcher = asyncio.ensure_future(watch())
+            await asyncio.gather(*(backend.agenerate(MESSAGES) for _ in range(16)))
+            watcher.cancel()
+
+        start = time.time()
+        backend.loop_thread.run(burst())
+        self.assertEqual(peak, 4)
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+    def test_connection_reuse(self):
+        """Test that sequential requests reuse one keep-alive connection."""
+        backend = self.backend(OpenAIBackend)
+        for _ in range(10):
+            backend.generate(MESSAGES)
+        self.assertEqual(self.server.requests, 10)
+        self.assertEqual(len(self.server.connections), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
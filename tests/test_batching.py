@@ -0,0 +1,150 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import torch
+import unittest
+import threading
+from openminers.base.batching import BatchScheduler, generate_batch
+from openminers.base.deadline import DeadlineExpired
+
+
+def tiny_model_and_tokenizer():
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+    words = ["<eos>"] + [f"w{i}" for i in range(63)]
+    tokenizer = Tokenizer(
+        models.WordLevel({word: i for i, word in enumerate(words)}, unk_token="<eos>")
+    )
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tokenizer)
+    tokenizer.add_special_tokens({"eos_token": "<eos>"})
+
+    torch.manual_seed(0)
+    config = GPT2Config(
+        vocab_size=len(words),
+        n_positions=64,
+        n_embd=16,
+        n_layer=2,
+        n_head=2,
+        bos_token_id=tokenizer.eos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+    )
+    return GPT2LMHeadModel(config).eval(), tokenizer
+
+
+class BatchSchedulerTestCase(unittest.TestCase):
+    def test_concurrent_requests_are_batched(self):
+        """Test that concurrent submissions share a batch and get their own output"""
+        batches = []
+
+        def generate_fn(items):
+            batches.append(list(items))
+            time.sleep(0.05)
+            return [item * 2 for item in items]
+
+        scheduler = BatchScheduler(generate_fn, max_batch_size=4, batch_window=0.2)
+        results = {}
+
+        def submit(i):
+            results[i] = scheduler.submit(i)
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        scheduler.stop()
+
+        assert results == {i: i * 2 for i in range(8)}
+        assert all(len(batch) <= 4 for batch in batches)
+        assert len(batches) < 8
+
+    def test_errors_propagate_to_callers(self):
+        """Test that a failing batch raises in the submitting caller"""
+
+        def generate_fn(items):
+            raise ValueError("generation failed")
+
+        scheduler = BatchScheduler(generate_fn, max_batch_size=2, batch_window=0.0)
+        with self.assertRaises(ValueError):
+            scheduler.submit("prompt")
+        scheduler.stop()
+
+    def test_deadlines(self):
+        """Test that expired items are dropped and the batch gets the latest deadline"""
+        batches = []
+
+        def generate_fn(items, deadline=None):
+            batches.append((list(items), deadline))
+            return items
+
+        scheduler = BatchScheduler(generate_fn, max_batch_size=4, batch_window=0.1)
+        now = time.time()
+        results = {}
+
+        def submit(item, deadline):
+            try:
+                results[item] = scheduler.submit(item, deadline=deadline)
+            except DeadlineExpired:
+                results[item] = None
+
+        deadlines = {"expired": now - 1, "early": now + 5, "late": now + 10}
+        threads = [
+            threading.Thread(target=submit, args=item) for item in deadlines.items()
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        scheduler.stop()
+
+        assert results == {"expired": None, "early": "early", "late": "late"}
+        assert [sorted(items) for items, _ in batches] == [["early", "late"]]
+        assert batches[0][1] == now + 10
+
+    def test_generate_batch_matches_single_generation(self):
+        """Test that left-padded batched greedy decoding matches per-prompt decoding"""
+        model, tokenizer = tiny_model_and_tokenizer()
+        prompts = ["w1 w2 w3 w4 w5 w6", "w7 w8", "w9 w10 w11"]
+
+        batched = generate_batch(
+            model, tokenizer, prompts, max_new_tokens=5, do_sample=False
+        )
+        single = [
+            generate_batch(
+                model, tokenizer, [prompt], max_new_tokens=5, do_sample=False
+            )[0]
+            for prompt in prompts
+        ]
+
+        assert batched == single
+
+    def test_generate_batch_leaves_the_tokenizer_alone(self):
+        """Test that batching does not change the padding settings of the shared tokenizer"""
+        model, tokenizer = tiny_model_and_tokenizer()
+        padding_side = tokenizer.padding_side
+
+        generate_batch(model, tokenizer, ["w1 w2 w3", "w7"], max_new_tokens=2)
+
+        assert tokenizer.padding_side == padding_side
+        assert tokenizer.pad_token is None
+
+
+if __name__ == "__main__":
+    unittest.main()
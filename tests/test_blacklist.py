@@ -15,12 +15,17 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
-import json
-import hashlib
 import unittest
-from unittest.mock import MagicMock
-from openminers.base.blacklist import is_prompt_in_cache, default_blacklist
+from unittest.mock import MagicMock, patch
+from openminers.base.blacklist import (
+    is_prompt_in_cache,
+    is_prompt_near_duplicate,
+    default_blacklist,
+)
+from openminers.base.prompt_cache import PromptCache, hash_messages
+from openminers.base.metagraph_view import MetagraphView
+from openminers.base.rate_limiter import TokenBucketRateLimiter
+from openminers.base.near_duplicate import NearDuplicateIndex
 
 
 class BlacklistTestCase(unittest.TestCase):
@@ -28,20 +33,19 @@ class BlacklistTestCase(unittest.TestCase):
         """Test if old entries are removed according to block span"""
         # Arrange
         messages = ["Message from hotkey1"]
-        key_to_delete = hashlib.sha256(json.dumps(messages).encode()).hexdigest()
+        key_to_delete = hash_messages(messages)
 
-        mock_prompt_cache = {
-            key_to_delete: ("hotkey1", 1),
-        }
+        mock_prompt_cache = PromptCache()
+        mock_prompt_cache.add(key_to_delete, "hotkey1", 1)
         prompt_cache_block_span = 1
         current_block = 3
 
         mock_self = MagicMock()
-        mock_self.prompt_cache = mock_prompt_cache.copy()
+        mock_self.prompt_cache = mock_prompt_cache
         mock_self.config.miner.blacklist.prompt_cache_block_span = (
             prompt_cache_block_span
         )
-        mock_self.metagraph.block = current_block
+        mock_self.block_tracker.block = current_block
 
         mock_forward_call = MagicMock()
         mock_forward_call.src_hotkey = "hotkey1"
@@ -50,28 +54,27 @@ class BlacklistTestCase(unittest.TestCase):
         # Act
         should_blacklist = is_prompt_in_cache(mock_self, mock_forward_call)
 
-        # Assert
-        assert should_blacklist is True
-        assert len(mock_self.prompt_cache) == len(mock_prompt_cache) - 1
+        # Assert, the expired entry is replaced by the new request
+        assert should_blacklist is False
+        assert mock_self.prompt_cache[key_to_delete] == ("hotkey1", current_block)
 
     def test_sanitize_cache_no_entries_removed(self):
         """Test if entries are not removed according to block span"""
         # Arrange
         messages = ["Message from hotkey1"]
-        prompt_key = hashlib.sha256(json.dumps(messages).encode()).hexdigest()
+        prompt_key = hash_messages(messages)
 
-        mock_prompt_cache = {
-            prompt_key: ("hotkey1", 3),
-        }
+        mock_prompt_cache = PromptCache()
+        mock_prompt_cache.add(prompt_key, "hotkey1", 3)
         prompt_cache_block_span = 1
         current_block = 3
 
         mock_self = MagicMock()
-        mock_self.prompt_cache = mock_prompt_cache.copy()
+        mock_self.prompt_cache = mock_prompt_cache
         mock_self.config.miner.blacklist.prompt_cache_block_span = (
             prompt_cache_block_span
         )
-        mock_self.metagraph.block = current_block
+        mock_self.block_tracker.block = current_block
 
         mock_forward_call = MagicMock()
         mock_forward_call.src_hotkey = "hotkey1"
@@ -82,26 +85,25 @@ class BlacklistTestCase(unittest.TestCase):
 
         # Assert
         assert should_blacklist is True
-        assert len(mock_self.prompt_cache) == len(mock_prompt_cache)
+        assert len(mock_self.prompt_cache) == 1
 
     def test_existing_prompt_in_cache(self):
         """Test if repeated entries are blacklisted"""
         # Arrange
         messages = ["Message from hotkey1"]
-        prompt_key = hashlib.sha256(json.dumps(messages).encode()).hexdigest()
+        prompt_key = hash_messages(messages)
 
-        mock_prompt_cache = {
-            prompt_key: ("hotkey1", 1),
-        }
+        mock_prompt_cache = PromptCache()
+        mock_prompt_cache.add(prompt_key, "hotkey1", 1)
         prompt_cache_block_span = 1
         current_block = 1
 
         mock_self = MagicMock()
-        mock_self.prompt_cache = mock_prompt_cache.copy()
+        mock_self.prompt_cache = mock_prompt_cache
         mock_self.config.miner.blacklist.prompt_cache_block_span = (
             prompt_cache_block_span
         )
-        mock_self.metagraph.block = current_block
+        mock_self.block_tracker.block = current_block
 
         mock_forward_call = MagicMock()
         mock_forward_call.src_hotkey = "hotkey1"
@@ -112,24 +114,24 @@ class BlacklistTestCase(unittest.TestCase):
 
         # Assert
         assert should_blacklist is True
-        assert mock_self.prompt_cache == mock_prompt_cache
+        assert mock_self.prompt_cache.entries == {prompt_key: ("hotkey1", 1)}
 
     def test_new_prompt_not_in_cache(self):
         """Test if new entries are not blacklisted and added correctly to cache"""
         # Arrange
         messages = ["New prompt from hotkey1"]
-        expected_prompt_key = hashlib.sha256(json.dumps(messages).encode()).hexdigest()
+        expected_prompt_key = hash_messages(messages)
 
-        mock_prompt_cache = {}
+        mock_prompt_cache = PromptCache()
         prompt_cache_block_span = 1
         current_block = 1
 
         mock_self = MagicMock()
-        mock_self.prompt_cache = mock_prompt_cache.copy()
+        mock_self.prompt_cache = mock_prompt_cache
         mock_self.config.miner.blacklist.prompt_cache_block_span = (
             prompt_cache_block_span
         )
-        mock_self.metagraph.block = current_block
+        mock_self.block_tracker.block = current_block
 
         mock_forward_call = MagicMock()
         mock_forward_call.src_hotkey = "hotkey1"
@@ -142,54 +144,55 @@ class BlacklistTestCase(unittest.TestCase):
         assert should_blacklist is False
         assert mock_self.prompt_cache[expected_prompt_key] == ("hotkey1", current_block)
 
-    def test_request_timestamps_blacklist(self):
+    def test_rate_limit_blacklist(self):
+        """Test that hotkeys are blacklisted once their burst is used up"""
         hotkey_address = "hotkey1"
-        min_request_period = 30
-        len_request_timestamps = 50
 
         mock_self = MagicMock()
         mock_self.config.miner.blacklist.whitelist = []
         mock_self.config.miner.blacklist.blacklist = []
         mock_self.config.miner.blacklist.allow_non_registered = False
         mock_self.config.miner.blacklist.force_validator_permit = False
-        mock_self.config.miner.blacklist.min_request_period = min_request_period
-        mock_self.metagraph.hotkeys = [hotkey_address]
-        mock_self.request_timestamps = {
-            hotkey_address: [time.time() - (min_request_period * 60 - 1)]
-            * len_request_timestamps
-        }
+        mock_self.metagraph_view = MetagraphView(hotkeys=[hotkey_address])
+        mock_self.rate_limiter = TokenBucketRateLimiter(burst=3, refill_rate=1 / 60)
+        mock_self.prompt_cache = PromptCache()
+        mock_self.block_tracker.block = 1
+        mock_self.config.miner.blacklist.prompt_cache_block_span = 50
+        mock_self.near_duplicate_index = None
 
         mock_forward_call = MagicMock()
         mock_forward_call.src_hotkey = hotkey_address
-        mock_forward_call.messages = "message"
-
-        should_blacklist, blacklist_message = default_blacklist(
-            mock_self, mock_forward_call
-        )
-        assert should_blacklist == True
-
-        # Should not black list when period is longer
-        mock_self.request_timestamps = {
-            hotkey_address: [time.time() - (min_request_period * 60)]
-            * len_request_timestamps
-        }
-        should_blacklist, blacklist_message = default_blacklist(
-            mock_self, mock_forward_call
-        )
-        assert should_blacklist == False
 
-    def test_request_timestamps_blacklist_empty_dictionary(self):
+        with patch("time.time", MagicMock(return_value=1000.0)):
+            for i in range(3):
+                mock_forward_call.messages = [f"message {i}"]
+                should_blacklist, _ = default_blacklist(mock_self, mock_forward_call)
+                assert should_blacklist == False
+            mock_forward_call.messages = ["message 3"]
+            should_blacklist, _ = default_blacklist(mock_self, mock_forward_call)
+            assert should_blacklist == True
+
+        # Should not black list once a token was refilled
+        with patch("time.time", MagicMock(return_value=1060.0)):
+            mock_forward_call.messages = ["message 4"]
+            should_blacklist, _ = default_blacklist(mock_self, mock_forward_call)
+            assert should_blacklist == False
+
+    def test_rate_limit_blacklist_new_hotkey(self):
+        """Test that a hotkey is not rate limited on its first request"""
         hotkey_address = "hotkey1"
-        min_request_period = 30
 
         mock_self = MagicMock()
         mock_self.config.miner.blacklist.whitelist = []
         mock_self.config.miner.blacklist.blacklist = []
         mock_self.config.miner.blacklist.allow_non_registered = False
         mock_self.config.miner.blacklist.force_validator_permit = False
-        mock_self.config.miner.blacklist.min_request_period = min_request_period
-        mock_self.metagraph.hotkeys = [hotkey_address]
-        mock_self.request_timestamps = {}
+        mock_self.metagraph_view = MetagraphView(hotkeys=[hotkey_address])
+        mock_self.rate_limiter = TokenBucketRateLimiter(burst=1, refill_rate=0)
+        mock_self.prompt_cache = PromptCache()
+        mock_self.block_tracker.block = 1
+        mock_self.config.miner.blacklist.prompt_cache_block_span = 50
+        mock_self.near_duplicate_index = None
 
         mock_forward_call = MagicMock()
         mock_forward_call.src_hotkey = hotkey_address
@@ -199,6 +202,61 @@ class BlacklistTestCase(unittest.TestCase):
             mock_self, mock_forward_call
         )
         assert should_blacklist == False
+        assert hotkey_address in mock_self.rate_limiter
+
+    def test_validator_permit_blacklist(self):
+        mock_self = MagicMock()
+        mock_self.config.miner.blacklist.whitelist = []
+        mock_self.config.miner.blacklist.blacklist = []
+        mock_self.config.miner.blacklist.allow_non_registered = True
+        mock_self.config.miner.blacklist.force_validator_permit = True
+        mock_self.metagraph_view = MetagraphView(
+            hotkeys=["validator", "miner"], validator_permit=[True, False]
+        )
+        mock_self.rate_limiter = TokenBucketRateLimiter(burst=1, refill_rate=0)
+        mock_self.prompt_cache = PromptCache()
+        mock_self.block_tracker.block = 1
+        mock_self.config.miner.blacklist.prompt_cache_block_span = 50
+        mock_self.near_duplicate_index = None
+
+        mock_forward_call = MagicMock()
+        mock_forward_call.messages = "message"
+
+        for hotkey, expected in [
+            ("validator", False),
+            ("miner", True),
+            ("unregistered", True),
+        ]:
+            mock_forward_call.src_hotkey = hotkey
+            should_blacklist, _ = default_blacklist(mock_self, mock_forward_call)
+            assert should_blacklist == expected
+
+    def test_near_duplicate_blacklist(self):
+        """Test that a reworded prompt is blacklisted until it expires"""
+        mock_self = MagicMock()
+        mock_self.config.miner.blacklist.prompt_cache_block_span = 1
+        mock_self.near_duplicate_index = NearDuplicateIndex(threshold=0.8)
+        mock_self.block_tracker.block = 1
+
+        mock_forward_call = MagicMock()
+        mock_forward_call.messages = [
+            {
+                "role": "user",
+                "content": "What is the capital of France? Answer in one word.",
+            }
+        ]
+        assert is_prompt_near_duplicate(mock_self, mock_forward_call) is False
+
+        mock_forward_call.messages = [
+            {
+                "role": "user",
+                "content": "what is the capital of  France ?? answer in one word",
+            }
+        ]
+        assert is_prompt_near_duplicate(mock_self, mock_forward_call) is True
+
+        mock_self.block_tracker.block = 3
+        assert is_prompt_near_duplicate(mock_self, mock_forward_call) is False
 
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from openminers.base.block_tracker import BlockTracker
+from openminers.base.miner import BaseMiner
+
+
+class BlockTrackerTestCase(unittest.TestCase):
+    def test_extrapolates_between_refreshes(self):
+        """Test that reads extrapolate from the block time without calling subtensor"""
+        subtensor = MagicMock()
+        subtensor.get_current_block.return_value = 100
+        tracker = BlockTracker(subtensor, block_time=12.0)
+
+        with patch("openminers.base.block_tracker.time.monotonic", return_value=0.0):
+            assert tracker.refresh() == 100
+        with patch("openminers.base.block_tracker.time.monotonic", return_value=25.0):
+            assert tracker.block == 102
+            assert tracker.staleness == 25.0
+        assert subtensor.get_current_block.call_count == 1
+
+    def test_never_moves_backwards(self):
+        """Test that a refresh behind the extrapolated estimate does not lower the block"""
+        subtensor = MagicMock()
+        subtensor.get_current_block.return_value = 100
+        tracker = BlockTracker(subtensor, block_time=12.0)
+
+        with patch("openminers.base.block_tracker.time.monotonic", return_value=0.0):
+            tracker.refresh()
+        with patch("openminers.base.block_tracker.time.monotonic", return_value=36.0):
+            assert tracker.block == 103
+            subtensor.get_current_block.return_value = 101
+            assert tracker.refresh() == 103
+
+    def test_staleness_grows_when_refresh_fails(self):
+        """Test that failed background refreshes keep the last estimate and its staleness"""
+        subtensor = MagicMock()
+        subtensor.get_current_block.return_value = 7
+        tracker = BlockTracker(subtensor, refresh_interval=0.01)
+        assert tracker.staleness == float("inf")
+        tracker.refresh()
+
+        subtensor.get_current_block.side_effect = ConnectionError("chain down")
+        tracker.start()
+        time.sleep(0.1)
+        tracker.stop()
+
+        assert tracker.block == 7
+        assert tracker.staleness >= 0.1
+        assert subtensor.get_current_block.call_count > 1
+
+    def test_miner_exit_stops_the_tracker(self):
+        """Test that leaving the miner context stops and joins the refresh thread"""
+        subtensor = MagicMock()
+        subtensor.get_current_block.return_value = 100
+        miner = MagicMock()
+        miner.block_tracker = BlockTracker(subtensor, refresh_interval=0.01)
+        miner.block_tracker.start()
+        thread = miner.block_tracker.thread
+
+        BaseMiner.__exit__(miner, None, None, None)
+
+        assert not thread.is_alive() and miner.block_tracker.thread is None
+        miner.stop_run_thread.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import unittest
+from types import SimpleNamespace
+from openminers.base.api_backends import format_history
+from openminers.base.chat_template import ROLE_LINES, ChatTemplate
+from openminers.base.generation_engine import GenerationEngine
+from openminers.text_to_text.AI21.miner import AI21Miner
+from openminers.text_to_text.AlephAlpha.miner import AlephAlphaMiner
+from openminers.text_to_text.bittensor_lm.miner import CerebrasBTLMMiner
+from openminers.text_to_text.bloom.miner import BloomChatMiner
+from openminers.text_to_text.cerebras.miner import CerebrasMiner
+from openminers.text_to_text.cohere.miner import CohereMiner
+from openminers.text_to_text.falcon.miner import FalconMiner
+from openminers.text_to_text.gooseai.miner import GooseMiner
+from openminers.text_to_text.gpt4all.miner import GPT4ALLMiner
+from openminers.text_to_text.llama.miner import LlamaMiner
+from openminers.text_to_text.robertmyers.miner import RobertMyersMiner
+from openminers.text_to_text.stabilityai.miner import StabilityAIMiner
+from tests.test_batching import tiny_model_and_tokenizer
+
+MESSAGES = [
+    {"role": "system", "content": " w1 w2 "},
+    {"role": "user", "content": "w3 w4"},
+    {"role": "assistant", "content": "w5 "},
+    {"role": "tool", "content": "w6"},
+    {"role": "user", "content": "w7 w8\n"},
+]
+
+
+# The prompt building of each miner before it moved to ChatTemplate.
+def legacy_history(system, assistant, user):
+    def process_history(history):
+        processed_history = ""
+        for message in history:
+            if message["role"] == "system":
+                processed_history += system + message["content"] + "\n"
+            if message["role"] == "assistant":
+                processed_history += assistant + message["content"] + "\n"
+            if message["role"] == "user":
+                processed_history += user + message["content"] + "\n"
+        return processed_history
+
+    return process_history
+
+
+def legacy_falcon_history(config, history):
+    processed_history = ""
+    if config.do_prompt_injection:
+        processed_history += config.system_prompt
+    for message in history:
+        if message["role"] == "system":
+            if not config.do_prompt_injection or message != history[0]:
+                processed_history += "" + message["content"].strip() + " "
+        if message["role"] == "assistant":
+            processed_history += "Assistant:" + message["content"].strip() + "</s>"
+        if message["role"] == "user":
+            processed_history += "User: " + message["content"].strip() + " "
+    return processed_history
+
+
+def legacy_btlm_history(config, history):
+    processed_history = ""
+    if config.do_prompt_injection:
+        processed_history += config.system_prompt
+    for message in history:
+        if message["role"] == "system":
+            if not config.do_prompt_injection or message != history[0]:
+                processed_history += "system: " + message["content"] + "\n"
+        if message["role"] == "assistant":
+            processed_history += "assistant: " + message["content"] + "\n"
+        if message["role"] == "user":
+            processed_history += "user: " + message["content"] + "\n"
+    return processed_history
+
+
+def legacy_btlm_vanilla_history(config, history):
+    processed_history = ""
+    if config.do_prompt_injection:
+        processed_history += config.system_prompt
+    for message in history:
+        if message["role"] == "system":
+            continue
+        processed_history += message["content"] + "\n"
+    return processed_history
+
+
+def unloaded(cls, **config):
+    """Returns a miner without running its __init__, for its prompt building only."""
+    miner = object.__new__(cls)
+    miner.config = SimpleNamespace(
+        **{name: SimpleNamespace(**value) for name, value in config.items()}
+    )
+    return miner
+
+
+class ChatTemplateTestCase(unittest.TestCase):
+    def test_role_lines_miners_match_legacy(self):
+        """Test that the role line miners render as their legacy _process_history did"""
+        legacy = legacy_history("system: ", "assistant: ", "user: ")
+        for cls in [
+            AI21Miner,
+            AlephAlphaMiner,
+            CerebrasMiner,
+            CohereMiner,
+            GooseMiner,
+            GPT4ALLMiner,
+            LlamaMiner,
+            RobertMyersMiner,
+        ]:
+            with self.subTest(miner=cls.__name__):
+                self.assertEqual(cls._process_history(MESSAGES), legacy(MESSAGES))
+        self.assertEqual(format_history(MESSAGES), legacy(MESSAGES))
+
+    def test_own_template_miners_match_legacy(self):
+        """Test that miners with their own role markers render as before"""
+        cases = {
+            BloomChatMiner: legacy_history("<human>: ", "<bot>: ", "<human>: "),
+            StabilityAIMiner: legacy_history(
+                "<|SYSTEM|>: ", "<|ASSISTANT|>: ", "<|USER|>: "
+            ),
+        }
+        for cls, legacy in cases.items():
+            with self.subTest(miner=cls.__name__):
+                self.assertEqual(cls._process_history(MESSAGES), legacy(MESSAGES))
+
+    def test_prompt_injection_miners_match_legacy(self):
+        """Test that falcon and bittensor_lm render as before, with and without a system prompt"""
+        for injection in (False, True):
+            config = dict(do_prompt_injection=injection, system_prompt="S. ")
+            with self.subTest(injection=injection):
+                falcon = unloaded(FalconMiner, falcon=config)
+                self.assertEqual(
+                    falcon._process_history(MESSAGES),
+                    legacy_falcon_history(SimpleNamespace(**config), MESSAGES),
+                )
+                btlm = unloaded(CerebrasBTLMMiner, btlm=config)
+                self.assertEqual(
+                    btlm._process_history(MESSAGES),
+                    legacy_btlm_history(SimpleNamespace(**config), MESSAGES),
+                )
+                self.assertEqual(
+                    btlm._process_history_vanilla(MESSAGES),
+                    legacy_btlm_vanilla_history(SimpleNamespace(**config), MESSAGES),
+                )
+
+    def test_escaped_braces_in_markers(self):
+        """Test that role formats keep str.format escaping"""
+        template = ChatTemplate(roles={"user": "{{user}} {content}\n"})
+        self.assertEqual(
+            template.render([{"role": "user", "content": "hi"}]), "{user} hi\n"
+        )
+
+
+class TokenizedChatTemplateTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model, cls.tokenizer = tiny_model_and_tokenizer()
+
+    def test_ids_match_tokenized_text(self):
+        """Test that the ids equal those of the rendered text for a whitespace tokenizer"""
+        template = ChatTemplate(
+            roles={"user": "w10 {content}\n", "assistant": "w11 {content}\n"},
+            generation_prompt="w11",
+        )
+        tokenized = template.tokenized(self.tokenizer)
+        for system_prompt in (None, "w12 w13 "):
+            expected = self.tokenizer.encode(
+                template.render(MESSAGES, system_prompt) + template.generation_prompt
+            )
+            self.assertEqual(
+                tokenized.render(MESSAGES, system_prompt, add_generation_prompt=True),
+                expected,
+            )
+
+    def test_contents_are_cached(self):
+        """Test that messages seen in an earlier turn are not tokenized again"""
+        tokenized = ROLE_LINES.tokenized(self.tokenizer, max_cached=3)
+        tokenized.render(MESSAGES[:3])
+        self.assertEqual(tokenized.stats, {"hits": 0, "misses": 3})
+        tokenized.render(MESSAGES)
+        self.assertEqual(tokenized.stats, {"hits": 3, "misses": 4})
+        self.assertEqual(len(tokenized.cache), 3)
+
+    def test_pretokenized_engine_matches_text_engine(self):
+        """Test that the engine generates the same text from pre-tokenized prompts"""
+        template = ChatTemplate(
+            roles={"user": "w10 {content}\n", "assistant": "w11 {content}\n"},
+            generation_prompt="w11",
+        )
+        kwargs = dict(max_new_tokens=6, min_new_tokens=6, do_sample=False)
+        text = GenerationEngine(self.model, self.tokenizer, template, **kwargs)
+        ids = GenerationEngine(
+            self.model, self.tokenizer, template, pretokenize=True, **kwargs
+        )
+        self.assertIsNotNone(ids.token_template)
+        self.assertEqual(ids(MESSAGES), text(MESSAGES))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import unittest
+import torch
+from transformers import pipeline
+from openminers.base.completion import (
+    NewTokensPipeline,
+    decode_new_tokens,
+    trim_completion,
+)
+from tests.test_batching import tiny_model_and_tokenizer
+
+STOP = ["user:", "assistant:"]
+
+
+class TrimCompletionTestCase(unittest.TestCase):
+    def test_cuts_at_first_stop_sequence(self):
+        """Test that text after the earliest stop sequence is dropped"""
+        text = " The answer.\nuser: next question\nassistant: more"
+        self.assertEqual(trim_completion(text, STOP), "The answer.")
+
+    def test_drops_leading_stop_sequence(self):
+        """Test that a role marker opening the completion is removed"""
+        self.assertEqual(trim_completion("assistant: Hello", STOP), "Hello")
+
+    def test_keeps_colons_in_the_answer(self):
+        """Test that colons which are not stop sequences survive"""
+        text = "Steps: first, then second. Time: 12:30"
+        self.assertEqual(trim_completion(text, STOP), text)
+
+    def test_without_stop_sequences_only_strips(self):
+        """Test that no stop sequences leaves the text untouched apart from whitespace"""
+        self.assertEqual(trim_completion("  a: b\nuser: c "), "a: b\nuser: c")
+
+
+class NewTokensPipelineTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model, cls.tokenizer = tiny_model_and_tokenizer()
+
+    def test_decode_new_tokens_slices_at_prompt_length(self):
+        """Test that only the ids after the prompt are decoded"""
+        sequences = torch.tensor([[1, 2, 3, 4, 5], [6, 7, 8, 9, 10]])
+        self.assertEqual(
+            decode_new_tokens(self.tokenizer, sequences, 3), ["w3 w4", "w8 w9"]
+        )
+
+    def test_pipeline_returns_new_tokens_only(self):
+        """Test that the pipeline output is the decoded completion without the prompt"""
+        pipe = pipeline(
+            "text-generation",
+            model=self.model,
+            tokenizer=self.tokenizer,
+            pipeline_class=NewTokensPipeline,
+        )
+        prompt = "w1 w2 w3 w4"
+        generation = pipe(prompt, max_new_tokens=8, min_new_tokens=8, do_sample=False)
+        input_ids = self.tokenizer(prompt, return_tensors="pt").input_ids
+        with torch.inference_mode():
+            output = self.model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=8,
+                min_new_tokens=8,
+                do_sample=False,
+                pad_token_id=self.tokenizer.eos_token_id,
+            )
+        self.assertEqual(
+            generation,
+            [
+                {
+                    "generated_text": decode_new_tokens(
+                        self.tokenizer, output, input_ids.shape[1]
+                    )[0]
+                }
+            ],
+        )
+        self.assertNotIn(prompt, generation[0]["generated_text"])
+
+
+if __name__ == "__main__":
+    unittest.main()
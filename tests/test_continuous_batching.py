@@ -0,0 +1,172 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import unittest
+import threading
+from openminers.base.batching import generate_batch
+from openminers.base.continuous_batching import ContinuousBatchingEngine
+from openminers.base.deadline import DeadlineExpired
+from openminers.base.stopping import StopSequences
+from tests.test_batching import tiny_model_and_tokenizer
+
+
+class ContinuousBatchingTestCase(unittest.TestCase):
+    def test_matches_single_generation(self):
+        """Test that sequences joining and leaving the batch decode like single generations"""
+        model, tokenizer = tiny_model_and_tokenizer()
+        requests = [
+            ("w1 w2 w3 w4 w5 w6", 12),
+            ("w7 w8", 3),
+            ("w9 w10 w11", 7),
+            ("w12", 1),
+            ("w13 w14 w15 w16", 9),
+        ]
+        expected = [
+            generate_batch(
+                model, tokenizer, [prompt], max_new_tokens=n, do_sample=False
+            )[0]
+            for prompt, n in requests
+        ]
+
+        engine = ContinuousBatchingEngine(
+            model, tokenizer, max_batch_size=3, max_new_tokens=16
+        )
+        results = [None] * len(requests)
+
+        def submit(i):
+            prompt, max_new_tokens = requests[i]
+            results[i] = engine.submit(prompt, max_new_tokens=max_new_tokens)
+
+        threads = [
+            threading.Thread(target=submit, args=(i,)) for i in range(len(requests))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.stop()
+
+        assert results == expected
+        assert engine.active == []
+
+    def test_stops_on_eos(self):
+        """Test that sequences retire as soon as they sample an eos token"""
+        model, tokenizer = tiny_model_and_tokenizer()
+        first_token = generate_batch(
+            model, tokenizer, ["w1 w2"], max_new_tokens=1, do_sample=False
+        )[0]
+
+        engine = ContinuousBatchingEngine(
+            model,
+            tokenizer,
+            max_batch_size=2,
+            max_new_tokens=8,
+            eos_token_id=tokenizer.convert_tokens_to_ids(first_token),
+        )
+        assert engine.submit("w1 w2") == ""
+        engine.stop()
+
+    def test_max_length_budget(self):
+        """Test that max_length counts the prompt like generate does"""
+        model, tokenizer = tiny_model_and_tokenizer()
+
+        engine = ContinuousBatchingEngine(
+            model, tokenizer, max_batch_size=2, max_length=5, eos_token_id=[]
+        )
+        assert len(engine.submit("w1 w2").split()) == 3
+        assert engine.submit("w1 w2 w3 w4 w5") == ""
+        engine.stop()
+
+    def test_deadline(self):
+        """Test that a sequence leaves the batch with its partial completion at its deadline"""
+        model, tokenizer = tiny_model_and_tokenizer()
+        # 10ms per decode step, 60 tokens take well over the deadline.
+        model.register_forward_pre_hook(lambda module, args: time.sleep(0.01))
+
+        engine = ContinuousBatchingEngine(
+            model, tokenizer, max_batch_size=2, max_new_tokens=60, eos_token_id=[]
+        )
+        with self.assertRaises(DeadlineExpired):
+            engine.submit("w1 w2", deadline=time.time() - 1)
+
+        completion = engine.submit("w1 w2", deadline=time.time() + 0.1)
+        assert 0 < len(completion.split()) < 30
+        engine.stop()
+
+    def test_deadline_while_queued(self):
+        """Test that a request waiting behind a full batch gives up at its deadline"""
+        model, tokenizer = tiny_model_and_tokenizer()
+        model.register_forward_pre_hook(lambda module, args: time.sleep(0.01))
+
+        engine = ContinuousBatchingEngine(
+            model, tokenizer, max_batch_size=1, max_new_tokens=60, eos_token_id=[]
+        )
+        running = threading.Thread(target=engine.submit, args=("w1 w2",))
+        running.start()
+        time.sleep(0.05)
+
+        start = time.time()
+        with self.assertRaises(DeadlineExpired):
+            engine.submit("w3 w4", deadline=start + 0.1)
+        assert time.time() - start < 0.3
+        assert engine.queue.empty()
+        running.join()
+        engine.stop()
+
+    def test_generate_kwargs(self):
+        """Test that generate kwargs beyond the sampling ones decode like generate"""
+        model, tokenizer = tiny_model_and_tokenizer()
+        kwargs = dict(
+            max_new_tokens=10,
+            min_new_tokens=10,
+            repetition_penalty=1.5,
+            no_repeat_ngram_size=2,
+            do_sample=False,
+        )
+        prompts = ["w1 w2 w3", "w7 w8"]
+        expected = [generate_batch(model, tokenizer, [p], **kwargs)[0] for p in prompts]
+
+        engine = ContinuousBatchingEngine(model, tokenizer, max_batch_size=2, **kwargs)
+        assert [engine.submit(prompt) for prompt in prompts] == expected
+        engine.stop()
+
+        with self.assertRaises(ValueError):
+            ContinuousBatchingEngine(
+                model, tokenizer, max_batch_size=2, max_new_tokens=8, num_beams=2
+            )
+
+    def test_stop_sequences(self):
+        """Test that a sequence finishes before the stop sequence it generates"""
+        model, tokenizer = tiny_model_and_tokenizer()
+        kwargs = dict(max_new_tokens=12, min_new_tokens=12, do_sample=False)
+        words = generate_batch(model, tokenizer, ["w1 w2 w3"], **kwargs)[0].split()
+        # Greedy rows repeat tokens, stop where the first token changes.
+        cut = next(i for i in range(1, len(words)) if words[i] != words[i - 1])
+        stop = StopSequences.from_strings(
+            tokenizer, [" ".join(words[cut - 1 : cut + 1])]
+        )
+
+        engine = ContinuousBatchingEngine(
+            model, tokenizer, max_batch_size=2, stop_sequences=stop, **kwargs
+        )
+        assert engine.submit("w1 w2 w3") == " ".join(words[: cut - 1])
+        engine.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
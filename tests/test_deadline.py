@@ -0,0 +1,116 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import torch
+import unittest
+from unittest.mock import MagicMock
+from openminers.base.forward import forward
+from openminers.base.response_cache import ResponseCache
+from openminers.base.deadline import (
+    accepts_deadline,
+    call_deadline,
+    max_time_kwargs,
+    remaining,
+)
+from tests.test_batching import tiny_model_and_tokenizer
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def mock_miner():
+    mock_self = MagicMock()
+    mock_self.response_cache = None
+    mock_self.semantic_cache = None
+    mock_self.single_flight = None
+    mock_self._process_history = lambda messages: messages[-1]["content"]
+    return mock_self
+
+
+class DeadlineTestCase(unittest.TestCase):
+    def test_call_deadline(self):
+        """Test that the deadline is the call start time plus its timeout less the margin"""
+        forward_call = MagicMock(start_time=100.0, timeout=12.0)
+        assert call_deadline(forward_call, margin=0.5) == 111.5
+        assert call_deadline(MagicMock(start_time=100.0, timeout=None)) is None
+        assert remaining(None) is None and max_time_kwargs(None) == {}
+        assert remaining(time.time() - 1) == 0.0
+
+    def test_accepts_deadline(self):
+        """Test that only forward functions with a deadline argument are passed one"""
+
+        class Miner:
+            def forward(self, messages, deadline=None):
+                pass
+
+        assert accepts_deadline(Miner().forward)
+        assert not accepts_deadline(lambda messages: None)
+
+    def test_expired_requests_are_dropped(self):
+        """Test that a request past its deadline never reaches the miner"""
+        mock_self = mock_miner()
+        func = MagicMock(return_value="completion")
+
+        response = forward(mock_self, func, MESSAGES, deadline=time.time() - 1)
+
+        assert response == ""
+        func.assert_not_called()
+        mock_self.telemetry.increment.assert_any_call("forward_expired")
+
+    def test_deadline_is_passed_to_the_miner(self):
+        """Test that forward functions taking a deadline receive the one of the call"""
+        mock_self = mock_miner()
+        deadlines = []
+
+        def func(messages, deadline=None):
+            deadlines.append(deadline)
+            return "completion"
+
+        deadline = time.time() + 10
+        assert forward(mock_self, func, MESSAGES, deadline=deadline) == "completion"
+        assert forward(mock_self, lambda messages: "plain", MESSAGES, deadline=deadline)
+        assert deadlines == [deadline]
+
+    def test_cut_short_completions_are_not_cached(self):
+        """Test that a completion returned past the deadline is not cached"""
+        mock_self = mock_miner()
+        mock_self.response_cache = ResponseCache(
+            "model", {"do_sample": False}, max_bytes=2**20
+        )
+
+        def func(messages, deadline=None):
+            time.sleep(max(0.0, deadline - time.time()))
+            return "partial"
+
+        forward(mock_self, func, MESSAGES, deadline=time.time() + 0.05)
+
+        assert len(mock_self.response_cache) == 0
+        mock_self.telemetry.increment.assert_any_call("forward_deadline_hits")
+
+    def test_max_time_stops_generation(self):
+        """Test that max_time_kwargs stops a transformers generation with the tokens so far"""
+        model, tokenizer = tiny_model_and_tokenizer()
+        input_ids = tokenizer("w1 w2 w3", return_tensors="pt").input_ids
+        kwargs = dict(max_new_tokens=40, min_new_tokens=40, do_sample=False)
+        with torch.inference_mode():
+            full = model.generate(input_ids, **kwargs)
+            cut = model.generate(input_ids, **kwargs, **max_time_kwargs(time.time()))
+        assert full.shape[1] == input_ids.shape[1] + 40
+        assert input_ids.shape[1] < cut.shape[1] < full.shape[1]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import unittest
+from types import SimpleNamespace
+from openminers.base.generation_engine import ChatTemplate, GenerationEngine
+from openminers.text_to_text.airoboros.miner import AiroborosMiner
+from openminers.text_to_text.hermes.miner import HermesMiner
+from openminers.text_to_text.koala.miner import KoalaMiner
+from openminers.text_to_text.neoxt.miner import NeoxtMiner
+from openminers.text_to_text.pythia.miner import PythiaMiner
+from openminers.text_to_text.vicuna.miner import VicunaMiner
+from tests.test_batching import tiny_model_and_tokenizer
+
+MESSAGES = [
+    {"role": "system", "content": " w1 w2 "},
+    {"role": "user", "content": "w3 w4"},
+    {"role": "assistant", "content": "w5"},
+    {"role": "Assistant", "content": "w6"},
+    {"role": "user", "content": "w7 w8"},
+]
+
+
+# The prompt building of each miner before it moved to GenerationEngine.
+def legacy_pythia_history(config, history):
+    processed_history = ""
+    if config.do_prompt_injection:
+        processed_history += config.system_prompt
+    for message in history:
+        if message["role"] == "system":
+            if not config.do_prompt_injection or message != history[0]:
+                processed_history += "<human>: " + message["content"].strip() + "\n"
+        if message["role"] == "assistant":
+            processed_history += "<bot>: " + message["content"].strip() + "\n"
+        if message["role"] == "user":
+            processed_history += "<human>: " + message["content"].strip() + "\n"
+    return processed_history
+
+
+def legacy_history(system, assistant, user):
+    def process_history(config, history):
+        processed_history = ""
+        if config.do_prompt_injection:
+            processed_history += config.system_prompt
+        for message in history:
+            if message["role"] == "system":
+                if not config.do_prompt_injection or message != history[0]:
+                    processed_history += system + message["content"].strip() + " "
+            if message["role"] == "Assistant":
+                processed_history += assistant + message["content"].strip() + "</s>"
+            if message["role"] == "user":
+                processed_history += user + message["content"].strip() + " "
+        return processed_history
+
+    return process_history
+
+
+def legacy_generate(model, tokenizer, prompt, max_new_tokens):
+    input_ids = tokenizer.encode(prompt, return_tensors="pt")
+    output = model.generate(
+        input_ids,
+        max_length=input_ids.shape[1] + max_new_tokens,
+        do_sample=False,
+        pad_token_id=tokenizer.eos_token_id,
+    )
+    return tokenizer.decode(output[0][input_ids.shape[1] :], skip_special_tokens=True)
+
+
+LEGACY = {
+    PythiaMiner: (legacy_pythia_history, "<bot>:", True),
+    NeoxtMiner: (legacy_pythia_history, "<bot>:", True),
+    VicunaMiner: (legacy_history("", "ASSISTANT:", "USER: "), "ASSISTANT:", False),
+    KoalaMiner: (legacy_history("", "GPT:", "USER: "), "GPT:", False),
+    HermesMiner: (
+        legacy_history("", "### Response:", "### Input: "),
+        "### Response:",
+        False,
+    ),
+    AiroborosMiner: (legacy_history("", "ASSISTANT:", "USER: "), "ASSISTANT:", False),
+}
+
+
+class GenerationEngineTestCase(unittest.TestCase):
+    def test_template(self):
+        """Test that templates render known roles, inject system prompts and cut at stops"""
+        template = ChatTemplate(
+            roles={"user": "U: {content}\n", "assistant": "A: {content}\n"},
+            generation_prompt="A:",
+            stop=["U:"],
+        )
+        assert template.render(MESSAGES) == "U: w3 w4\nA: w5\nU: w7 w8\n"
+        assert template.render(MESSAGES[:2], system_prompt="S ") == "S U: w3 w4\n"
+        assert template.postprocess(" w1 w2 \nU: w3") == "w1 w2"
+        assert ChatTemplate(roles={}).postprocess(" w1 ") == " w1 "
+
+    def test_parity(self):
+        """Test that every migrated miner builds the same prompt and generation as before"""
+        model, tokenizer = tiny_model_and_tokenizer()
+        for miner_class, (legacy, generation_prompt, split) in LEGACY.items():
+            for injection in (False, True):
+                # NeoxtMiner used to keep only the first system message when injecting.
+                if injection and miner_class is NeoxtMiner:
+                    continue
+                with self.subTest(miner=miner_class.__name__, injection=injection):
+                    config = SimpleNamespace(
+                        do_prompt_injection=injection, system_prompt="w9 "
+                    )
+                    miner = object.__new__(miner_class)
+                    miner.engine = GenerationEngine(
+                        model,
+                        tokenizer,
+                        miner_class.template,
+                        system_prompt="w9 " if injection else None,
+                        max_new_tokens=8,
+                        do_sample=False,
+                    )
+
+                    history = legacy(config, MESSAGES)
+                    expected = legacy_generate(
+                        model, tokenizer, history + generation_prompt, 8
+                    )
+                    if split:
+                        expected = expected.split("<human>")[0].strip()
+
+                    assert miner._process_history(MESSAGES) == history
+                    assert miner.forward(MESSAGES) == expected
+
+
+if __name__ == "__main__":
+    unittest.main()
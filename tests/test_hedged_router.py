@@ -0,0 +1,164 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import asyncio
+import unittest
+from openminers.base.async_backend import AsyncBackend
+from openminers.base.hedged_router import CircuitBreaker, HedgedRouter, LatencyHistogram
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+
+
+class FakeBackend(AsyncBackend):
+    """Mock backend answering with its name after `latency` seconds."""
+
+    def __init__(self, name: str, latency: float, error: Exception = None):
+        super(FakeBackend, self).__init__()
+        self.name = name
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def acomplete(self, messages):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.name
+
+
+class LatencyHistogramTestCase(unittest.TestCase):
+    def test_percentile(self):
+        """Test that percentiles are accurate to one bucket width."""
+        histogram = LatencyHistogram()
+        self.assertIsNone(histogram.percentile(0.5))
+        for index in range(1, 101):
+            histogram.observe(index / 100)
+        self.assertAlmostEqual(histogram.percentile(0.5), 0.5, delta=0.07)
+        self.assertAlmostEqual(histogram.percentile(0.9), 0.9, delta=0.12)
+
+    def test_decay(self):
+        """Test that old latencies lose weight once max_count is reached."""
+        histogram = LatencyHistogram(max_count=100)
+        for _ in range(100):
+            histogram.observe(1.0)
+        for _ in range(300):
+            histogram.observe(0.01)
+        self.assertLess(histogram.count, 200)
+        self.assertLess(histogram.percentile(0.9), 0.02)
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def test_open_half_open_close(self):
+        """Test that the breaker opens on failures and closes after a successful trial."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertEqual(breaker.state, "half_open")
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+
+class HedgedRouterTestCase(unittest.TestCase):
+    def test_fast_primary(self):
+        """Test that a primary answering before the hedge delay is not hedged."""
+        primary, secondary = FakeBackend("a", 0.01), FakeBackend("b", 0.01)
+        router = HedgedRouter([primary, secondary], hedge_delay=0.1)
+        self.assertEqual(router.generate(MESSAGES), "a")
+        self.assertEqual(secondary.calls, 0)
+        self.assertEqual(router.stats["hedges"], 0)
+
+    def test_hedge_wins_and_cancels_primary(self):
+        """Test that a slow primary is hedged, the hedge wins and the primary is cancelled."""
+        primary, secondary = FakeBackend("a", 1.0), FakeBackend("b", 0.01)
+        router = HedgedRouter([primary, secondary], hedge_delay=0.05)
+        start = time.time()
+        self.assertEqual(router.generate(MESSAGES), "b")
+        self.assertLess(time.time() - start, 0.5)
+        time.sleep(0.01)
+        self.assertEqual(primary.cancelled, 1)
+        self.assertEqual(router.stats["hedges"], 1)
+        self.assertEqual(router.stats["hedge_wins"], 1)
+        self.assertEqual(router.providers[0].breaker.trial, False)
+
+    def test_hedge_at_percentile(self):
+        """Test that the hedge delay follows the observed latency percentile."""
+        primary, secondary = FakeBackend("a", 0.02), FakeBackend("b", 0.01)
+        router = HedgedRouter(
+            [primary, secondary], hedge_delay=10.0, min_samples=5, hedge_percentile=0.9
+        )
+        for _ in range(5):
+            router.generate(MESSAGES)
+        self.assertAlmostEqual(router.delay(router.providers[0]), 0.02, delta=0.02)
+
+        primary.latency = 1.0
+        start = time.time()
+        self.assertEqual(router.generate(MESSAGES), "b")
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_failover_and_breaker(self):
+        """Test that failures fail over to the next provider and open the breaker."""
+        primary = FakeBackend("a", 0.0, error=ValueError("down"))
+        secondary = FakeBackend("b", 0.01)
+        router = HedgedRouter(
+            [primary, secondary], hedge_delay=1.0, failure_threshold=2
+        )
+        for _ in range(4):
+            self.assertEqual(router.generate(MESSAGES), "b")
+        self.assertEqual(primary.calls, 2)
+        self.assertEqual(router.stats["failovers"], 2)
+        self.assertEqual(router.provider_stats()["a"]["breaker"], "open")
+
+    def test_every_provider_fails(self):
+        """Test that the last error is raised when every provider fails or is open."""
+        backends = [FakeBackend(name, 0.0, error=ValueError(name)) for name in "ab"]
+        router = HedgedRouter(backends, failure_threshold=1)
+        with self.assertRaisesRegex(ValueError, "b"):
+            router.generate(MESSAGES)
+        with self.assertRaises(RuntimeError):
+            router.generate(MESSAGES)
+        self.assertEqual(router.stats["rejected"], 1)
+
+    def test_deadline_cancels_every_request(self):
+        """Test that the router deadline cancels the primary and the hedge."""
+        backends = [FakeBackend(name, 1.0) for name in "ab"]
+        router = HedgedRouter(backends, hedge_delay=0.01)
+        with self.assertRaises(asyncio.TimeoutError):
+            router.generate(MESSAGES, deadline=time.time() + 0.1)
+        time.sleep(0.01)
+        self.assertEqual([backend.cancelled for backend in backends], [1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
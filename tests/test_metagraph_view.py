@@ -0,0 +1,66 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import torch
+import unittest
+from unittest.mock import MagicMock
+from openminers.base.metagraph_view import MetagraphView
+from openminers.base.mock import OfflineMetagraph
+
+
+class MetagraphViewTestCase(unittest.TestCase):
+    def test_from_metagraph(self):
+        """Test that the view indexes hotkeys and caches stake and permits"""
+        mock_metagraph = MagicMock()
+        mock_metagraph.hotkeys = ["hotkey0", "hotkey1", "hotkey2"]
+        mock_metagraph.S = torch.tensor([1.0, 2.0, 3.0])
+        mock_metagraph.validator_permit = torch.tensor([True, False, True])
+
+        view = MetagraphView.from_metagraph(mock_metagraph)
+
+        assert len(view) == 3
+        assert "hotkey1" in view
+        assert "hotkey3" not in view
+        assert view.uid("hotkey2") == 2
+        assert view.uid("hotkey3") is None
+        assert view.stake == [1.0, 2.0, 3.0]
+        assert view.validator_permit == [True, False, True]
+
+    def test_from_missing_metagraph(self):
+        """Test that a missing metagraph yields an empty view"""
+        view = MetagraphView.from_metagraph(None)
+
+        assert len(view) == 0
+        assert view.uid("hotkey0") is None
+
+    def test_from_offline_metagraph(self):
+        """Test that the offline metagraph used by benchmarks yields a matching view"""
+        metagraph = OfflineMetagraph(
+            hotkeys=["hotkey0", "hotkey1"],
+            stake=[5.0, 0.0],
+            validator_permit=[True, False],
+        )
+
+        view = MetagraphView.from_metagraph(metagraph.sync())
+
+        assert view.uid("hotkey1") == 1
+        assert view.stake == [5.0, 0.0]
+        assert view.validator_permit == [True, False]
+
+
+if __name__ == "__main__":
+    unittest.main()
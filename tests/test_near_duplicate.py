@@ -0,0 +1,119 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import unittest
+import threading
+from openminers.base.near_duplicate import (
+    NearDuplicateIndex,
+    normalize_messages,
+    optimal_bands,
+)
+
+
+def prompt(content):
+    return [{"role": "user", "content": content}]
+
+
+class NearDuplicateIndexTestCase(unittest.TestCase):
+    def test_normalize_messages(self):
+        """Test that case, whitespace and punctuation are ignored"""
+        assert normalize_messages(prompt("Hello,  World!\n")) == [
+            "user",
+            "hello",
+            "world",
+        ]
+        assert normalize_messages(["Hi there"]) == ["hi", "there"]
+
+    def test_optimal_bands(self):
+        """Test that bands and rows split the signature with a threshold close to the target"""
+        bands, rows = optimal_bands(0.8, 64)
+        assert bands * rows == 64
+        assert (1 / bands) ** (1 / rows) <= 0.8
+
+    def test_flags_near_duplicates_only(self):
+        """Test that reworded prompts match while different prompts do not"""
+        index = NearDuplicateIndex(threshold=0.8)
+        index.add(
+            index.signature(
+                prompt(
+                    "Summarize the following article about renewable energy "
+                    "adoption in Europe in three bullet points."
+                )
+            ),
+            block=1,
+        )
+
+        assert index.query(
+            index.signature(
+                prompt(
+                    "summarize the following article about renewable energy "
+                    "adoption in europe in three bullet points"
+                )
+            )
+        )
+        assert not index.query(
+            index.signature(prompt("Write a haiku about the ocean at night."))
+        )
+
+    def test_expiry_and_max_entries(self):
+        """Test that entries expire by block and the oldest are evicted past max_entries"""
+        index = NearDuplicateIndex(threshold=0.8, max_entries=2)
+        signatures = [
+            index.signature(prompt(f"question number {i} about topic {i}"))
+            for i in range(3)
+        ]
+        for block, signature in enumerate(signatures):
+            index.add(signature, block)
+
+        assert len(index) == 2
+        assert not index.query(signatures[0])
+        assert index.query(signatures[2])
+
+        assert index.expire(2) == 1
+        assert not index.query(signatures[1])
+        assert len(index) == 1
+        assert sum(len(table) for table in index.tables) == index.bands
+
+    def test_concurrent_check_and_add(self):
+        """Test that only one of many concurrent similar prompts passes"""
+        index = NearDuplicateIndex(threshold=0.8)
+        passed = []
+
+        def request(worker: int):
+            for i in range(20):
+                # Every worker sends the same 20 questions, and 20 of its own.
+                for text in (f"shared question {i} about topic {i}", f"{worker} {i}"):
+                    if not index.check_and_add(index.signature(prompt(text)), 1):
+                        passed.append(text)
+
+        threads = [threading.Thread(target=request, args=(w,)) for w in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        shared = [text for text in passed if text.startswith("shared")]
+        assert sorted(shared) == sorted(set(shared)) and len(shared) == 20
+        assert len(index) == 20 + 8 * 20
+
+        assert index.expire(2) == 20 + 8 * 20
+        assert len(index) == 0 and not index.buckets
+        assert index.tables == [{} for _ in range(index.bands)]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import torch
+import unittest
+import openminers
+from types import SimpleNamespace
+from openminers.base.batching import generate_batch
+from openminers.base.prefix_cache import KVRadixTree, PrefixCachedGenerator
+from tests.test_batching import tiny_model_and_tokenizer
+
+
+def fake_past(tokens, layers=2):
+    # One (key, value) pair per layer whose entries record the token at each position.
+    values = torch.tensor(tokens, dtype=torch.float32).view(1, 1, -1, 1)
+    return tuple((values.clone(), values.clone()) for _ in range(layers))
+
+
+def cached_tokens(past_key_values):
+    return past_key_values[0][0].view(-1).long().tolist()
+
+
+class KVRadixTreeTestCase(unittest.TestCase):
+    def test_longest_prefix_match(self):
+        """Test that lookups return the cache of the longest stored prefix"""
+        tree = KVRadixTree(max_bytes=2**20)
+        tree.insert([1, 2, 3, 4], fake_past([1, 2, 3, 4]))
+        tree.insert([1, 2, 5], fake_past([1, 2, 5]))
+
+        matched, past = tree.match([1, 2, 3, 9])
+        assert matched == 3
+        assert cached_tokens(past) == [1, 2, 3]
+
+        matched, past = tree.match([1, 2, 5, 6])
+        assert matched == 3
+        assert cached_tokens(past) == [1, 2, 5]
+
+        assert tree.match([7, 8]) == (0, None)
+
+    def test_counters(self):
+        """Test that hit rate and saved prefill tokens are counted"""
+        tree = KVRadixTree(max_bytes=2**20)
+        tree.insert([1, 2, 3], fake_past([1, 2, 3]))
+        tree.match([1, 2, 3, 4])
+        tree.match([5, 6])
+
+        assert tree.stats["lookups"] == 2
+        assert tree.stats["hits"] == 1
+        assert tree.stats["saved_prefill_tokens"] == 3
+        assert tree.hit_rate == 0.5
+
+    def test_lru_eviction(self):
+        """Test that the least recently used prefix is evicted over the memory budget"""
+        segment_bytes = sum(
+            k.numel() * k.element_size() * 2 for k, _ in fake_past([1, 2, 3])
+        )
+        tree = KVRadixTree(max_bytes=2 * segment_bytes)
+        tree.insert([1, 2, 3], fake_past([1, 2, 3]))
+        tree.insert([4, 5, 6], fake_past([4, 5, 6]))
+        tree.match([1, 2, 3])
+        tree.insert([7, 8, 9], fake_past([7, 8, 9]))
+
+        assert tree.nbytes <= tree.max_bytes
+        assert tree.stats["evictions"] == 1
+        assert tree.match([4, 5, 6])[0] == 0
+        assert tree.match([1, 2, 3])[0] == 3
+        assert tree.match([7, 8, 9])[0] == 3
+
+
+class PrefixCachedGeneratorTestCase(unittest.TestCase):
+    def test_matches_uncached_generation(self):
+        """Test that generating from a cached prefix matches a full prefill"""
+        model, tokenizer = tiny_model_and_tokenizer()
+        generator = PrefixCachedGenerator(
+            model, tokenizer, max_bytes=2**20, max_new_tokens=6, do_sample=False
+        )
+        prompts = ["w1 w2 w3 w4 w5 w6", "w1 w2 w3 w4 w7", "w1 w2 w3 w4 w5 w6 w8"]
+        for prompt in prompts:
+            expected = generate_batch(
+                model, tokenizer, [prompt], max_new_tokens=6, do_sample=False
+            )[0]
+            assert generator.generate(prompt) == expected
+
+        assert generator.tree.stats["hits"] == 2
+        assert generator.tree.stats["saved_prefill_tokens"] == 4 + 5
+
+    def test_unsupported_miners_reject_the_flag(self):
+        """Test that miners not generating through the prefix cache refuse --neuron.prefix_cache_mb"""
+        config = SimpleNamespace(neuron=SimpleNamespace(prefix_cache_mb=64.0))
+
+        class Miner(openminers.BasePromptingMiner):
+            pass
+
+        class CachingMiner(openminers.BasePromptingMiner):
+            supports_prefix_cache = True
+
+        with self.assertRaises(ValueError):
+            Miner.check_neuron_config(config)
+        CachingMiner.check_neuron_config(config)
+        config.neuron.prefix_cache_mb = 0.0
+        Miner.check_neuron_config(config)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -18,32 +18,12 @@
 import torch
 import unittest
 from unittest.mock import MagicMock, patch
-from openminers.base.priority import record_request_timestamps, default_priority
+from openminers.base.priority import default_priority
+from openminers.base.metagraph_view import MetagraphView
+from openminers.base.rate_limiter import TokenBucketRateLimiter
 
 
 class PriorityTestCase(unittest.TestCase):
-    def test_record_request_timestamps(self):
-        hotkey_address = "hotkey1"
-        len_request_timestamps = 20
-
-        mock_self = MagicMock()
-        mock_self.config.miner.priority.len_request_timestamps = len_request_timestamps
-        mock_self.request_timestamps = {}
-
-        mock_forward_call = MagicMock()
-        mock_forward_call.src_hotkey = hotkey_address
-
-        times = []
-        for i in range(1, 21):
-            mock_forward_call.start_time = i
-            times.append(i)
-            request_timestamps = record_request_timestamps(mock_self, mock_forward_call)
-            assert (
-                request_timestamps[hotkey_address]
-                == [0] * (len_request_timestamps - i) + times
-            )
-            assert len(request_timestamps[hotkey_address]) == len_request_timestamps
-
     def test_default_priority(self):
         hotkey_address = "hotkey1"
         stake = 1
@@ -51,26 +31,58 @@ class PriorityTestCase(unittest.TestCase):
         time_stake_multiplicate = 2
 
         mock_self = MagicMock()
-        mock_self.metagraph.hotkeys = [hotkey_address]
-        mock_self.metagraph.S = [torch.tensor(stake)]
+        mock_self.metagraph_view = MetagraphView(
+            hotkeys=[hotkey_address], stake=[torch.tensor(stake)]
+        )
         mock_self.config.miner.priority.time_stake_multiplicate = (
             time_stake_multiplicate
         )
         mock_self.config.miner.priority.default = default_priority_value
+        mock_self.rate_limiter = TokenBucketRateLimiter(burst=50, refill_rate=1 / 60)
 
         mock_forward_call = MagicMock()
         mock_forward_call.src_hotkey = hotkey_address
 
-        # return default when request timestamp is empty
-        mock_self.request_timestamps = {}
+        # return default when the hotkey has no rate limit bucket yet
         priority = default_priority(mock_self, mock_forward_call)
         assert priority == default_priority_value
 
-        # return priority when request timestamp is not empty
-        mock_self.request_timestamps = {hotkey_address: [0] * 10}
-        for minute_passed in range(1, 20):
+        # return priority scaled by the minutes of tokens banked
+        mock_self.rate_limiter.acquire(hotkey_address, now=0)
+        for _ in range(48):
+            mock_self.rate_limiter.acquire(hotkey_address, now=0)
+        for minute_passed in range(0, 20):
             with patch("time.time", MagicMock(return_value=minute_passed * 60)):
                 priority = default_priority(mock_self, mock_forward_call)
-                assert (
-                    priority == max(minute_passed / time_stake_multiplicate, 1) * stake
-                )
+                tokens = 1 + minute_passed
+                assert priority == max(tokens / time_stake_multiplicate, 1) * stake
+
+    def test_priority_without_refill(self):
+        """Test that hotkeys get their stake as priority when buckets never refill"""
+        mock_self = MagicMock()
+        mock_self.metagraph_view = MetagraphView(
+            hotkeys=["hotkey1"], stake=[torch.tensor(3.0)]
+        )
+        mock_self.config.miner.priority.time_stake_multiplicate = 2
+        mock_self.rate_limiter = TokenBucketRateLimiter(burst=50, refill_rate=0)
+        mock_self.rate_limiter.acquire("hotkey1", now=0)
+
+        mock_forward_call = MagicMock()
+        mock_forward_call.src_hotkey = "hotkey1"
+
+        assert default_priority(mock_self, mock_forward_call) == 3.0
+
+    def test_unregistered_priority(self):
+        """Test that non-registered hotkeys get the default priority"""
+        mock_self = MagicMock()
+        mock_self.metagraph_view = MetagraphView()
+        mock_self.config.miner.priority.default = 7
+
+        mock_forward_call = MagicMock()
+        mock_forward_call.src_hotkey = "hotkey1"
+
+        assert default_priority(mock_self, mock_forward_call) == 7
+
+
+if __name__ == "__main__":
+    unittest.main()
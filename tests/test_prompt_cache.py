@@ -0,0 +1,72 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import unittest
+from openminers.base.prompt_cache import PromptCache, hash_messages
+
+
+class PromptCacheTestCase(unittest.TestCase):
+    def test_hash_messages(self):
+        """Test that the hash depends on message boundaries and content"""
+        messages = [{"role": "user", "content": "hello"}]
+        assert hash_messages(messages) == hash_messages(list(messages))
+        assert hash_messages(["ab", "c"]) != hash_messages(["a", "bc"])
+        assert hash_messages(messages) != hash_messages(
+            [{"role": "system", "content": "hello"}]
+        )
+
+    def test_expire_removes_only_old_buckets(self):
+        """Test that entries are expired bucket by bucket in insertion order"""
+        cache = PromptCache()
+        for block in range(10):
+            cache.add(bytes([block]), "hotkey1", block)
+            cache.add(bytes([block, block]), "hotkey1", block)
+
+        removed = cache.expire(5)
+
+        assert removed == 10
+        assert len(cache) == 10
+        assert bytes([4]) not in cache
+        assert cache[bytes([5])] == ("hotkey1", 5)
+        assert len(cache.buckets) == 5
+
+    def test_add_existing_key_keeps_block(self):
+        """Test that re-adding a key does not move it to a newer bucket"""
+        cache = PromptCache()
+        cache.add(b"key", "hotkey1", 1)
+        cache.add(b"key", "hotkey2", 3)
+
+        assert cache[b"key"] == ("hotkey1", 1)
+        assert cache.expire(2) == 1
+        assert len(cache) == 0
+        assert len(cache.buckets) == 0
+
+    def test_earlier_block_expires_on_time(self):
+        """Test that a key added with a block before the last bucket is not kept past its span"""
+        cache = PromptCache()
+        cache.add(b"a", "hotkey1", 5)
+        cache.add(b"b", "hotkey1", 10)
+        cache.add(b"c", "hotkey1", 3)
+        cache.add(b"d", "hotkey1", 5)
+
+        assert [block for block, _ in cache.buckets] == [3, 5, 10]
+        assert cache.expire(4) == 1 and b"c" not in cache
+        assert cache.expire(6) == 2 and list(cache.entries) == [b"b"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import argparse
+import unittest
+import threading
+import bittensor as bt
+from openminers.base.config import add_args, map_deprecated_args
+from openminers.base.rate_limiter import TokenBucketRateLimiter
+
+
+class TokenBucketRateLimiterTestCase(unittest.TestCase):
+    def test_burst_and_refill(self):
+        """Test that a burst is allowed and tokens come back at the refill rate"""
+        limiter = TokenBucketRateLimiter(burst=3, refill_rate=0.5)
+
+        assert [limiter.acquire("hotkey", now=0) for _ in range(4)] == [
+            True,
+            True,
+            True,
+            False,
+        ]
+        assert limiter.tokens("hotkey", now=1) == 0.5
+        assert limiter.acquire("hotkey", now=1) is False
+        assert limiter.acquire("hotkey", now=2) is True
+        assert limiter.tokens("hotkey", now=100) == 3
+
+    def test_stake_scaling(self):
+        """Test that stake scales the burst and refill rate"""
+        limiter = TokenBucketRateLimiter(burst=2, refill_rate=1, stake_scale=100)
+
+        assert sum(limiter.acquire("whale", stake=100, now=0) for _ in range(10)) == 4
+        assert sum(limiter.acquire("minnow", stake=0, now=0) for _ in range(10)) == 2
+        assert limiter.tokens("whale", stake=100, now=1) == 2
+
+    def test_retain(self):
+        """Test that forgotten hotkeys are removed and start over with a full bucket"""
+        limiter = TokenBucketRateLimiter(burst=1, refill_rate=0)
+        for hotkey in ["a", "b", "c"]:
+            limiter.acquire(hotkey, now=0)
+
+        assert limiter.retain(lambda hotkey: hotkey != "b") == 1
+        assert "b" not in limiter and len(limiter) == 2
+        assert limiter.tokens("b") is None
+
+        assert limiter.acquire("b", now=0) is True
+        assert len(limiter) == 3
+
+    def test_retain_reuses_slots(self):
+        """Test that hotkeys replacing forgotten ones reuse their array slots"""
+        limiter = TokenBucketRateLimiter(burst=1, refill_rate=0, stripes=1)
+        for hotkey in range(100):
+            limiter.acquire(str(hotkey), now=0)
+        limiter.retain(lambda hotkey: int(hotkey) < 50)
+        for hotkey in range(100, 150):
+            assert limiter.acquire(str(hotkey), now=0) is True
+
+        assert len(limiter) == 100
+        assert len(limiter.shards[0].token_counts) == 100
+
+    def test_concurrent_acquire(self):
+        """Test that concurrent acquires never hand out more tokens than the burst"""
+        limiter = TokenBucketRateLimiter(burst=1000, refill_rate=0)
+        granted = []
+
+        def acquire():
+            granted.append(sum(limiter.acquire("hotkey", now=0) for _ in range(500)))
+
+        threads = [threading.Thread(target=acquire) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(granted) == 1000
+
+    def test_deprecated_request_period_flags(self):
+        """Test that the removed request period flags map onto the token bucket"""
+        parser = argparse.ArgumentParser()
+        add_args(None, parser)
+
+        config = bt.config(parser, args=[])
+        map_deprecated_args(config)
+        assert config.miner.blacklist.rate_limit_burst == 50
+        assert config.miner.blacklist.rate_limit_refill == 50 / 30
+
+        config = bt.config(
+            parser,
+            args=[
+                "--miner.blacklist.min_request_period",
+                "10",
+                "--miner.priority.len_request_timestamps",
+                "20",
+            ],
+        )
+        map_deprecated_args(config)
+        assert config.miner.blacklist.rate_limit_burst == 20
+        assert config.miner.blacklist.rate_limit_refill == 2
+
+        config = bt.config(parser, args=["--miner.blacklist.min_request_period", "5"])
+        map_deprecated_args(config)
+        assert config.miner.blacklist.rate_limit_burst == 50
+        assert config.miner.blacklist.rate_limit_refill == 10
+
+
+if __name__ == "__main__":
+    unittest.main()
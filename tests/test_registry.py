@@ -0,0 +1,67 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import sys
+import unittest
+import subprocess
+import openminers
+
+
+class RegistryTestCase(unittest.TestCase):
+    def test_import_is_lazy(self):
+        """Test that importing openminers does not import any miner backend"""
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, openminers; print(any(m.startswith('openminers.') for m in sys.modules))",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert output.stdout.strip() == "False"
+
+    def test_api_miners_do_not_import_transformers(self):
+        """Test that loading the template and API miners leaves transformers unimported"""
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, openminers; openminers.TemplateMiner; openminers.OpenAIMiner; "
+                "print('transformers' in sys.modules)",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert output.stdout.strip() == "False"
+
+    def test_aliases_resolve_to_the_same_class(self):
+        """Test that lower case and class name aliases resolve to the same miner"""
+        assert openminers.template is openminers.TemplateMiner
+        assert issubclass(openminers.template, openminers.BasePromptingMiner)
+        assert "falcon" in dir(openminers)
+
+    def test_unknown_name(self):
+        """Test that unknown names raise AttributeError"""
+        with self.assertRaises(AttributeError):
+            openminers.not_a_miner
+
+
+if __name__ == "__main__":
+    unittest.main()
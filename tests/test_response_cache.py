@@ -0,0 +1,113 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import unittest
+from unittest.mock import MagicMock
+from openminers.base.forward import forward
+from openminers.base.response_cache import ResponseCache, is_deterministic
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    def test_is_deterministic(self):
+        """Test that only greedy decoding or top 1 sampling is deterministic"""
+        assert is_deterministic({"max_new_tokens": 10})
+        assert is_deterministic({"do_sample": False, "temperature": 0.5})
+        assert is_deterministic({"do_sample": True, "top_k": 1})
+        assert not is_deterministic({"do_sample": True, "top_k": 10})
+
+    def test_keys_depend_on_model_and_params(self):
+        """Test that the same history maps to different keys per model and params"""
+        cache = ResponseCache("model", {"max_new_tokens": 10}, max_bytes=2**20)
+        other_model = ResponseCache("other", {"max_new_tokens": 10}, max_bytes=2**20)
+        other_params = ResponseCache("model", {"max_new_tokens": 20}, max_bytes=2**20)
+
+        assert cache.key("USER: hi") == cache.key("USER: hi")
+        assert cache.key("USER: hi") != cache.key("USER: hello")
+        assert cache.key("USER: hi") != other_model.key("USER: hi")
+        assert cache.key("USER: hi") != other_params.key("USER: hi")
+
+    def test_lru_byte_eviction(self):
+        """Test that least recently used completions are evicted beyond max_bytes"""
+        cache = ResponseCache("model", {}, max_bytes=3 * (32 + 10))
+        keys = [cache.key(str(index)) for index in range(4)]
+        for key in keys[:3]:
+            cache.put(key, "x" * 10, now=0)
+
+        # Touch the oldest entry so the second one is evicted instead.
+        assert cache.get(keys[0], now=0) == "x" * 10
+        cache.put(keys[3], "y" * 10, now=0)
+
+        assert cache.get(keys[1], now=0) is None
+        assert cache.get(keys[3], now=0) == "y" * 10
+        assert cache.nbytes == 3 * (32 + 10)
+        assert cache.stats["evictions"] == 1
+
+        # Completions larger than the whole budget are never stored.
+        cache.put(keys[1], "z" * 1000, now=0)
+        assert cache.get(keys[1], now=0) is None
+
+    def test_ttl(self):
+        """Test that completions are only served for ttl seconds"""
+        cache = ResponseCache("model", {}, max_bytes=2**20, ttl=10)
+        key = cache.key("USER: hi")
+        cache.put(key, "hello", now=0)
+
+        assert cache.get(key, now=9) == "hello"
+        assert cache.get(key, now=10) is None
+        assert len(cache) == 0 and cache.nbytes == 0
+        assert cache.stats == {
+            "hits": 1,
+            "misses": 1,
+            "evictions": 0,
+            "expirations": 1,
+        }
+
+    def test_forward_serves_repeated_histories(self):
+        """Test that forward only generates once per processed history"""
+        mock_self = MagicMock()
+        mock_self.response_cache = ResponseCache("model", {}, max_bytes=2**20)
+        mock_self.semantic_cache = None
+        mock_self.single_flight = None
+        mock_self._process_history = lambda messages: " ".join(
+            message["content"].strip() for message in messages
+        )
+        func = MagicMock(return_value="completion")
+
+        # Both message lists render to the same processed history.
+        for content in ["hello", " hello "]:
+            messages = [{"role": "user", "content": content}]
+            assert forward(mock_self, func, messages) == "completion"
+
+        assert func.call_count == 1
+        assert mock_self.response_cache.hit_rate == 0.5
+
+    def test_forward_does_not_cache_errors(self):
+        """Test that failed generations are not cached"""
+        mock_self = MagicMock()
+        mock_self.response_cache = ResponseCache("model", {}, max_bytes=2**20)
+        mock_self.semantic_cache = None
+        mock_self.single_flight = None
+        mock_self._process_history = lambda messages: messages[0]["content"]
+        func = MagicMock(side_effect=[RuntimeError("oom"), "completion"])
+        messages = [{"role": "user", "content": "hello"}]
+
+        assert forward(mock_self, func, messages) == ""
+        assert forward(mock_self, func, messages) == "completion"
+        assert func.call_count == 2
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import os
+import tempfile
+import unittest
+import multiprocessing
+from openminers.base.response_cache import ResponseCache
+from openminers.base.response_store import ResponseStore
+
+READERS = 2
+
+
+def read_completions(path, keys, results):
+    store = ResponseStore(path, max_bytes=2**20)
+    mismatches = 0
+    for _ in range(20):
+        for index, key in enumerate(keys):
+            row = store.get(key, now=0)
+            mismatches += row is not None and row[0] != f"completion {index}"
+    results.put(mismatches)
+
+
+class ResponseStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "responses.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_put_and_get(self):
+        """Test that queued completions are readable once flushed, until they expire"""
+        store = ResponseStore(self.path, max_bytes=2**20)
+        store.put(b"key", "completion", expires=10, now=0)
+        assert store.get(b"key", now=0) is None
+
+        store.flush()
+        assert store.get(b"key", now=5) == ("completion", 10)
+        assert store.get(b"key", now=10) is None
+        assert store.stats["hits"] == 1 and store.stats["misses"] == 2
+
+    def test_cache_warms_after_restart(self):
+        """Test that a new cache on the same file serves completions of the old one"""
+        cache = ResponseCache(
+            "model", {}, max_bytes=2**20, store=ResponseStore(self.path, 2**20)
+        )
+        keys = [cache.key(f"USER: {index}") for index in range(10)]
+        for index, key in enumerate(keys):
+            cache.put(key, f"completion {index}", now=0)
+        cache.store.stop()
+
+        # Only the most recently used completions fit in memory after the restart.
+        restarted = ResponseCache(
+            "model",
+            {},
+            max_bytes=3 * (32 + len("completion 0")),
+            store=ResponseStore(self.path, 2**20),
+        )
+        assert restarted.warm(now=1) == 3
+        assert list(restarted.entries) == keys[-3:]
+
+        # Older completions are still read through from disk.
+        assert restarted.get(keys[0], now=1) == "completion 0"
+        assert restarted.stats["hits"] == 1
+        assert restarted.store.stats["hits"] == 1
+
+    def test_compaction(self):
+        """Test that compaction deletes expired then least recently used completions"""
+        size = len(b"k0") + len("completion")
+        store = ResponseStore(self.path, max_bytes=3 * size)
+        for index in range(5):
+            store.put(b"k%d" % index, "completion", expires=100, now=index)
+        store.put(b"old", "completion", expires=1, now=10)
+        store.flush()
+
+        # Touching the oldest completion keeps it.
+        store.get(b"k0", now=20)
+        store.flush()
+
+        assert store.compact(now=50) == 3
+        assert store.size() == 3 * size
+        assert [
+            store.get(b"k%d" % index, now=50) is not None for index in range(5)
+        ] == [
+            True,
+            False,
+            False,
+            True,
+            True,
+        ]
+
+    def test_concurrent_readers(self):
+        """Test that reader processes see whole completions while another process writes"""
+        store = ResponseStore(self.path, max_bytes=2**20)
+        keys = [b"key %d" % index for index in range(200)]
+
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        readers = [
+            context.Process(target=read_completions, args=(self.path, keys, results))
+            for _ in range(READERS)
+        ]
+        for reader in readers:
+            reader.start()
+        for index, key in enumerate(keys):
+            store.put(key, f"completion {index}", expires=100, now=0)
+            if index % 10 == 0:
+                store.flush()
+        store.flush()
+        mismatches = [results.get(timeout=60) for _ in readers]
+        for reader in readers:
+            reader.join()
+
+        assert mismatches == [0] * READERS
+        assert all(store.get(key, now=0) is not None for key in keys)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import unittest
+import numpy as np
+from unittest.mock import MagicMock
+from openminers.base.forward import forward
+from openminers.base.semantic_cache import (
+    HashingEncoder,
+    SemanticCache,
+    conversation_context,
+    last_user_message,
+)
+
+
+class SemanticCacheTestCase(unittest.TestCase):
+    def test_hashing_encoder(self):
+        """Test that paraphrases are embedded closer than unrelated prompts"""
+        encoder = HashingEncoder()
+        query = encoder.encode("ask me a random question about anything")
+        paraphrase = encoder.encode("Ask me a random question about anything!")
+        variant = encoder.encode("ask me a random question about something")
+        unrelated = encoder.encode("summarize the history of the roman empire")
+
+        assert np.isclose(np.linalg.norm(query), 1)
+        assert np.isclose(query @ paraphrase, 1)
+        assert query @ variant > 0.7
+        assert query @ unrelated < 0.3
+
+    def test_lookup_threshold(self):
+        """Test that completions are only served above the similarity threshold"""
+        cache = SemanticCache(HashingEncoder(), threshold=0.7)
+        completion, vector = cache.lookup("ask me a random question about anything")
+        assert completion is None
+        cache.add(vector, "what is the tallest mountain?")
+
+        completion, _ = cache.lookup("ask me a random question about something")
+        assert completion == "what is the tallest mountain?"
+        completion, _ = cache.lookup("summarize the history of the roman empire")
+        assert completion is None
+        assert cache.stats == {"hits": 1, "misses": 2, "evictions": 0}
+
+    def test_search_top_k(self):
+        """Test that search returns the most similar rows first"""
+        cache = SemanticCache(HashingEncoder(dim=4), top_k=2, max_vectors=8)
+        for index, vector in enumerate(np.eye(4, dtype=np.float32)):
+            cache.add(vector, str(index))
+
+        query = np.array([0.1, 0.8, 0.6, 0.0], dtype=np.float32)
+        assert [row for row, _ in cache.search(query)] == [1, 2]
+
+    def test_lru_eviction(self):
+        """Test that the least recently used vector is overwritten when full"""
+        cache = SemanticCache(HashingEncoder(), threshold=0.99, max_vectors=2)
+        for now, text in enumerate(["first prompt", "second prompt"]):
+            _, vector = cache.lookup(text, now=now)
+            cache.add(vector, text, now=now)
+
+        # Using the first prompt makes the second one the least recently used.
+        assert cache.lookup("first prompt", now=2)[0] == "first prompt"
+        _, vector = cache.lookup("third prompt", now=3)
+        cache.add(vector, "third prompt", now=3)
+
+        assert len(cache) == 2 and cache.stats["evictions"] == 1
+        assert cache.lookup("second prompt", now=4)[0] is None
+        assert cache.lookup("first prompt", now=4)[0] == "first prompt"
+
+    def test_forward_serves_paraphrases(self):
+        """Test that forward serves the completion of a paraphrased last user message"""
+        mock_self = MagicMock()
+        mock_self.response_cache = None
+        mock_self.semantic_cache = SemanticCache(HashingEncoder(), threshold=0.7)
+        mock_self.single_flight = None
+        func = MagicMock(return_value="what is the tallest mountain?")
+
+        for message in [
+            "ask me a random question about anything",
+            "Ask me a random question about something.",
+        ]:
+            messages = [
+                {"role": "system", "content": "you are a chatbot"},
+                {"role": "user", "content": message},
+            ]
+            assert forward(mock_self, func, messages) == func.return_value
+
+        assert func.call_count == 1
+        assert last_user_message([{"role": "system", "content": "x"}]) is None
+
+        # The same question under another system prompt is generated again.
+        messages[0] = {"role": "system", "content": "you are a pirate"}
+        assert forward(mock_self, func, messages) == func.return_value
+        assert func.call_count == 2
+
+    def test_context_must_match(self):
+        """Test that only the top_k matches from the same conversation context are served"""
+        cache = SemanticCache(HashingEncoder(), threshold=0.7, top_k=2)
+        first = [{"role": "system", "content": "a"}, {"role": "user", "content": "q"}]
+        second = [{"role": "system", "content": "b"}, {"role": "user", "content": "q"}]
+        assert conversation_context(first) != conversation_context(second)
+        assert conversation_context(first) == conversation_context(
+            [{"role": "system", "content": "a"}, {"role": "user", "content": "other"}]
+        )
+
+        _, vector = cache.lookup("tell me a joke about cats", now=0)
+        cache.add(vector, "second", now=0, context=conversation_context(second))
+        _, vector = cache.lookup("tell me a funny joke about cats", now=1)
+        cache.add(vector, "first", now=1, context=conversation_context(first))
+
+        # The closest match is from the other context, the runner up is served.
+        completion, _ = cache.lookup(
+            "tell me a joke about cats", context=conversation_context(first)
+        )
+        assert completion == "first"
+        completion, _ = cache.lookup("tell me a joke about cats")
+        assert completion is None
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import threading
+import unittest
+from types import SimpleNamespace
+from openminers.base.blacklist import default_blacklist, is_prompt_in_cache
+from openminers.base.priority import default_priority
+from openminers.base.metagraph_view import MetagraphView
+from openminers.base.rate_limiter import TokenBucketRateLimiter
+from openminers.base.sharded_state import ShardedPromptCache
+
+
+class ShardedPromptCacheTestCase(unittest.TestCase):
+    def test_lazy_expiry_and_prune(self):
+        """Test that expired prompts are ignored right away and removed by prune"""
+        cache = ShardedPromptCache(stripes=4)
+        for block in range(10):
+            cache.add(bytes([block]), "hotkey1", block)
+
+        assert cache.expire(5) == 0
+        assert len(cache) == 5
+        assert bytes([4]) not in cache
+        assert cache[bytes([5])] == ("hotkey1", 5)
+
+        # Expired prompts can be sent again.
+        assert cache.check_and_add(bytes([4]), "hotkey2", 10) is False
+        assert cache.check_and_add(bytes([4]), "hotkey2", 10) is True
+
+        # check_and_add already expired the shard of its key, prune does the rest.
+        cache.prune()
+        assert len(cache.snapshot()) == 6
+        assert cache.prune() == 0
+
+    def test_blacklist_expires_before_checking(self):
+        """Test that a prompt past the block span passes on the first request of a new block"""
+        miner = SimpleNamespace(
+            config=SimpleNamespace(
+                miner=SimpleNamespace(
+                    blacklist=SimpleNamespace(prompt_cache_block_span=10)
+                )
+            ),
+            prompt_cache=ShardedPromptCache(stripes=4),
+            block_tracker=SimpleNamespace(block=0),
+        )
+        forward_call = SimpleNamespace(src_hotkey="hotkey1", messages=["hello"])
+
+        assert is_prompt_in_cache(miner, forward_call) is False
+        assert is_prompt_in_cache(miner, forward_call) is True
+        miner.block_tracker.block = 20
+        assert is_prompt_in_cache(miner, forward_call) is False
+
+
+class ConcurrentStateTestCase(unittest.TestCase):
+    def test_blacklist_and_priority_while_pruning(self):
+        """Test that blacklist and priority stay consistent while the epoch loop prunes"""
+        hotkeys = [f"hotkey{index}" for index in range(16)]
+        burst = 200
+
+        miner = SimpleNamespace(
+            config=SimpleNamespace(
+                miner=SimpleNamespace(
+                    blacklist=SimpleNamespace(
+                        whitelist=[],
+                        blacklist=[],
+                        allow_non_registered=False,
+                        force_validator_permit=False,
+                        prompt_cache_block_span=5,
+                    ),
+                    priority=SimpleNamespace(default=0.0, time_stake_multiplicate=1),
+                )
+            ),
+            metagraph_view=MetagraphView(hotkeys=hotkeys, stake=[1.0] * len(hotkeys)),
+            rate_limiter=TokenBucketRateLimiter(burst=burst, refill_rate=1e-6),
+            prompt_cache=ShardedPromptCache(),
+            block_tracker=SimpleNamespace(block=100),
+            near_duplicate_index=None,
+        )
+        stop = threading.Event()
+        errors = []
+        passed = {hotkey: 0 for hotkey in hotkeys}
+        duplicates = [0]
+        counter_lock = threading.Lock()
+
+        def request(worker: int):
+            hotkey = hotkeys[worker % len(hotkeys)]
+            try:
+                for index in range(400):
+                    forward_call = SimpleNamespace(
+                        src_hotkey=hotkey, messages=[f"{worker} {index}"]
+                    )
+                    default_priority(miner, forward_call)
+                    should_blacklist, _ = default_blacklist(miner, forward_call)
+                    with counter_lock:
+                        passed[hotkey] += not should_blacklist
+
+                    # Every worker also resends a shared prompt, only one may pass.
+                    forward_call.messages = [f"shared {index}"]
+                    should_blacklist, _ = default_blacklist(miner, forward_call)
+                    with counter_lock:
+                        duplicates[0] += not should_blacklist
+                        passed[hotkey] += not should_blacklist
+            except Exception as e:
+                errors.append(e)
+
+        def epoch_loop():
+            try:
+                while not stop.is_set():
+                    # Swap in a fresh view of the same hotkeys and prune from snapshots.
+                    view = MetagraphView(hotkeys=hotkeys, stake=[1.0] * len(hotkeys))
+                    miner.metagraph_view = view
+                    miner.rate_limiter.retain(lambda hotkey: hotkey in view)
+                    miner.prompt_cache.prune()
+                    miner.rate_limiter.retain(lambda hotkey: hotkey != "unknown")
+            except Exception as e:
+                errors.append(e)
+
+        pruner = threading.Thread(target=epoch_loop)
+        pruner.start()
+        workers = [threading.Thread(target=request, args=(i,)) for i in range(32)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        stop.set()
+        pruner.join()
+
+        assert errors == []
+        # No hotkey got past its burst, and every shared prompt passed at most once.
+        assert all(count <= burst for count in passed.values())
+        assert duplicates[0] <= 400
+        assert sum(passed.values()) == burst * len(hotkeys)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import tempfile
+import unittest
+import multiprocessing
+from openminers.base.prompt_cache import hash_messages
+from openminers.base.shared_state import (
+    SharedHashTable,
+    SharedPromptCache,
+    SharedRateLimiter,
+)
+
+WRITERS = 8
+
+
+def acquire_tokens(path, attempts, results):
+    limiter = SharedRateLimiter(path, burst=500, refill_rate=0)
+    results.put(sum(limiter.acquire("validator", now=0) for _ in range(attempts)))
+
+
+def add_prompts(path, prompts, results):
+    cache = SharedPromptCache(path)
+    results.put(
+        [
+            index
+            for index in range(prompts)
+            if not cache.check_and_add(hash_messages([f"prompt {index}"]), "hotkey", 1)
+        ]
+    )
+
+
+def run_writers(target, *args):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=target, args=(*args, results)) for _ in range(WRITERS)
+    ]
+    for process in processes:
+        process.start()
+    outputs = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join()
+    return outputs
+
+
+class SharedStateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_prompt_cache(self):
+        """Test that the shared prompt cache behaves like the PromptCache"""
+        cache = SharedPromptCache(self.path("prompts"), capacity=256, stripes=4)
+        key = hash_messages(["hello"])
+
+        assert cache.check_and_add(key, "hotkey1", 5) is False
+        assert cache.check_and_add(key, "hotkey2", 6) is True
+        assert key in cache and cache[key] == ("hotkey1", 5)
+        assert len(cache) == 1
+
+        cache.expire(6)
+        assert key not in cache and len(cache) == 0
+        assert cache.check_and_add(key, "hotkey2", 6) is False
+        assert cache[key] == ("hotkey2", 6)
+
+    def test_shared_between_handles(self):
+        """Test that two handles on the same file see each other's writes"""
+        first = SharedRateLimiter(self.path("limits"), burst=2, refill_rate=0)
+        second = SharedRateLimiter(self.path("limits"), burst=2, refill_rate=0)
+
+        assert first.acquire("validator", now=0) is True
+        assert second.acquire("validator", now=0) is True
+        assert first.acquire("validator", now=0) is False
+        assert second.tokens("validator", now=0) == 0
+
+        assert second.retain(lambda hotkey: hotkey != "validator") == 1
+        assert "validator" not in first and len(first) == 0
+
+    def test_full_region_evicts_oldest(self):
+        """Test that inserting into a full probe window overwrites the oldest entry"""
+        table = SharedHashTable(
+            self.path("table"), 4, "<q", age=lambda value: value[0], stripes=1
+        )
+        keys = [hash_messages([f"prompt {i}"]) for i in range(5)]
+        for block, key in enumerate(keys):
+            table.update(key, "hotkey", lambda value: ((block,), None))
+
+        assert table.get(keys[0]) is None
+        assert all(table.get(key) is not None for key in keys[1:])
+
+    def test_layout_mismatch(self):
+        """Test that opening a table with a different layout fails"""
+        SharedPromptCache(self.path("prompts"), capacity=256)
+        with self.assertRaises(ValueError):
+            SharedPromptCache(self.path("prompts"), capacity=512)
+
+    def test_concurrent_writer_processes(self):
+        """Test that writer processes never grant more tokens than the burst or add a prompt twice"""
+        granted = run_writers(acquire_tokens, self.path("limits"), 200)
+        assert sum(granted) == 500
+
+        added = run_writers(add_prompts, self.path("prompts"), 300)
+        indices = [index for process in added for index in process]
+        assert sorted(indices) == list(range(300))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,236 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import threading
+import unittest
+from unittest.mock import MagicMock
+from openminers.base.deadline import DeadlineExpired
+from openminers.base.forward import forward
+from openminers.base.single_flight import SingleFlight
+
+
+class SlowBackend:
+    """Mock backend taking `latency` seconds per generation."""
+
+    def __init__(self, latency: float, error: Exception = None):
+        self.latency = latency
+        self.error = error
+        self.generations = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, messages):
+        with self.lock:
+            self.generations += 1
+        time.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return f"completion of {messages[-1]['content']}"
+
+
+class DeadlineBackend(SlowBackend):
+    """Mock backend that stops at the deadline with a partial completion."""
+
+    def __call__(self, messages, deadline=None):
+        with self.lock:
+            self.generations += 1
+        if deadline is not None and time.time() + self.latency > deadline:
+            time.sleep(max(0.0, deadline - time.time()))
+            return "partial"
+        time.sleep(self.latency)
+        return f"completion of {messages[-1]['content']}"
+
+
+class ExpiringBackend(SlowBackend):
+    """Mock backend that raises DeadlineExpired, like a batch scheduler, at the deadline."""
+
+    def __call__(self, messages, deadline=None):
+        with self.lock:
+            self.generations += 1
+        if deadline is not None and time.time() + self.latency > deadline:
+            time.sleep(max(0.0, deadline - time.time()))
+            raise DeadlineExpired()
+        time.sleep(self.latency)
+        return f"completion of {messages[-1]['content']}"
+
+
+def run_concurrently(target, count: int):
+    results = [None] * count
+
+    def call(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def mock_miner(timeout: float = None):
+    mock_self = MagicMock()
+    mock_self.response_cache = None
+    mock_self.semantic_cache = None
+    mock_self.single_flight = SingleFlight(timeout=timeout)
+    mock_self._process_history = lambda messages: messages[-1]["content"].strip()
+    return mock_self
+
+
+class SingleFlightTestCase(unittest.TestCase):
+    def test_concurrent_identical_prompts_share_a_generation(self):
+        """Test that concurrent identical prompts run the slow backend once"""
+        mock_self = mock_miner()
+        backend = SlowBackend(latency=0.3)
+        messages = [{"role": "user", "content": "hello"}]
+
+        results = run_concurrently(lambda: forward(mock_self, backend, messages), 8)
+
+        saved = mock_self.single_flight.stats["coalesced"]
+        assert results == ["completion of hello"] * 8
+        assert backend.generations == 1 and saved == 7
+        assert mock_self.single_flight.calls == {}
+
+    def test_distinct_prompts_are_not_coalesced(self):
+        """Test that prompts with different processed histories each generate"""
+        mock_self = mock_miner()
+        backend = SlowBackend(latency=0.05)
+        counter = iter(range(4))
+
+        def call():
+            return forward(
+                mock_self, backend, [{"role": "user", "content": str(next(counter))}]
+            )
+
+        assert sorted(run_concurrently(call, 4)) == [
+            f"completion of {index}" for index in range(4)
+        ]
+        assert backend.generations == 4
+        assert mock_self.single_flight.stats["coalesced"] == 0
+
+    def test_errors_propagate_to_waiters(self):
+        """Test that every waiter gets the exception of the shared generation"""
+        flight = SingleFlight()
+        backend = SlowBackend(latency=0.2, error=RuntimeError("backend down"))
+
+        def call():
+            try:
+                flight.do("key", lambda: backend([{"content": "hello"}]))
+            except RuntimeError as e:
+                return str(e)
+
+        assert run_concurrently(call, 4) == ["backend down"] * 4
+        assert backend.generations == 1
+        assert flight.stats["errors"] == 1 and flight.stats["coalesced"] == 3
+
+        # The failed call is forgotten, the next one runs again.
+        backend.error = None
+        assert flight.do("key", lambda: backend([{"content": "hello"}])) == (
+            "completion of hello",
+            False,
+        )
+
+    def test_waiters_time_out(self):
+        """Test that waiters give up after the timeout while the generation completes"""
+        mock_self = mock_miner(timeout=0.05)
+        backend = SlowBackend(latency=0.3)
+        messages = [{"role": "user", "content": "hello"}]
+
+        results = run_concurrently(lambda: forward(mock_self, backend, messages), 3)
+
+        # Timed out waiters get the empty completion of a failed forward.
+        assert sorted(results) == ["", "", "completion of hello"]
+        assert mock_self.single_flight.stats["timeouts"] == 2
+
+    def test_waiters_stop_at_their_own_deadline(self):
+        """Test that a waiter gives up at its deadline, before the flight timeout"""
+        mock_self = mock_miner(timeout=10)
+        backend = SlowBackend(latency=0.5)
+        messages = [{"role": "user", "content": "hello"}]
+
+        leader = threading.Thread(target=forward, args=(mock_self, backend, messages))
+        leader.start()
+        time.sleep(0.05)
+        start = time.time()
+        response = forward(mock_self, backend, messages, deadline=start + 0.1)
+        elapsed = time.time() - start
+        leader.join()
+
+        assert response == "" and elapsed < 0.3
+        assert mock_self.single_flight.stats["timeouts"] == 1
+
+    def test_truncated_generations_are_not_shared(self):
+        """Test that a waiter generates again when the leader hit its deadline"""
+        mock_self = mock_miner()
+        backend = DeadlineBackend(latency=0.2)
+        messages = [{"role": "user", "content": "hello"}]
+        results = {}
+
+        def call(name, deadline):
+            results[name] = forward(mock_self, backend, messages, deadline=deadline)
+
+        now = time.time()
+        leader = threading.Thread(target=call, args=("leader", now + 0.1))
+        leader.start()
+        time.sleep(0.02)
+        call("waiter", now + 1.0)
+        leader.join()
+
+        assert results == {"leader": "partial", "waiter": "completion of hello"}
+        assert backend.generations == 2
+
+    def test_waiters_without_deadline_generate_again(self):
+        """Test that a waiter without a deadline generates again when the leader hit its own"""
+        mock_self = mock_miner()
+        backend = DeadlineBackend(latency=0.2)
+        messages = [{"role": "user", "content": "hello"}]
+        results = {}
+
+        def call(name, deadline):
+            results[name] = forward(mock_self, backend, messages, deadline=deadline)
+
+        leader = threading.Thread(target=call, args=("leader", time.time() + 0.1))
+        leader.start()
+        time.sleep(0.02)
+        call("waiter", None)
+        leader.join()
+
+        assert results == {"leader": "partial", "waiter": "completion of hello"}
+        assert backend.generations == 2
+
+    def test_leader_expiry_is_not_shared(self):
+        """Test that a waiter with time left generates again when the leader expired"""
+        mock_self = mock_miner()
+        backend = ExpiringBackend(latency=0.2)
+        messages = [{"role": "user", "content": "hello"}]
+        results = {}
+
+        def call(name, deadline):
+            results[name] = forward(mock_self, backend, messages, deadline=deadline)
+
+        now = time.time()
+        leader = threading.Thread(target=call, args=("leader", now + 0.1))
+        leader.start()
+        time.sleep(0.02)
+        call("waiter", now + 5.0)
+        leader.join()
+
+        assert results == {"leader": "", "waiter": "completion of hello"}
+        assert backend.generations == 2
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import unittest
+from openminers.base.mock_api import MockAPIServer
+from openminers.base.stop_strings import StopStringMatcher, consume
+from openminers.base.api_backends import (
+    AI21Backend,
+    CohereBackend,
+    GooseAIBackend,
+    OpenAIBackend,
+)
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+STOPS = ["user: ", "bot: ", "system: "]
+COMPLETION = " ".join(f"w{i}" for i in range(20)) + " user: next " + "x " * 200
+
+
+class StopStringMatcherTestCase(unittest.TestCase):
+    def test_cut_at_first_stop(self):
+        """Test that text is cut where the first stop string starts"""
+        matcher = StopStringMatcher(STOPS)
+        self.assertEqual(matcher.cut("Hi there\nbot: x\nuser: y"), "Hi there\n")
+        self.assertEqual(matcher.cut("no stop here"), "no stop here")
+
+    def test_overlapping_stops(self):
+        """Test that stops sharing suffixes and prefixes are all found"""
+        matcher = StopStringMatcher(["he", "she", "hers", "his"])
+        self.assertEqual(matcher.cut("ushers"), "u")
+        self.assertEqual(matcher.cut("ahis"), "a")
+        self.assertEqual(matcher.cut("hhx"), "hhx")
+
+    def test_stop_split_across_chunks(self):
+        """Test that a stop string spread over several chunks is found"""
+        stream = StopStringMatcher(STOPS).stream()
+        self.assertFalse(stream.feed("answer us"))
+        self.assertFalse(stream.feed("e"))
+        self.assertTrue(stream.feed("r: more"))
+        self.assertEqual(stream.text, "answer ")
+        self.assertTrue(stream.feed("ignored"))
+        self.assertEqual(stream.chunks_read, 3)
+
+    def test_consume_closes_the_generator(self):
+        """Test that consuming stops reading and closes the source at a stop"""
+        produced = []
+
+        def tokens():
+            try:
+                for token in ["a", "b", " user", ": ", "c", "d"]:
+                    produced.append(token)
+                    yield token
+            finally:
+                produced.append("closed")
+
+        stream = consume(tokens(), StopStringMatcher(STOPS))
+        self.assertEqual(stream.text, "ab ")
+        self.assertEqual(produced, ["a", "b", " user", ": ", "closed"])
+
+    def test_rejects_empty_stops(self):
+        """Test that at least one stop string is required"""
+        with self.assertRaises(ValueError):
+            StopStringMatcher([""])
+
+
+class StreamingBackendTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = MockAPIServer(
+            latency=0.0, completion=COMPLETION, stream_interval=0.001
+        ).start()
+        self.backends = []
+
+    def tearDown(self):
+        for backend in self.backends:
+            backend.close()
+        self.server.stop()
+
+    def backend(self, cls, **kwargs):
+        backend = cls(api_key="key", base_url=self.server.url, **kwargs)
+        self.backends.append(backend)
+        return backend
+
+    def test_streaming_backends_hang_up_at_stop(self):
+        """Test that streaming backends stop reading, and the server stops sending, at a stop"""
+        expected = COMPLETION[: COMPLETION.index("user: ")]
+        for cls, params in [
+            (OpenAIBackend, {"stop": STOPS}),
+            (CohereBackend, {"stop_sequences": STOPS}),
+            (GooseAIBackend, {"stop": "user: "}),
+        ]:
+            with self.subTest(backend=cls.__name__):
+                backend = self.backend(cls, stream=True, **params)
+                sent = self.server.chunks_sent
+                self.assertEqual(backend.generate(MESSAGES), expected)
+                self.assertTrue(self.server.last_body["stream"])
+                time.sleep(0.05)
+                self.assertLess(self.server.chunks_sent - sent, 30)
+
+    def test_non_streaming_backends_cut_at_stop(self):
+        """Test that completions are cut at stops the provider did not apply"""
+        backend = self.backend(AI21Backend, stream=True, stopSequences=STOPS)
+        self.assertFalse(backend.stream)
+        self.assertEqual(
+            backend.generate(MESSAGES), COMPLETION[: COMPLETION.index("user: ")]
+        )
+        self.assertNotIn("stream", self.server.last_body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import unittest
+import torch
+from openminers.base.batching import generate_batch
+from openminers.base.stopping import StopSequences
+from tests.test_batching import tiny_model_and_tokenizer
+
+
+def step(criteria, rows):
+    return criteria(torch.tensor(rows), None)
+
+
+class StopSequencesTestCase(unittest.TestCase):
+    def test_matches_single_and_multi_token_suffixes(self):
+        """Test that each row reports the length of the stop sequence it ends with"""
+        stop = StopSequences([[9], [4, 5], [1, 2, 3]])
+        input_ids = torch.tensor([[7, 7, 9], [7, 4, 5], [1, 2, 3], [5, 4, 7]])
+        self.assertEqual(stop.matches(input_ids).tolist(), [1, 2, 3, 0])
+
+    def test_prefers_the_longest_stop_sequence(self):
+        """Test that overlapping stops report the longest match"""
+        stop = StopSequences([[5], [4, 5]])
+        self.assertEqual(stop.matches(torch.tensor([[4, 5], [3, 5]])).tolist(), [2, 1])
+
+    def test_ignores_stop_sequences_reaching_into_the_prompt(self):
+        """Test that a stop sequence must lie entirely after start"""
+        stop = StopSequences([[4, 5]])
+        input_ids = torch.tensor([[1, 4, 5]])
+        self.assertEqual(stop.matches(input_ids, start=2).tolist(), [0])
+        self.assertEqual(stop.matches(input_ids, start=1).tolist(), [2])
+
+    def test_matches_inputs_shorter_than_the_longest_stop(self):
+        """Test that padding of short inputs does not count towards a match"""
+        stop = StopSequences([[5], [7, 8, 9]])
+        input_ids = torch.tensor([[5]])
+        self.assertEqual(stop.matches(input_ids).tolist(), [1])
+        self.assertEqual(stop.matches(torch.tensor([[8, 9]])).tolist(), [0])
+
+    def test_from_strings_encodes_stops_and_adds_token_ids(self):
+        """Test that stop strings are tokenized and single ids kept"""
+        _, tokenizer = tiny_model_and_tokenizer()
+        stop = StopSequences.from_strings(tokenizer, ["w4 w5"], token_ids=[0, None])
+        self.assertEqual(stop.stops.tolist(), [[-1, 0], [5, 6]])
+        self.assertEqual(stop.lengths.tolist(), [1, 2])
+
+    def test_rejects_empty_stops(self):
+        """Test that at least one stop sequence is required"""
+        with self.assertRaises(ValueError):
+            StopSequences([[]])
+
+
+class StopOnSequencesTestCase(unittest.TestCase):
+    def test_stops_once_every_row_is_done(self):
+        """Test that rows finish independently and generation stops with the last one"""
+        criteria = StopSequences([[4, 5]]).criteria()
+        self.assertFalse(step(criteria, [[1, 4], [1, 2]]))
+        self.assertFalse(step(criteria, [[1, 4, 5], [1, 2, 3]]))
+        self.assertEqual(criteria.ends.tolist(), [1, -1])
+        self.assertTrue(step(criteria, [[1, 4, 5, 6], [1, 2, 4, 5]]))
+        self.assertEqual(criteria.ends.tolist(), [1, 2])
+
+    def test_truncate_pads_from_each_row_stop(self):
+        """Test that each row is padded from the start of its stop sequence"""
+        criteria = StopSequences([[4, 5]]).criteria()
+        step(criteria, [[1, 2], [1, 3]])
+        step(criteria, [[1, 2, 4], [1, 3, 3]])
+        step(criteria, [[1, 2, 4, 5], [1, 3, 3, 3]])
+        sequences = torch.tensor([[1, 2, 4, 5, 6], [1, 3, 3, 3, 3]])
+        self.assertEqual(
+            criteria.truncate(sequences, 0).tolist(),
+            [[1, 2, 0, 0, 0], [1, 3, 3, 3, 3]],
+        )
+
+    def test_generate_batch_cuts_rows_at_their_stop(self):
+        """Test that batched generation returns each row up to its stop sequence"""
+        model, tokenizer = tiny_model_and_tokenizer()
+        prompts = ["w1 w2 w3", "w7 w8"]
+        kwargs = dict(max_new_tokens=12, min_new_tokens=12, do_sample=False)
+        full = [
+            text.split() for text in generate_batch(model, tokenizer, prompts, **kwargs)
+        ]
+        # Greedy rows repeat tokens, stop each where its first token changes.
+        cuts = [
+            next(i for i in range(1, len(words)) if words[i] != words[i - 1])
+            for words in full
+        ]
+        stops = [" ".join(words[cut - 1 : cut + 1]) for words, cut in zip(full, cuts)]
+        stop = StopSequences.from_strings(tokenizer, stops)
+        generations = generate_batch(
+            model, tokenizer, prompts, stop_sequences=stop, **kwargs
+        )
+        self.assertEqual(
+            generations,
+            [" ".join(words[: cut - 1]) for words, cut in zip(full, cuts)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
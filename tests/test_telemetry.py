@@ -0,0 +1,97 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import json
+import sqlite3
+import tempfile
+import unittest
+from openminers.base.telemetry import Telemetry, Sink, JsonlSink, SqliteSink
+
+
+class ListSink(Sink):
+    def __init__(self):
+        self.batches = []
+
+    def write(self, records):
+        self.batches.append(records)
+
+
+class TelemetryTestCase(unittest.TestCase):
+    def test_sampling(self):
+        """Test that only 1 in N sampled records are queued while unsampled ones always are"""
+        sink = ListSink()
+        telemetry = Telemetry([sink], sample_rate=4)
+        for i in range(8):
+            telemetry.log("forward", {"i": i})
+        telemetry.log("epoch", {"block": 1}, sampled=False)
+        telemetry.stop()
+
+        records = [record for batch in sink.batches for record in batch]
+        assert [record["data"] for record in records] == [
+            {"i": 0},
+            {"i": 4},
+            {"block": 1},
+        ]
+
+    def test_drops_when_full(self):
+        """Test that records are dropped and counted instead of blocking on a full queue"""
+        telemetry = Telemetry([ListSink()], max_queue_size=2)
+        results = [telemetry.log("forward", {"i": i}) for i in range(5)]
+
+        assert results == [True, True, False, False, False]
+        assert telemetry.snapshot()["telemetry_dropped"] == 3
+
+    def test_counters(self):
+        """Test that counters aggregate every increment"""
+        telemetry = Telemetry([])
+        telemetry.increment("forward_calls")
+        telemetry.increment("forward_calls")
+        telemetry.increment("forward_elapsed", 0.5)
+
+        assert telemetry.snapshot() == {
+            "forward_calls": 2,
+            "forward_elapsed": 0.5,
+            "telemetry_dropped": 0,
+        }
+        assert telemetry.log("forward", {}) is False
+
+    def test_background_flush_to_file_sinks(self):
+        """Test that the flusher writes batches to JSONL and SQLite sinks"""
+        with tempfile.TemporaryDirectory() as directory:
+            jsonl_path = os.path.join(directory, "telemetry.jsonl")
+            sqlite_path = os.path.join(directory, "telemetry.db")
+            telemetry = Telemetry(
+                [JsonlSink(jsonl_path), SqliteSink(sqlite_path)], flush_interval=0.01
+            )
+            telemetry.start()
+            for i in range(10):
+                telemetry.log("forward", {"i": i})
+            telemetry.stop()
+
+            with open(jsonl_path) as file:
+                lines = [json.loads(line) for line in file]
+            assert [line["data"]["i"] for line in lines] == list(range(10))
+
+            connection = sqlite3.connect(sqlite_path)
+            rows = connection.execute("SELECT kind, data FROM telemetry").fetchall()
+            connection.close()
+            assert rows == [("forward", json.dumps({"i": i})) for i in range(10)]
+
+
+if __name__ == "__main__":
+    unittest.main()